@@ -0,0 +1,5 @@
+################################################ CitiBike Data Package ################################################
+
+# Reusable data pipeline behind the CitiBike Strategy Dashboard.
+# The notebooks in 03_Scripts document how each step was first explored;
+# the modules in this package run the same steps headlessly and at full scale.
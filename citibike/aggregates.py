@@ -0,0 +1,283 @@
+################################################ CitiBike Partial Aggregates ################################################
+
+# Small, mergeable summaries of a slice of trips: rides per day, rides per start station,
+# rides per route (with coordinates) and trip-duration histograms by rider type.
+# Every piece is a count, so merging two partials is an exact sum and the order of
+# merging never changes the result. Partials are built per chunk, per file or per
+# dataset batch and reduced into the artifacts in 02_Data/Prepared_Data.
+
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from citibike import integrity
+from citibike.ingest import (
+    DEFAULT_CHUNKSIZE, expected_rows, file_period, iter_trip_batches, list_monthly_files, read_csv_chunks,
+)
+from citibike.paths import TRIPS_DATASET_DIR
+
+ROUTE_KEYS = ["start_station_name", "end_station_name"]
+ROUTE_COORDS = ["start_lat", "start_lng", "end_lat", "end_lng"]
+
+# Columns needed to build a partial from the trip dataset
+AGGREGATE_COLUMNS = ["started_at", "ended_at", "member_casual"] + ROUTE_KEYS + ROUTE_COORDS
+
+## Trip duration histogram bins (minutes)
+# ---------------------------------------------------------
+# One-minute bins over 0–24h, plus an underflow (< 0) and an overflow (> 24h) bin,
+# so the outlier filters from Exercise 2.3/2.4 can be applied to the merged histogram.
+DURATION_EDGES = np.concatenate([[-np.inf], np.arange(0, 1441, dtype="float64"), [np.inf]])
+
+################################################ Building Partials ################################################
+
+## An empty partial
+# ---------------------------------------------------------
+def empty_aggregates():
+    return {
+        "daily": pd.Series(dtype="int64"),
+        "stations": pd.Series(dtype="int64"),
+        "routes": pd.DataFrame(
+            columns=["trip_count"] + ROUTE_COORDS,
+            index=pd.MultiIndex.from_tuples([], names=ROUTE_KEYS),
+        ),
+        "durations": {},
+    }
+
+
+## Trip duration in minutes
+# ---------------------------------------------------------
+def trip_minutes(trips):
+    return (trips["ended_at"] - trips["started_at"]).dt.total_seconds() / 60
+
+
+## Partial aggregates for one chunk of trips
+# ---------------------------------------------------------
+def chunk_aggregates(trips):
+    daily = trips["started_at"].dt.normalize().value_counts()
+    stations = trips["start_station_name"].value_counts()
+
+    routes = trips.groupby(ROUTE_KEYS, observed=True).agg(
+        trip_count=("start_lat", "size"),
+        **{col: (col, "first") for col in ROUTE_COORDS},
+    )
+
+    minutes = trip_minutes(trips).to_numpy()
+    rider = trips["member_casual"].astype(str).to_numpy()
+    durations = {
+        rider_type: np.histogram(minutes[rider == rider_type], DURATION_EDGES)[0]
+        for rider_type in np.unique(rider)
+    }
+
+    return {"daily": daily, "stations": stations, "routes": routes, "durations": durations}
+
+
+## Merge any number of partials into one (exact)
+# ---------------------------------------------------------
+def merge_aggregates(parts):
+    parts = list(parts)
+    if not parts:
+        return empty_aggregates()
+
+    daily = pd.concat([p["daily"] for p in parts]).groupby(level=0).sum()
+    stations = pd.concat([p["stations"] for p in parts]).groupby(level=0).sum()
+
+    # Route coordinates keep the first non-null value seen, like the station_lookup dedup in Exercise 2.5
+    routes = pd.concat([p["routes"] for p in parts if len(p["routes"])])
+    if len(routes):
+        routes = routes.groupby(level=ROUTE_KEYS, sort=False).agg(
+            {"trip_count": "sum", **{col: "first" for col in ROUTE_COORDS}}
+        )
+    else:
+        routes = empty_aggregates()["routes"]
+
+    durations = {}
+    for part in parts:
+        for rider_type, counts in part["durations"].items():
+            durations[rider_type] = durations.get(rider_type, 0) + counts
+
+    return {"daily": daily, "stations": stations, "routes": routes, "durations": durations}
+
+
+## Partials for one monthly CSV (one worker's job)
+# ---------------------------------------------------------
+# With seen (citibike.integrity.open_seen), rides already loaded are left out.
+def file_aggregates(csv_path, chunksize=DEFAULT_CHUNKSIZE, seen=None):
+    running = empty_aggregates()
+    for chunk in read_csv_chunks(csv_path, chunksize):
+        if seen is not None:
+            chunk = integrity.drop_seen(chunk, seen)[0]
+        running = merge_aggregates([running, chunk_aggregates(chunk)])
+    return running
+
+
+## Partials for the partitioned dataset, streamed batch by batch
+# ---------------------------------------------------------
+def dataset_aggregates(years=None, months=None, dataset_dir=TRIPS_DATASET_DIR):
+    running = empty_aggregates()
+    for batch in iter_trip_batches(AGGREGATE_COLUMNS, years, months, dataset_dir):
+        running = merge_aggregates([running, chunk_aggregates(batch)])
+    return running
+
+
+## One worker's job in the parallel build: a file's partials and the sorted keys of its rides
+# ---------------------------------------------------------
+# earlier: sorted keys of rides loaded from earlier files that this file repeats (left out).
+def file_partial(csv_path, chunksize=DEFAULT_CHUNKSIZE, earlier=None):
+    runs = [] if earlier is None else [earlier]
+    seen = integrity.new_seen(runs, expected_rows([csv_path]))
+    return file_aggregates(csv_path, chunksize, seen), integrity.seen_keys(seen)
+
+
+## Parallel build: one monthly file per worker, reduced in the parent
+# ---------------------------------------------------------
+# Only the small partials and the ride keys travel back to the parent process; the trip rows
+# never do. Each worker drops the rides repeated within its file. The parent then finds, in
+# file order, the rides a file shares with the files before it (the earliest copy is kept, as
+# in citibike.ingest) and rebuilds only those files without them, so the result equals the
+# build from the ingested dataset. The keys are stored in dataset_dir/_ride_ids, so
+# citibike.refresh checks the next months against these rides.
+def parallel_aggregates(folder, workers=None, chunksize=DEFAULT_CHUNKSIZE, dataset_dir=TRIPS_DATASET_DIR):
+    files = list_monthly_files(folder)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(file_partial, files, [chunksize] * len(files)))
+        parts, keys = [part for part, _ in results], [file_keys for _, file_keys in results]
+
+        # Rides each file shares with the files before it
+        earlier, repeats = integrity.new_seen(), {}
+        for i, file_keys in enumerate(keys):
+            repeated = file_keys[integrity.seen_exactly(earlier, file_keys)]
+            if len(repeated):
+                repeats[i] = repeated
+            earlier["runs"].append(file_keys)
+
+        redone = pool.map(file_partial, [files[i] for i in repeats], [chunksize] * len(repeats), list(repeats.values()))
+        for i, (part, file_keys) in zip(list(repeats), redone):
+            parts[i], keys[i] = part, file_keys
+
+    store_dir = integrity.ride_ids_dir(dataset_dir)
+    for path, file_keys in zip(files, keys):
+        integrity.commit_keys(store_dir, Path(path).stem, file_keys)
+    return merge_aggregates(parts)
+
+################################################ Reading the Results ################################################
+
+## Rides per day
+# ---------------------------------------------------------
+def daily_frame(aggregates):
+    daily = (
+        aggregates["daily"].astype("int64")
+        .rename_axis("date")
+        .sort_index()
+        .reset_index(name="bike_rides_daily")
+    )
+    daily["date"] = daily["date"].astype("datetime64[ns]")
+    return daily
+
+
+## Rides per start station, busiest first
+# ---------------------------------------------------------
+def stations_frame(aggregates):
+    return (
+        aggregates["stations"].astype("int64")
+        .rename_axis("start_station_name")
+        .reset_index(name="value")
+        .sort_values(["value", "start_station_name"], ascending=[False, True])
+        .reset_index(drop=True)
+    )
+
+
+## Rides per route, busiest first
+# ---------------------------------------------------------
+def routes_frame(aggregates):
+    routes = aggregates["routes"].reset_index()
+    routes["trip_count"] = routes["trip_count"].astype("int64")
+    return (
+        routes[ROUTE_KEYS + ["trip_count"] + ROUTE_COORDS]
+        .sort_values(["trip_count"] + ROUTE_KEYS, ascending=[False, True, True])
+        .reset_index(drop=True)
+    )
+
+
+## Trip duration histogram: one row per minute bin, one column per rider type
+# ---------------------------------------------------------
+def durations_frame(aggregates):
+    labels = ["<0"] + [str(m) for m in range(1440)] + [">1440"]
+    hist = pd.DataFrame(aggregates["durations"], index=labels).fillna(0).astype("int64")
+    return hist.rename_axis("minute").reset_index()
+
+################################################ Saving and Loading ################################################
+
+## Persist merged aggregates as small Parquet files (one per piece)
+# ---------------------------------------------------------
+def save_aggregates(merged, state_dir):
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+
+    daily_frame(merged).to_parquet(state_dir / "daily.parquet", index=False)
+    stations_frame(merged).to_parquet(state_dir / "stations.parquet", index=False)
+    routes_frame(merged).to_parquet(state_dir / "routes.parquet", index=False)
+    durations_frame(merged).to_parquet(state_dir / "durations.parquet", index=False)
+
+
+## Load aggregates saved by save_aggregates (empty if nothing was saved yet)
+# ---------------------------------------------------------
+def load_aggregates(state_dir):
+    state_dir = Path(state_dir)
+    if not (state_dir / "daily.parquet").exists():
+        return empty_aggregates()
+
+    daily = pd.read_parquet(state_dir / "daily.parquet")
+    stations = pd.read_parquet(state_dir / "stations.parquet")
+    routes = pd.read_parquet(state_dir / "routes.parquet")
+    durations = pd.read_parquet(state_dir / "durations.parquet")
+
+    return {
+        "daily": daily.set_index("date")["bike_rides_daily"],
+        "stations": stations.set_index("start_station_name")["value"],
+        "routes": routes.set_index(ROUTE_KEYS),
+        "durations": {col: durations[col].to_numpy() for col in durations.columns if col != "minute"},
+    }
+
+
+## Ledger of the monthly files folded into the saved aggregates
+# ---------------------------------------------------------
+# Keyed by file name and content hash, so a month that is loaded twice (even renamed) is caught.
+LEDGER_COLUMNS = ["file", "sha256", "year", "month"]
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_ledger(state_dir):
+    path = Path(state_dir) / "loaded_files.csv"
+    if not path.exists():
+        return pd.DataFrame(columns=LEDGER_COLUMNS)
+    return pd.read_csv(path, dtype={"file": str, "sha256": str}).fillna({"sha256": ""})
+
+
+def save_ledger(ledger, state_dir):
+    Path(state_dir).mkdir(parents=True, exist_ok=True)
+    ledger[LEDGER_COLUMNS].to_csv(Path(state_dir) / "loaded_files.csv", index=False)
+
+
+## Ledger rows for monthly CSVs (hashed) or for the Parquet files of the trip dataset (not hashed)
+# ---------------------------------------------------------
+def ledger_rows(paths, with_digest=True):
+    rows = []
+    for path in paths:
+        year, month = file_period(path)
+        rows.append({
+            "file": Path(path).stem,
+            "sha256": file_digest(path) if with_digest else "",
+            "year": year,
+            "month": month,
+        })
+    return pd.DataFrame(rows, columns=LEDGER_COLUMNS)
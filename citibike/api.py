@@ -0,0 +1,376 @@
+################################################ CitiBike Aggregates API ################################################
+
+# A small read-only HTTP JSON service for the numbers the dashboard shows, on the standard
+# library only (asyncio streams). The answers come from citibike.queries, the same query layer
+# the dashboard uses.
+#
+#   GET /v1/daily           daily rides and temperature       start, end, season, year
+#   GET /v1/top-stations    top N start stations              n, month, season, rider, start, end, year
+#   GET /v1/top-routes      top N routes with arc widths      n, month, season, rider, band, start, end, year
+#   GET /v1/durations       trip duration percentiles         month, season, rider, start, end, year
+#   GET /v1/station-ranks   top N stations of a year and      year, base_year, n, season, rider
+#                           their rank in base_year
+#   GET /v1/route-ranks     the same for routes               year, base_year, n, season, rider
+#   GET /v1/version         data version of every endpoint
+#
+# Lists are comma separated (season=Summer,Fall; month=202206,202207; year=2022,2023); dates
+# are YYYY-MM-DD.
+#
+# Every response carries an ETag made from the endpoint, the normalized parameters and the
+# version of the files the query reads. A request with a matching If-None-Match gets a 304
+# without running anything, and the same question against the same data is answered from an
+# in-process LRU of response bodies. Misses run in a thread pool, so the event loop keeps
+# serving cached answers and 304s, and concurrent misses for the same key share one run.
+#
+# Usage:
+#   python -m citibike.api --port 8765
+#   curl 'http://127.0.0.1:8765/v1/top-stations?n=10&rider=member&season=Summer'
+#   python -m citibike.api --load-test --clients 64 --requests 20000   (against a running server)
+
+import argparse
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from citibike import queries
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+# Response bodies kept in the LRU
+CACHE_SIZE = 512
+
+MAX_HEADER_BYTES = 16 * 1024
+
+STATUS_TEXT = {200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               503: "Service Unavailable"}
+
+_responses = OrderedDict()
+_pending = {}
+
+################################################ Parameters ################################################
+
+def parse_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_months(value):
+    try:
+        return [int(item) for item in parse_list(value)]
+    except ValueError:
+        raise queries.QueryError(f"month must be YYYYMM, got {value!r}")
+
+
+def parse_date(value):
+    try:
+        return pd.Timestamp(value).strftime("%Y-%m-%d")
+    except ValueError:
+        raise queries.QueryError(f"Dates must be YYYY-MM-DD, got {value!r}")
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise queries.QueryError(f"n must be a whole number, got {value!r}")
+
+
+def parse_years(value):
+    try:
+        return [int(item) for item in parse_list(value)]
+    except ValueError:
+        raise queries.QueryError(f"year must be YYYY, got {value!r}")
+
+
+## Query string parameter -> (query keyword, parser)
+# ---------------------------------------------------------
+PARAMETERS = {
+    "start": ("start", parse_date),
+    "end": ("end", parse_date),
+    "season": ("seasons", lambda value: [item.capitalize() for item in parse_list(value)]),
+    "rider": ("riders", lambda value: [item.lower() for item in parse_list(value)]),
+    "month": ("periods", parse_months),
+    "band": ("bands", lambda value: [item.capitalize() for item in parse_list(value)]),
+    "n": ("n", parse_int),
+    "year": ("years", parse_years),
+    "base_year": ("base_year", parse_years),
+}
+
+################################################ Endpoints ################################################
+
+def records(frame):
+    return json.loads(frame.to_json(orient="records", date_format="iso", date_unit="s"))
+
+
+def daily_endpoint(**kwargs):
+    daily = queries.daily_rides(**kwargs)
+    return {"data": records(daily.assign(date=daily["date"].dt.strftime("%Y-%m-%d")))}
+
+
+def top_stations_endpoint(**kwargs):
+    return {"data": records(queries.top_stations(**kwargs))}
+
+
+def top_routes_endpoint(**kwargs):
+    routes, count_bound = queries.top_routes(**kwargs)
+    return {"count_bound": int(count_bound), "data": records(routes)}
+
+
+def durations_endpoint(**kwargs):
+    return {"unit": "minutes", "window": list(queries.DURATION_WINDOW), "data": queries.duration_stats(**kwargs)}
+
+
+## The year and base year of a rank endpoint (one of each)
+# ---------------------------------------------------------
+def rank_years(years, base_year):
+    if years is None or base_year is None or len(years) != 1 or len(base_year) != 1:
+        raise queries.QueryError("Rank changes need one year and one base_year (year=2023&base_year=2022)")
+    return years[0], base_year[0]
+
+
+def station_ranks_endpoint(years=None, base_year=None, **kwargs):
+    year, base = rank_years(years, base_year)
+    return {"year": year, "base_year": base, "data": records(queries.station_ranks(year, base, **kwargs))}
+
+
+def route_ranks_endpoint(years=None, base_year=None, **kwargs):
+    year, base = rank_years(years, base_year)
+    return {"year": year, "base_year": base, "data": records(queries.route_ranks(year, base, **kwargs))}
+
+
+## Every endpoint: query name (for the data version), parameters it takes, handler
+# ---------------------------------------------------------
+ENDPOINTS = {
+    "/v1/daily": ("daily", ["start", "end", "season", "year"], daily_endpoint),
+    "/v1/top-stations": ("top_stations", ["n", "month", "season", "rider", "start", "end", "year"],
+                         top_stations_endpoint),
+    "/v1/top-routes": ("top_routes", ["n", "month", "season", "rider", "band", "start", "end", "year"],
+                       top_routes_endpoint),
+    "/v1/durations": ("durations", ["month", "season", "rider", "start", "end", "year"], durations_endpoint),
+    "/v1/station-ranks": ("station_ranks", ["year", "base_year", "n", "season", "rider"], station_ranks_endpoint),
+    "/v1/route-ranks": ("route_ranks", ["year", "base_year", "n", "season", "rider"], route_ranks_endpoint),
+}
+
+
+## Parse and normalize the query string of one endpoint
+# ---------------------------------------------------------
+# Returns the keyword arguments and a canonical string of them (the cache and ETag key).
+def endpoint_arguments(path, query_string):
+    _, allowed, _ = ENDPOINTS[path]
+    raw = parse_qs(query_string, keep_blank_values=False)
+    unknown = sorted(set(raw) - set(allowed))
+    if unknown:
+        raise queries.QueryError(f"Unknown parameter(s) {unknown} for {path} (allowed: {allowed})")
+
+    kwargs = {}
+    for name, values in raw.items():
+        keyword, parse = PARAMETERS[name]
+        kwargs[keyword] = parse(",".join(values))
+    canonical = json.dumps({key: sorted(value) if isinstance(value, list) else value
+                            for key, value in kwargs.items()}, sort_keys=True)
+    return kwargs, canonical
+
+
+def etag(path, canonical, version):
+    return '"' + hashlib.sha1(f"{path}?{canonical}@{version}".encode()).hexdigest()[:24] + '"'
+
+
+## Run one query and serialize the response body (in a worker thread)
+# ---------------------------------------------------------
+def run_endpoint(path, kwargs, version):
+    _, _, handler = ENDPOINTS[path]
+    payload = {"version": version, **handler(**kwargs)}
+    return json.dumps(payload, default=lambda value: value.item() if isinstance(value, np.generic) else str(value)).encode()
+
+################################################ Response Cache ################################################
+
+def cache_get(key):
+    body = _responses.get(key)
+    if body is not None:
+        _responses.move_to_end(key)
+    return body
+
+
+def cache_put(key, body):
+    _responses[key] = body
+    _responses.move_to_end(key)
+    while len(_responses) > CACHE_SIZE:
+        _responses.popitem(last=False)
+
+
+## The body for one key: from the LRU, or computed once however many requests wait for it
+# ---------------------------------------------------------
+async def cached_body(key, path, kwargs, version):
+    body = cache_get(key)
+    if body is not None:
+        return body
+    if key not in _pending:
+        loop = asyncio.get_running_loop()
+        _pending[key] = loop.run_in_executor(None, run_endpoint, path, kwargs, version)
+    try:
+        body = await asyncio.shield(_pending[key])
+    finally:
+        future = _pending.get(key)
+        if future is not None and future.done():
+            del _pending[key]
+    cache_put(key, body)
+    return body
+
+################################################ HTTP ################################################
+
+def error_body(status, message):
+    return json.dumps({"error": message, "status": status}).encode()
+
+
+## Answer one request: (status, headers, body)
+# ---------------------------------------------------------
+async def respond(method, target, headers):
+    if method not in ("GET", "HEAD"):
+        return 405, {"Allow": "GET, HEAD"}, error_body(405, "Only GET and HEAD are supported")
+
+    url = urlsplit(target)
+    if url.path == "/v1/version":
+        versions = {path: queries.data_version(query) for path, (query, _, _) in ENDPOINTS.items()}
+        return 200, {"Cache-Control": "no-cache"}, json.dumps(versions).encode()
+    if url.path not in ENDPOINTS:
+        return 404, {}, error_body(404, f"No endpoint {url.path} (try {sorted(ENDPOINTS)})")
+
+    try:
+        kwargs, canonical = endpoint_arguments(url.path, url.query)
+    except queries.QueryError as error:
+        return 400, {}, error_body(400, str(error))
+
+    version = queries.data_version(ENDPOINTS[url.path][0])
+    tag = etag(url.path, canonical, version)
+    cache_headers = {"ETag": tag, "Cache-Control": "no-cache"}
+    if tag in [value.strip() for value in headers.get("if-none-match", "").split(",")]:
+        return 304, cache_headers, b""
+
+    try:
+        body = await cached_body((url.path, canonical, version), url.path, kwargs, version)
+    except queries.QueryError as error:
+        return 400, {}, error_body(400, str(error))
+    except queries.MissingDataError as error:
+        return 503, {}, error_body(503, str(error))
+    return 200, cache_headers, body
+
+
+## Start line, headers (lower-case names) and body of one HTTP message
+# ---------------------------------------------------------
+async def read_message(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0) or 0)
+    body = await reader.readexactly(length) if length else b""
+    return lines[0].split(" ", 2), headers, body
+
+
+## One connection: requests in order until the client closes it (HTTP/1.1 keep-alive)
+# ---------------------------------------------------------
+async def handle_connection(reader, writer):
+    try:
+        while True:
+            try:
+                (method, target, http_version), headers, _ = await read_message(reader)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError):
+                break
+
+            status, extra, body = await respond(method, target, headers)
+            keep_alive = (headers.get("connection", "").lower() != "close"
+                          and (http_version == "HTTP/1.1" or headers.get("connection", "").lower() == "keep-alive"))
+            head = [f"HTTP/1.1 {status} {STATUS_TEXT[status]}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                    "Access-Control-Allow-Origin: *",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+            head += [f"{name}: {value}" for name, value in extra.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = await asyncio.start_server(handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    print(f"CitiBike API on http://{host}:{port} ({', '.join(sorted(ENDPOINTS))})")
+    async with server:
+        await server.serve_forever()
+
+################################################ Load Test ################################################
+
+## One keep-alive client: GET the paths in turn, revalidating with the last ETag of each
+# ---------------------------------------------------------
+async def load_client(host, port, paths, count, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    tags = {}
+    try:
+        for i in range(count):
+            path = paths[i % len(paths)]
+            conditional = f"If-None-Match: {tags[path]}\r\n" if path in tags else ""
+            started = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n{conditional}\r\n".encode())
+            await writer.drain()
+            (_, status, _), headers, _ = await read_message(reader)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if "etag" in headers:
+                tags[path] = headers["etag"]
+            statuses.append(int(status))
+    finally:
+        writer.close()
+
+
+## Many concurrent clients; requests per second, latency percentiles and status counts
+# ---------------------------------------------------------
+async def load_test(host=DEFAULT_HOST, port=DEFAULT_PORT, paths=None, clients=64, requests=20_000):
+    paths = paths or ["/v1/daily?season=Summer", "/v1/top-stations?n=20", "/v1/top-stations?n=10&rider=member",
+                      "/v1/top-routes?n=100", "/v1/durations?season=Winter"]
+    latencies, statuses = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        load_client(host, port, paths, requests // clients, latencies, statuses) for _ in range(clients)
+    ])
+    seconds = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "requests_per_s": len(latencies) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "statuses": pd.Series(statuses).value_counts().to_dict(),
+    }
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the dashboard's aggregates as JSON over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--load-test", action="store_true", help="Load-test a running server instead")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    if args.load_test:
+        print(asyncio.run(load_test(args.host, args.port, clients=args.clients, requests=args.requests)))
+    else:
+        asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+################################################ CitiBike Benchmarks ################################################
+
+# Scale benchmarks for the whole pipeline on synthetic trips (citibike.synthetic), so a change
+# to the ingest, the aggregations or a dashboard page can be checked for speed and memory.
+#
+# Cases, in order (each one reads what the ones before it wrote into the work folder):
+#   pipeline   ingest, aggregates, daily / stations / routes tables, duration histogram and
+#              sketches, ride cube, route index, station flows, time series, forecast
+#   pages      the data path behind each CitiBike_dashboard_Part2.py page: the cold load of its
+#              files, then its filter / query calls repeated over a set of filter choices
+#
+# Every case runs in a fresh process, so its peak RSS is its own. Pipeline cases report
+# seconds and rows per second; page cases report the load time and p50 / p95 latency.
+#
+# Runs are appended to 02_Data/Benchmarks/history.jsonl. --save-baseline stores a run as the
+# baseline for its size (baseline_1M.json, ...); every run is compared against it, and
+# --check exits with an error when a case got slower or bigger than the tolerance allows.
+# Baselines only compare runs on the same machine.
+#
+# Usage:
+#   python -m citibike.bench --rows 1000000 --save-baseline
+#   python -m citibike.bench --rows 1000000 --check
+#   python -m citibike.bench --rows 10000000 --cases ingest aggregates
+#   python -m citibike.bench --rows 100000000 --pipeline-only
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import platform
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from citibike import (aggregates, cube, data, forecast, prepare, rebalancing, route_index, sketches, spatial, synthetic,
+                      timeseries)
+from citibike.ingest import ingest_folder, open_trips
+from citibike.paths import DATA_DIR
+
+BENCH_DIR = DATA_DIR / "Benchmarks"
+HISTORY_PATH = BENCH_DIR / "history.jsonl"
+
+DEFAULT_REPEATS = 20
+
+# Allowed slowdown / memory growth against the baseline before --check fails
+DEFAULT_TOLERANCE = 0.15
+
+################################################ Work Folder ################################################
+
+def size_label(rows):
+    for scale, suffix in [(1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K")]:
+        if rows >= scale and rows % scale == 0:
+            return f"{rows // scale}{suffix}"
+    return str(rows)
+
+
+## Paths of one benchmark size: the synthetic source and everything built from it
+# ---------------------------------------------------------
+def workspace(rows, seed=0, bench_dir=BENCH_DIR):
+    root = Path(bench_dir) / f"{size_label(rows)}_seed{seed}"
+    return {
+        "root": root,
+        "source": root / "source",
+        "weather": synthetic.weather_path(root / "source"),
+        "dataset": root / "dataset",
+        "aggregates": root / "aggregates",
+        "daily": root / "daily_sub_df.csv",
+        "top_stations": root / "top_stations_df.csv",
+        "top_routes": root / "top500_routes.csv",
+        "duration_hist": root / "tripduration_hist.csv",
+        "sketches": root / "tripduration_sketches.parquet",
+        "cube": root / "cube",
+        "route_index": root / "route_index.parquet",
+        "route_stations": root / "route_stations.parquet",
+        "flows": root / "station_flows.parquet",
+        "flow_stations": root / "flow_stations.parquet",
+        "timeseries": root / "rides_timeseries.parquet",
+        "forecast": root / "demand_forecast.csv",
+    }
+
+
+## Generate the synthetic source unless the same rows, seed and generator code are there
+# ---------------------------------------------------------
+def ensure_source(paths, rows, seed=0):
+    stamp = {"rows": rows, "seed": seed,
+             "generator": hashlib.sha256(Path(synthetic.__file__).read_bytes()).hexdigest()}
+    stamp_path = paths["root"] / "source.json"
+    if stamp_path.exists() and json.loads(stamp_path.read_text()) == stamp:
+        return False
+    for old in paths["source"].glob("*.csv") if paths["source"].exists() else []:
+        old.unlink()
+    synthetic.generate(paths["source"], rows, seed=seed)
+    stamp_path.write_text(json.dumps(stamp))
+    return True
+
+################################################ Pipeline Cases ################################################
+
+# Each case takes the workspace paths and returns the rows it processed.
+
+def dataset_rows(paths):
+    return open_trips(paths["dataset"]).count_rows()
+
+
+def case_ingest(paths):
+    for old in sorted(paths["dataset"].rglob("*"), reverse=True) if paths["dataset"].exists() else []:
+        old.unlink() if old.is_file() else old.rmdir()
+    return int(ingest_folder(paths["source"], paths["dataset"])["rows"].sum())
+
+
+def case_aggregates(paths):
+    merged = aggregates.dataset_aggregates(None, None, paths["dataset"])
+    aggregates.save_aggregates(merged, paths["aggregates"])
+    return dataset_rows(paths)
+
+
+def case_daily(paths):
+    merged = aggregates.load_aggregates(paths["aggregates"])
+    daily = prepare.build_daily_sub_df(aggregates.daily_frame(merged), prepare.load_weather(paths["weather"]))
+    daily.to_csv(paths["daily"], index=False, date_format="%Y-%m-%d")
+    return len(daily)
+
+
+def case_stations(paths):
+    merged = aggregates.load_aggregates(paths["aggregates"])
+    stations = aggregates.stations_frame(merged)
+    prepare.build_top_stations(stations).to_csv(paths["top_stations"], index=False)
+    return len(stations)
+
+
+def case_routes(paths):
+    merged = aggregates.load_aggregates(paths["aggregates"])
+    routes = aggregates.routes_frame(merged)
+    prepare.build_top_routes(routes).to_csv(paths["top_routes"], index=False)
+    return len(routes)
+
+
+def case_duration_hist(paths):
+    merged = aggregates.load_aggregates(paths["aggregates"])
+    aggregates.durations_frame(merged).to_csv(paths["duration_hist"], index=False)
+    return dataset_rows(paths)
+
+
+def case_duration_sketches(paths):
+    sketches.write_sketches(sketches.build_sketches(paths["dataset"]), paths["sketches"])
+    return dataset_rows(paths)
+
+
+def case_cube(paths):
+    cube.build_cube(paths["dataset"], paths["cube"])
+    return dataset_rows(paths)
+
+
+def case_route_index(paths):
+    index = route_index.build_route_index(paths["dataset"])
+    route_index.write_route_index(index, paths["dataset"], paths["route_index"], paths["route_stations"])
+    return dataset_rows(paths)
+
+
+def case_flows(paths):
+    flows = rebalancing.build_flows(paths["dataset"])
+    rebalancing.write_flows(flows, paths["dataset"], paths["flows"], paths["flow_stations"])
+    return dataset_rows(paths)
+
+
+def case_timeseries(paths):
+    series = timeseries.build_series(data.read_daily(paths["daily"]), cube.load_cube(paths["cube"]))
+    timeseries.write_series(series, paths["timeseries"])
+    return sum(len(frame) for frame in series.values())
+
+
+def case_forecast(paths):
+    demand = forecast.demand_matrix(data.read_daily(paths["daily"]), pd.read_parquet(paths["flows"]),
+                                    pd.read_parquet(paths["flow_stations"]))
+    forecasts = forecast.forecast(demand, forecast.load_regressors(paths["weather"]))
+    forecasts.to_csv(paths["forecast"], index=False, date_format="%Y-%m-%d")
+    return demand.shape[1]
+
+################################################ Page Cases ################################################
+
+# Each page case returns (load, queries): load() reads the page's files the way the dashboard
+# does, queries is a list of calls on what load() returned, timed one by one.
+
+def month_choices(periods):
+    periods = sorted(periods)
+    return [None, [periods[0]], [periods[len(periods) // 2]], periods[-3:]]
+
+
+def page_daily(paths):
+    def load():
+        daily = data.load_daily(paths["daily"])
+        return data.load_timeseries(paths["timeseries"]) or timeseries.build_series(daily)
+
+    def view(series, days):
+        last = series["day"]["time"].iloc[-1]
+        start = None if days is None else last - pd.Timedelta(days=days)
+        return timeseries.chart_view(series, start=start, end=last)
+
+    return load, [lambda series, days=days: view(series, days) for days in [None, 180, 30, 7]]
+
+
+def page_trip_duration(paths):
+    def box(table, seasons):
+        return {rider: sketches.box_stats(sketch, low=1, high=65)
+                for rider, sketch in sketches.sketch_by_rider(table, seasons=seasons).items()}
+
+    def load():
+        return data.load_duration_sketches(paths["sketches"])
+
+    return load, [lambda table, seasons=seasons: box(table, seasons) for seasons in [None, ["Summer"], ["Winter", "Fall"]]]
+
+
+def page_top_stations(paths):
+    def load():
+        return data.load_cube(paths["cube"])
+
+    def query(ride_cube, pick, riders):
+        periods = month_choices(ride_cube["station_months"]["period"].unique())[pick]
+        return cube.top_stations(ride_cube, n=20, periods=periods, riders=riders)
+
+    return load, [lambda ride_cube, pick=pick, riders=riders: query(ride_cube, pick, riders)
+                  for pick in range(4) for riders in [None, ["member"]]]
+
+
+def page_trip_hotspots(paths):
+    def load():
+        return data.load_route_index(paths["route_index"], paths["route_stations"])
+
+    def query(index, n, riders, bands):
+        return route_index.top_arcs(index["routes"], index["stations"], n=n, riders=riders, bands=bands)
+
+    return load, [lambda index, n=n, riders=riders, bands=bands: query(index, n, riders, bands)
+                  for n in [500, 1000] for riders in [None, ["casual"]] for bands in [None, route_index.BAND_NAMES[:1]]]
+
+
+def page_station_density(paths):
+    def load():
+        ride_cube = data.load_cube(paths["cube"])
+        return {"cube": ride_cube, "index": spatial.build_index(ride_cube["stations"])}
+
+    def density(loaded, size_m):
+        rides = spatial.station_rides(loaded["cube"])
+        cells = spatial.hex_density(rides["lat"], rides["lng"], size_m, weights=rides["rides"],
+                                    origin=loaded["index"]["origin"])
+        busiest = rides.sort_values("rides", ascending=False)["station_name"].iloc[0]
+        return cells, spatial.stations_near(loaded["index"], busiest, radius_m=500)
+
+    return load, [lambda loaded, size_m=size_m: density(loaded, size_m) for size_m in [300, 600, 1200]]
+
+
+def page_station_rebalancing(paths):
+    def load():
+        return data.load_station_flows(paths["flows"], paths["flow_stations"])
+
+    def simulate(flows, seasons, capacity):
+        summary, _ = rebalancing.simulate(flows["flows"], capacity=capacity, seasons=seasons)
+        return rebalancing.worst_stations(summary, flows["stations"], n=20)
+
+    return load, [lambda flows, seasons=seasons, capacity=capacity: simulate(flows, seasons, capacity)
+                  for seasons in [None, ["Summer"]] for capacity in [20, 40]]
+
+
+def page_insights(paths):
+    def load():
+        return data.load_forecast(paths["forecast"])
+
+    def outlook(forecasts):
+        next_day = forecasts[(forecasts["series"] != forecast.SYSTEM) & (forecasts["horizon_days"] == 1)]
+        return next_day.nlargest(10, "forecast")
+
+    return load, [outlook]
+
+################################################ Cases ################################################
+
+## Every case: kind ("pipeline" or "page") and function
+# ---------------------------------------------------------
+CASES = {
+    "ingest": ("pipeline", case_ingest),
+    "aggregates": ("pipeline", case_aggregates),
+    "daily": ("pipeline", case_daily),
+    "stations": ("pipeline", case_stations),
+    "routes": ("pipeline", case_routes),
+    "duration_hist": ("pipeline", case_duration_hist),
+    "duration_sketches": ("pipeline", case_duration_sketches),
+    "cube": ("pipeline", case_cube),
+    "route_index": ("pipeline", case_route_index),
+    "flows": ("pipeline", case_flows),
+    "timeseries": ("pipeline", case_timeseries),
+    "forecast": ("pipeline", case_forecast),
+    "page_daily_rides_vs_weather": ("page", page_daily),
+    "page_trip_duration": ("page", page_trip_duration),
+    "page_top_stations": ("page", page_top_stations),
+    "page_trip_hotspots": ("page", page_trip_hotspots),
+    "page_station_density": ("page", page_station_density),
+    "page_station_rebalancing": ("page", page_station_rebalancing),
+    "page_insights": ("page", page_insights),
+}
+
+
+## Peak resident memory of this process in MB
+# ---------------------------------------------------------
+# VmHWM on Linux: ru_maxrss survives exec, so a spawned worker would report its parent's peak.
+def peak_rss_mb():
+    status = Path("/proc/self/status")
+    if status.exists():
+        for line in status.read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+## Run one case (in its own process)
+# ---------------------------------------------------------
+def run_case(name, paths, repeats=DEFAULT_REPEATS):
+    kind, case = CASES[name]
+    if kind == "pipeline":
+        started = time.perf_counter()
+        rows = case(paths)
+        seconds = time.perf_counter() - started
+        return {"kind": kind, "seconds": seconds, "rows": rows, "rows_per_s": rows / seconds if seconds else None,
+                "peak_rss_mb": peak_rss_mb()}
+
+    load, queries = case(paths)
+    started = time.perf_counter()
+    loaded = load()
+    load_ms = (time.perf_counter() - started) * 1000
+
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            started = time.perf_counter()
+            query(loaded)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return {"kind": kind, "load_ms": load_ms, "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)), "queries": len(latencies), "peak_rss_mb": peak_rss_mb()}
+
+
+## Run the cases in order, each in a fresh process
+# ---------------------------------------------------------
+# A failed case is recorded and the run carries on.
+def run_suite(rows, seed=0, names=None, repeats=DEFAULT_REPEATS, bench_dir=BENCH_DIR, log=print):
+    paths = workspace(rows, seed, bench_dir)
+    paths["root"].mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    if ensure_source(paths, rows, seed):
+        log(f"[bench] generated {rows:,} synthetic trips in {time.perf_counter() - started:.1f} s")
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in names or CASES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(run_case, name, paths, repeats).result()
+            except Exception as error:
+                results[name] = {"kind": CASES[name][0], "error": repr(error)}
+        log(f"[bench] {name}: {describe(results[name])}")
+
+    return {
+        "label": size_label(rows), "rows": rows, "seed": seed, "repeats": repeats,
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": multiprocessing.cpu_count()},
+        "cases": results,
+    }
+
+
+def describe(result):
+    if "error" in result:
+        return f"failed: {result['error']}"
+    if result["kind"] == "pipeline":
+        return (f"{result['seconds']:.2f} s, {result['rows_per_s'] or 0:,.0f} rows/s, "
+                f"peak {result['peak_rss_mb']:,.0f} MB")
+    return (f"load {result['load_ms']:.0f} ms, p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, "
+            f"peak {result['peak_rss_mb']:,.0f} MB")
+
+################################################ Baseline ################################################
+
+def baseline_path(label, bench_dir=BENCH_DIR):
+    return Path(bench_dir) / f"baseline_{label}.json"
+
+
+def save_run(run, path):
+    path = Path(path)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(run, indent=1))
+    tmp_path.replace(path)
+
+
+def append_history(run, path=HISTORY_PATH):
+    with open(path, "a") as f:
+        f.write(json.dumps(run) + "\n")
+
+
+## Compare a run with a baseline: one row per case and metric
+# ---------------------------------------------------------
+# Time is seconds (pipeline) or p50 / p95 (pages); ratio > 1 + tolerance is a regression,
+# for time and for peak RSS alike.
+def compare(run, baseline, tolerance=DEFAULT_TOLERANCE):
+    rows = []
+    for name, result in run["cases"].items():
+        before = baseline["cases"].get(name)
+        if before is None or "error" in before or "error" in result:
+            rows.append({"case": name, "metric": "-", "baseline": np.nan, "now": np.nan, "ratio": np.nan,
+                         "status": "failed" if "error" in result else "no baseline"})
+            continue
+        metrics = ["seconds"] if result["kind"] == "pipeline" else ["load_ms", "p50_ms", "p95_ms"]
+        for metric in metrics + ["peak_rss_mb"]:
+            ratio = result[metric] / before[metric] if before[metric] else np.nan
+            status = ("slower" if metric != "peak_rss_mb" else "bigger") if ratio > 1 + tolerance else (
+                ("faster" if metric != "peak_rss_mb" else "smaller") if ratio < 1 - tolerance else "same")
+            rows.append({"case": name, "metric": metric, "baseline": before[metric], "now": result[metric],
+                         "ratio": ratio, "status": status})
+    return pd.DataFrame(rows)
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline and the dashboard pages on synthetic trips.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic trips (1000000, 10000000, 100000000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cases", nargs="*", choices=list(CASES), help="Only these cases (in suite order)")
+    parser.add_argument("--pipeline-only", action="store_true", help="Skip the page cases")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="Rounds of each page's queries")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the baseline for its size")
+    parser.add_argument("--baseline", help="Compare against this file (default: baseline_<size>.json)")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--check", action="store_true", help="Exit with an error on a regression or a failed case")
+    parser.add_argument("--dir", default=BENCH_DIR, help="Work folder, baselines and history (default: 02_Data/Benchmarks)")
+    args = parser.parse_args()
+
+    names = [name for name in CASES if name in (args.cases or CASES)]
+    if args.pipeline_only:
+        names = [name for name in names if CASES[name][0] == "pipeline"]
+
+    bench_dir = Path(args.dir)
+    bench_dir.mkdir(parents=True, exist_ok=True)
+    run = run_suite(args.rows, args.seed, names, args.repeats, bench_dir)
+    append_history(run, bench_dir / HISTORY_PATH.name)
+
+    baseline_file = Path(args.baseline) if args.baseline else baseline_path(run["label"], bench_dir)
+    if args.save_baseline:
+        save_run(run, baseline_file)
+        print(f"Saved the baseline: {baseline_file}")
+    elif baseline_file.exists():
+        comparison = compare(run, json.loads(baseline_file.read_text()), args.tolerance)
+        print(comparison.round(3).to_string(index=False))
+        if args.check and comparison["status"].isin(["slower", "bigger", "failed"]).any():
+            raise SystemExit(f"Regression against {baseline_file}")
+    else:
+        print(f"No baseline for {run['label']} yet (--save-baseline stores one)")
+
+    failed = [name for name, result in run["cases"].items() if "error" in result]
+    if args.check and failed:
+        raise SystemExit(f"Failed cases: {failed}")
+
+
+if __name__ == "__main__":
+    main()
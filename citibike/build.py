@@ -0,0 +1,461 @@
+################################################ CitiBike Build Pipeline ################################################
+
+# One command that rebuilds every artifact in 02_Data (and the static charts) headlessly, replacing the hand-run chain
+# of Exercise 2.2 - 2.7 and Top500Trips.ipynb (and their Windows paths).
+#
+# Every stage declares its upstream stages, its external input files, the parameters and the
+# citibike modules it uses, and its outputs. A stage's key is a hash of all of these (input
+# files by content, upstream stages by their keys), so it only runs again when something it
+# depends on changed, or when one of its outputs was deleted or modified since it last ran.
+# Content hashes of input files are remembered by size and modification time, so a no-op
+# rebuild only stats the files. Stages whose upstream stages are done run concurrently in a
+# process pool.
+#
+# Without --weather-start / --weather-end the NOAA download is left out, and the daily stage
+# needs an existing weather_df.csv as its input file (the build stops up front when it is missing).
+# The keys of the last successful runs are kept in 02_Data/build_state.json.
+#
+# Usage:
+#   python -m citibike.build --source 02_Data/Original_Data/2022_citibike_tripdata
+#   python -m citibike.build --source <folder> --weather-start 2022-01-01 --weather-end 2022-12-31
+#   python -m citibike.build --weather-start 2019-01-01 --weather-end 2023-12-31   (every year in Original_Data)
+#   python -m citibike.build --dry-run                  (list the stages that would run)
+#   python -m citibike.build --stages daily map --force
+
+import argparse
+import hashlib
+import importlib.util
+import inspect
+import json
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pandas as pd
+
+from citibike import (aggregates, cube, forecast, heavy_hitters, integrity, prepare, rebalancing, render, route_index,
+                      sketches, store, timeseries)
+from citibike.data import DAILY_PATH, TOP_ROUTES_PATH, TOP_STATIONS_PATH, read_daily
+from citibike.ingest import ingest_folder, list_monthly_files
+from citibike.paths import (AGGREGATES_DIR, CUBE_DIR, DATA_DIR, ORIGINAL_DIR, PREPARED_DIR, STORE_DIR, TRIPS_DATASET_DIR,
+                            VISUALS_DIR)
+from citibike.weather import WEATHER_PATH, load_noaa_weather
+
+BUILD_STATE_PATH = DATA_DIR / "build_state.json"
+
+# Every monthly tripdata CSV below it (any year, in any subfolder) is ingested
+DEFAULT_SOURCE = ORIGINAL_DIR
+
+DURATION_HIST_PATH = PREPARED_DIR / "tripduration_hist.csv"
+MAP_ROUTES_PATH = PREPARED_DIR / "top500_routes_v2.csv"
+
+################################################ Stage Actions ################################################
+
+# Each action takes the build parameters and runs in a worker process.
+
+def run_ingest(params):
+    # A fresh dataset, so months removed from the source folder disappear too
+    shutil.rmtree(TRIPS_DATASET_DIR, ignore_errors=True)
+    ingest_folder(params["source"], TRIPS_DATASET_DIR, drop_invalid=params["drop_invalid"])
+
+
+def run_weather(params):
+    weather = load_noaa_weather(params["weather_start"], params["weather_end"], offline=params["offline"])
+    weather.to_csv(WEATHER_PATH, index=False, date_format="%Y-%m-%d")
+
+
+def run_aggregates(params):
+    merged = aggregates.dataset_aggregates(params["years"], None, TRIPS_DATASET_DIR)
+    aggregates.save_aggregates(merged, AGGREGATES_DIR)
+    files = prepare.dataset_files(TRIPS_DATASET_DIR, params["years"])
+    aggregates.save_ledger(aggregates.ledger_rows(files, with_digest=False), AGGREGATES_DIR)
+
+
+def run_daily(params):
+    merged = aggregates.load_aggregates(AGGREGATES_DIR)
+    daily_sub_df = prepare.build_daily_sub_df(aggregates.daily_frame(merged), prepare.daily_weather(WEATHER_PATH))
+    daily_sub_df.to_csv(DAILY_PATH, index=False, date_format="%Y-%m-%d")
+
+
+def run_stations(params):
+    merged = aggregates.load_aggregates(AGGREGATES_DIR)
+    prepare.build_top_stations(aggregates.stations_frame(merged)).to_csv(TOP_STATIONS_PATH, index=False)
+
+
+def run_routes(params):
+    merged = aggregates.load_aggregates(AGGREGATES_DIR)
+    prepare.build_top_routes(aggregates.routes_frame(merged)).to_csv(TOP_ROUTES_PATH, index=False)
+
+
+## Top stations and routes per month, season and rider type (the heavy-hitter engine)
+# ---------------------------------------------------------
+def run_slices(params):
+    heavy_hitters.run(dataset_dir=TRIPS_DATASET_DIR, years=params["years"])
+
+
+def run_durations(params):
+    merged = aggregates.load_aggregates(AGGREGATES_DIR)
+    aggregates.durations_frame(merged).to_csv(DURATION_HIST_PATH, index=False)
+
+
+def run_sketches(params):
+    sketches.write_sketches(sketches.build_sketches(TRIPS_DATASET_DIR, params["years"]))
+
+
+## The routes with arc widths, as loaded into kepler.gl for the Trip Hotspots export
+# ---------------------------------------------------------
+def run_map(params):
+    routes = pd.read_csv(TOP_ROUTES_PATH)
+    routes["stroke_width"] = route_index.stroke_width(routes["trip_count"])
+    routes.to_csv(MAP_ROUTES_PATH, index=False)
+
+
+def run_route_index(params):
+    index = route_index.build_route_index(TRIPS_DATASET_DIR, params["years"])
+    route_index.write_route_index(index, TRIPS_DATASET_DIR)
+
+
+def run_cube(params):
+    cube.build_cube(TRIPS_DATASET_DIR, CUBE_DIR, params["years"])
+
+
+def run_flows(params):
+    flows = rebalancing.build_flows(TRIPS_DATASET_DIR, params["years"])
+    rebalancing.write_flows(flows, TRIPS_DATASET_DIR)
+
+
+def run_timeseries(params):
+    timeseries.write_series(timeseries.build_series(read_daily(DAILY_PATH), cube.load_cube(CUBE_DIR)))
+
+
+def run_forecast(params):
+    flows = pd.read_parquet(rebalancing.FLOWS_PATH)
+    stations = pd.read_parquet(rebalancing.FLOW_STATIONS_PATH)
+    demand = forecast.demand_matrix(read_daily(DAILY_PATH), flows, stations)
+    forecasts = forecast.forecast(demand, forecast.load_regressors())
+    forecasts.to_csv(forecast.FORECAST_PATH, index=False, date_format="%Y-%m-%d")
+
+
+def run_integrity(params):
+    report = integrity.integrity_report(TRIPS_DATASET_DIR, prepare.load_weather(), params["years"])
+    report.to_csv(integrity.INTEGRITY_PATH, index=False)
+
+
+def run_store(params):
+    store.export_store()
+
+
+## Static chart images; fails when the dashboard shows an image that does not exist
+# ---------------------------------------------------------
+def run_render(params):
+    render.render_all()
+    render.check_assets()
+
+################################################ Stages ################################################
+
+## The build graph
+# ---------------------------------------------------------
+#   deps     upstream stages (their outputs are covered by their keys)
+#   inputs   external files, from the build parameters
+#   params   build parameters that change the result
+#   modules  citibike modules whose source changes the result
+#   outputs  files or folders the stage writes
+STAGES = {
+    "ingest": {
+        "deps": [], "inputs": lambda params: list_monthly_files(params["source"]),
+        "params": ["drop_invalid"], "modules": ["ingest", "clean", "stations", "integrity"],
+        "outputs": [TRIPS_DATASET_DIR], "run": run_ingest,
+    },
+    "weather": {
+        "deps": [], "inputs": lambda params: [],
+        "params": ["weather_start", "weather_end"], "modules": ["weather"],
+        "outputs": [WEATHER_PATH], "run": run_weather,
+    },
+    "aggregates": {
+        "deps": ["ingest"], "inputs": lambda params: [],
+        "params": ["years"], "modules": ["aggregates", "ingest"],
+        "outputs": [AGGREGATES_DIR], "run": run_aggregates,
+    },
+    "daily": {
+        "deps": ["aggregates", "weather"], "inputs": lambda params: [WEATHER_PATH],
+        "params": [], "modules": ["prepare", "aggregates"],
+        "outputs": [DAILY_PATH], "run": run_daily,
+    },
+    "stations": {
+        "deps": ["aggregates"], "inputs": lambda params: [],
+        "params": [], "modules": ["prepare", "aggregates"],
+        "outputs": [TOP_STATIONS_PATH], "run": run_stations,
+    },
+    "routes": {
+        "deps": ["aggregates"], "inputs": lambda params: [],
+        "params": [], "modules": ["prepare", "aggregates"],
+        "outputs": [TOP_ROUTES_PATH], "run": run_routes,
+    },
+    "durations": {
+        "deps": ["aggregates"], "inputs": lambda params: [],
+        "params": [], "modules": ["aggregates"],
+        "outputs": [DURATION_HIST_PATH], "run": run_durations,
+    },
+    "sketches": {
+        "deps": ["ingest"], "inputs": lambda params: [],
+        "params": ["years"], "modules": ["sketches", "ingest"],
+        "outputs": [sketches.SKETCHES_PATH], "run": run_sketches,
+    },
+    "slices": {
+        "deps": ["ingest"], "inputs": lambda params: [],
+        "params": ["years"], "modules": ["heavy_hitters", "ingest"],
+        "outputs": [heavy_hitters.TOP_BY_SLICE_PATH], "run": run_slices,
+    },
+    "map": {
+        "deps": ["routes"], "inputs": lambda params: [],
+        "params": [], "modules": ["route_index"],
+        "outputs": [MAP_ROUTES_PATH], "run": run_map,
+    },
+    "route_index": {
+        "deps": ["ingest"], "inputs": lambda params: [],
+        "params": ["years"], "modules": ["route_index", "ingest"],
+        "outputs": [route_index.ROUTE_INDEX_PATH, route_index.ROUTE_STATIONS_PATH], "run": run_route_index,
+    },
+    "cube": {
+        "deps": ["ingest"], "inputs": lambda params: [],
+        "params": ["years"], "modules": ["cube", "ingest"],
+        "outputs": [CUBE_DIR / f"{name}.parquet" for name in ["stations", *cube.ROLLUPS]], "run": run_cube,
+    },
+    "flows": {
+        "deps": ["ingest"], "inputs": lambda params: [],
+        "params": ["years"], "modules": ["rebalancing", "ingest"],
+        "outputs": [rebalancing.FLOWS_PATH, rebalancing.FLOW_STATIONS_PATH], "run": run_flows,
+    },
+    "timeseries": {
+        "deps": ["daily", "cube"], "inputs": lambda params: [],
+        "params": [], "modules": ["timeseries"],
+        "outputs": [timeseries.TIMESERIES_PATH], "run": run_timeseries,
+    },
+    "forecast": {
+        "deps": ["daily", "flows", "weather"], "inputs": lambda params: [WEATHER_PATH],
+        "params": [], "modules": ["forecast"],
+        "outputs": [forecast.FORECAST_PATH], "run": run_forecast,
+    },
+    "integrity": {
+        "deps": ["ingest", "weather", "daily"], "inputs": lambda params: [WEATHER_PATH],
+        "params": ["years"], "modules": ["integrity", "prepare"],
+        "outputs": [integrity.INTEGRITY_PATH], "run": run_integrity,
+    },
+    "store": {
+        "deps": ["sketches", "route_index", "cube", "flows", "timeseries"], "inputs": lambda params: [],
+        "params": [], "modules": ["store"],
+        "outputs": [STORE_DIR], "run": run_store,
+    },
+    "render": {
+        "deps": ["daily", "stations", "durations"], "inputs": lambda params: render.dashboard_sources(),
+        "params": [], "modules": ["render"],
+        "outputs": [VISUALS_DIR], "run": run_render,
+    },
+}
+
+################################################ Hashing ################################################
+
+## Content hash of a file, reused while its size and modification time are unchanged
+# ---------------------------------------------------------
+def file_hash(path, digests):
+    path = Path(path)
+    if not path.exists():
+        return "missing"
+    stat = path.stat()
+    signature = [stat.st_size, stat.st_mtime_ns]
+    cached = digests.get(str(path))
+    if cached is not None and cached["signature"] == signature:
+        return cached["sha256"]
+    sha256 = aggregates.file_digest(path)
+    digests[str(path)] = {"signature": signature, "sha256": sha256}
+    return sha256
+
+
+## Size and modification time of every file an output consists of (detects edits and deletes)
+# ---------------------------------------------------------
+def output_signature(outputs):
+    signature = []
+    for output in outputs:
+        output = Path(output)
+        files = sorted(p for p in output.rglob("*") if p.is_file()) if output.is_dir() else [output]
+        for path in files:
+            if not path.exists():
+                return None
+            stat = path.stat()
+            signature.append([str(path), stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+def source_hash(module):
+    return hashlib.sha256(Path(importlib.util.find_spec(f"citibike.{module}").origin).read_bytes()).hexdigest()
+
+
+## Key of every selected stage, in dependency order
+# ---------------------------------------------------------
+# Input files written by a stage in the graph are left to that stage's key.
+def stage_keys(stages, params, digests):
+    produced = {str(Path(output)) for stage in stages.values() for output in stage["outputs"]}
+    keys = {}
+    for name in topological_order(stages):
+        stage = stages[name]
+        parts = {
+            "action": inspect.getsource(stage["run"]),
+            "modules": {module: source_hash(module) for module in stage["modules"]},
+            "params": {param: str(params[param]) for param in stage["params"]},
+            "deps": {dep: keys[dep] for dep in stage["deps"] if dep in stages},
+            "inputs": {str(path): file_hash(path, digests) for path in stage["inputs"](params)
+                       if str(Path(path)) not in produced},
+        }
+        keys[name] = hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+    return keys
+
+################################################ Scheduling ################################################
+
+def topological_order(stages):
+    order, seen = [], set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in stages[name]["deps"]:
+            if dep in stages:
+                visit(dep)
+        order.append(name)
+
+    for name in stages:
+        visit(name)
+    return order
+
+
+## The stages to consider: the targets and everything upstream of them
+# ---------------------------------------------------------
+def select_stages(targets=None, weather=True):
+    stages = {name: stage for name, stage in STAGES.items() if weather or name != "weather"}
+    if not targets:
+        return stages
+    selected = set()
+    pending = list(targets)
+    while pending:
+        name = pending.pop()
+        if name in stages and name not in selected:
+            selected.add(name)
+            pending.extend(stages[name]["deps"])
+    return {name: stage for name, stage in stages.items() if name in selected}
+
+
+def load_state(path=BUILD_STATE_PATH):
+    if not Path(path).exists():
+        return {"stages": {}, "digests": {}}
+    return json.loads(Path(path).read_text())
+
+
+def save_state(state, path=BUILD_STATE_PATH):
+    path = Path(path)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(state, indent=1))
+    tmp_path.replace(path)
+
+
+## Stages that need to run: new key, missing or changed outputs, or forced
+# ---------------------------------------------------------
+def stale_stages(stages, keys, state, force=()):
+    stale = set()
+    for name in topological_order(stages):
+        recorded = state["stages"].get(name, {})
+        if (name in force or recorded.get("key") != keys[name]
+                or recorded.get("outputs") != output_signature(stages[name]["outputs"])):
+            stale.add(name)
+    return stale
+
+
+## Run the stale stages, each as soon as its upstream stages are done
+# ---------------------------------------------------------
+# A failed stage is reported and its downstream stages are skipped; the others carry on.
+# Returns {stage: (status, seconds)}.
+def run_build(stages, params, state, force=(), jobs=None, dry_run=False, log=print):
+    keys = stage_keys(stages, params, state["digests"])
+    stale = stale_stages(stages, keys, state, force)
+    report = {name: ("up to date", 0.0) for name in stages if name not in stale}
+    if dry_run:
+        report.update({name: ("would run", 0.0) for name in stale})
+        return report
+
+    done = set(report)
+    failed = set()
+    running = {}
+    started = {}
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        while len(done) + len(failed) < len(stages):
+            for name in topological_order(stages):
+                deps = [dep for dep in stages[name]["deps"] if dep in stages]
+                if name in done or name in failed or name in running.values():
+                    continue
+                if any(dep in failed for dep in deps):
+                    failed.add(name)
+                    report[name] = ("skipped", 0.0)
+                elif all(dep in done for dep in deps):
+                    log(f"[build] {name}: running")
+                    started[name] = time.perf_counter()
+                    running[pool.submit(stages[name]["run"], params)] = name
+            if not running:
+                continue
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                seconds = time.perf_counter() - started[name]
+                if future.exception() is not None:
+                    failed.add(name)
+                    report[name] = (f"failed: {future.exception()!r}", seconds)
+                    log(f"[build] {name}: failed after {seconds:.1f} s: {future.exception()!r}")
+                    continue
+                done.add(name)
+                report[name] = ("built", seconds)
+                state["stages"][name] = {"key": keys[name], "outputs": output_signature(stages[name]["outputs"])}
+                save_state(state)
+                log(f"[build] {name}: built in {seconds:.1f} s")
+    return report
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the 02_Data artifacts, skipping stages that are up to date.")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help="Folder holding the monthly tripdata CSVs (searched with its subfolders)")
+    parser.add_argument("--years", type=int, nargs="*", help="Only use these years")
+    parser.add_argument("--drop-invalid", action="store_true", help="Drop trips the cleaning stage rejects")
+    parser.add_argument("--weather-start", help="Download NOAA weather from this date (YYYY-MM-DD)")
+    parser.add_argument("--weather-end", help="... up to this date")
+    parser.add_argument("--offline", action="store_true", help="Only use cached weather responses")
+    parser.add_argument("--stages", nargs="*", choices=list(STAGES), help="Build these stages (and what they need)")
+    parser.add_argument("--force", nargs="*", default=[], choices=list(STAGES), help="Rebuild these stages")
+    parser.add_argument("--jobs", type=int, help="Stages run at once (default: one per core)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the stages that would run")
+    args = parser.parse_args()
+
+    if (args.weather_start is None) != (args.weather_end is None):
+        parser.error("give both --weather-start and --weather-end")
+    params = {
+        "source": Path(args.source), "years": args.years, "drop_invalid": args.drop_invalid,
+        "weather_start": args.weather_start, "weather_end": args.weather_end, "offline": args.offline,
+    }
+    stages = select_stages(args.stages, weather=args.weather_start is not None)
+    if "daily" in stages and "weather" not in stages and not WEATHER_PATH.exists():
+        parser.error(f"the daily stage needs {WEATHER_PATH}: pass --weather-start / --weather-end to download it")
+
+    start = time.perf_counter()
+    state = load_state()
+    report = run_build(stages, params, state, set(args.force), args.jobs, args.dry_run)
+    save_state(state)
+
+    for name in topological_order(stages):
+        status, seconds = report[name]
+        print(f"{name:>12}  {status}" + (f" ({seconds:.1f} s)" if seconds else ""))
+    print(f"Build finished in {time.perf_counter() - start:.1f} s")
+    if any(status.startswith("failed") for status, _ in report.values()):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
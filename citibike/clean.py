@@ -0,0 +1,157 @@
+################################################ CitiBike Cleaning Stage ################################################
+
+# One vectorized pass over each chunk of raw trips, run by the ingest:
+#   - parse started_at / ended_at with the known Citi Bike formats ("2022-01-21 13:13:43.392"
+#     and "2022-01-21 13:13:43") through Arrow's C++ timestamp parser
+#   - derive date, hour, weekday and duration in seconds
+#   - flag invalid trips with a reason (unparseable timestamp, non-positive duration, over 24h,
+#     missing coordinates) and count them for the rejection report
+#
+# This replaces the parse chain in the notebooks (to_datetime with dayfirst and no format,
+# .dt.date and back, re-parsing started_at/ended_at, then one full pass per outlier filter).
+#
+# Usage (timing check against the notebook chain):
+#   python -m citibike.clean --rows 1000000
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+MAX_DURATION_S = 24 * 60 * 60
+
+REJECT_REASONS = ["bad_timestamp", "non_positive_duration", "over_24h", "missing_coordinates"]
+
+COORD_COLUMNS = ["start_lat", "start_lng", "end_lat", "end_lng"]
+
+################################################ Parsing ################################################
+
+## Parse timestamp strings in one vectorized pass
+# ---------------------------------------------------------
+# Arrow's ISO-8601 cast covers both Citi Bike formats (with and without milliseconds).
+# A chunk holding anything else falls back to pandas: ISO-8601 with any fraction (2017-2020
+# files have "2019-01-01 00:01:47.4010"), then the US formats of the 2014-2016 files
+# ("9/1/2016 00:00:02", "1/1/2015 0:01"); bad values become NaT.
+US_FORMATS = ["%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M"]
+
+
+def parse_timestamps(values):
+    try:
+        parsed = pa.array(values, type=pa.string()).cast(pa.timestamp("ms"))
+        return pd.Series(parsed.to_pandas(), index=values.index, name=values.name)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        pass
+
+    parsed = pd.to_datetime(values, format="ISO8601", errors="coerce")
+    for fmt in US_FORMATS:
+        missing = parsed.isna() & values.notna()
+        if not missing.any():
+            break
+        parsed[missing] = pd.to_datetime(values[missing], format=fmt, errors="coerce")
+    return parsed.dt.floor("ms").astype("datetime64[ms]")
+
+################################################ Cleaning ################################################
+
+## Derived columns: date, hour, weekday (Monday = 0) and duration in seconds
+# ---------------------------------------------------------
+def derive(chunk):
+    started = chunk["started_at"]
+    duration = (chunk["ended_at"] - started).dt.total_seconds()
+
+    chunk["date"] = started.dt.normalize()
+    chunk["hour"] = started.dt.hour.astype("Int8")
+    chunk["weekday"] = started.dt.weekday.astype("Int8")
+    chunk["duration_s"] = duration.round().astype("Int32")
+    return chunk
+
+
+## One reason per invalid trip (the first that applies), missing for valid trips
+# ---------------------------------------------------------
+def reject_reasons(chunk):
+    duration = chunk["duration_s"]
+    conditions = [
+        chunk["started_at"].isna().to_numpy() | chunk["ended_at"].isna().to_numpy(),
+        (duration <= 0).fillna(False).to_numpy(),
+        (duration > MAX_DURATION_S).fillna(False).to_numpy(),
+        chunk[COORD_COLUMNS].isna().any(axis=1).to_numpy(),
+    ]
+    codes = np.select(conditions, range(len(REJECT_REASONS)), default=-1)
+    return pd.Categorical.from_codes(codes, categories=REJECT_REASONS)
+
+
+## Clean one chunk: derive, flag, and count the rejections
+# ---------------------------------------------------------
+def clean_chunk(chunk):
+    chunk = derive(chunk)
+    chunk["reject_reason"] = reject_reasons(chunk)
+    counts = chunk["reject_reason"].value_counts().reindex(REJECT_REASONS, fill_value=0)
+    return chunk, counts
+
+
+## Rejection report for one source file
+# ---------------------------------------------------------
+def write_rejection_report(counts, rows, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = counts.rename_axis("reason").reset_index(name="trips")
+    report["share"] = report["trips"] / rows if rows else 0.0
+    report.to_csv(path, index=False)
+    return report
+
+################################################ Timing Check ################################################
+
+## Synthetic timestamp strings in the Citi Bike formats
+# ---------------------------------------------------------
+def sample_trips(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    started = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 365 * 86_400_000, rows), unit="ms")
+    ended = started + pd.to_timedelta(rng.lognormal(13.3, 0.9, rows).astype("int64"), unit="ms")
+    trips = pd.DataFrame({
+        "started_at": started.strftime("%Y-%m-%d %H:%M:%S.%f").str[:-3],
+        "ended_at": ended.strftime("%Y-%m-%d %H:%M:%S"),
+    })
+    for col in COORD_COLUMNS:
+        trips[col] = 40.7
+    return trips
+
+
+## The notebooks' chain (Exercise 2.2 - 2.4)
+# ---------------------------------------------------------
+def notebook_chain(trips):
+    trips = trips.copy()
+    trips["started_at"] = pd.to_datetime(trips["started_at"], dayfirst=True, format="mixed")
+    trips["date"] = pd.to_datetime(trips["started_at"], format="%Y-%m-%d").dt.date
+    trips["date"] = pd.to_datetime(trips["date"])
+    trips["started_at"] = pd.to_datetime(trips["started_at"])
+    trips["ended_at"] = pd.to_datetime(trips["ended_at"])
+    trips["tripduration"] = (trips["ended_at"] - trips["started_at"]).dt.total_seconds() / 60
+    filtered = trips[(trips["tripduration"] > 0) & (trips["tripduration"] <= 1440)]
+    return filtered[(filtered["tripduration"] >= 1) & (filtered["tripduration"] <= 65.5)]
+
+
+## This stage
+# ---------------------------------------------------------
+def cleaning_stage(trips):
+    trips = trips.copy()
+    for col in ["started_at", "ended_at"]:
+        trips[col] = parse_timestamps(trips[col])
+    return clean_chunk(trips)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the cleaning stage against the notebook parse chain.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    trips = sample_trips(args.rows)
+    for name, step in [("notebook chain", notebook_chain), ("cleaning stage", cleaning_stage)]:
+        start = time.perf_counter()
+        step(trips)
+        print(f"{name}: {time.perf_counter() - start:.2f} s for {args.rows:,} trips")
+
+
+if __name__ == "__main__":
+    main()
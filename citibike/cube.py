@@ -0,0 +1,394 @@
+################################################ CitiBike Ride Cube ################################################
+
+# One build step that rolls the trip dataset into an integer-encoded cube of ride counts and
+# duration sums, keyed by date x hour x start station x end station x rider type x season.
+#
+# The full-grain cube is written month by month under 02_Data/Cube/base (for ad-hoc questions).
+# The dashboard questions are answered from small rollups of it that are built in the same pass:
+#   daily_hourly    date x hour x rider x season
+#   station_months  period x start station x rider x season
+#   route_months    period x start station x end station x rider x season
+# A period is year * 100 + month (202207 = July 2022).
+#
+# The rollups are kept sorted by period (daily_hourly by date) and written with one Parquet
+# row group per year, so a question about some years only reads and scans those years: on
+# disk through the row group statistics, in memory by a binary search for each year's rows.
+# A one-year question costs the same however many years the cube holds.
+#
+# Usage:
+#   python -m citibike.cube                                  (build)
+#   python -m citibike.cube --query top_stations --riders member --periods 202207
+#   python -m citibike.cube --query top_stations --years 2021 2022
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from citibike.ingest import iter_trip_batches
+from citibike.paths import CUBE_DIR, TRIPS_DATASET_DIR
+from citibike.prepare import SEASON_BY_MONTH, dataset_files
+from citibike.stations import load_dictionary
+
+################################################ Encodings ################################################
+
+RIDER_TYPES = ["member", "casual"]
+SEASONS = ["Winter", "Spring", "Summer", "Fall"]
+
+# Season code for each month number (index 0 unused)
+SEASON_CODE_BY_MONTH = np.array([-1] + [SEASONS.index(SEASON_BY_MONTH[m]) for m in range(1, 13)], dtype="int8")
+
+# Compact columns: stations are already integer ids from the station dictionary (citibike.stations)
+CUBE_COLUMNS = ["started_at", "ended_at", "member_casual", "start_station", "end_station"]
+
+MEASURES = ["rides", "timed_rides", "duration_sum"]
+
+ROLLUPS = {
+    "daily_hourly": ["date", "hour", "rider", "season"],
+    "station_months": ["period", "start", "rider", "season"],
+    "route_months": ["period", "start", "end", "rider", "season"],
+}
+
+
+## Encode one batch of trips into cube keys and measures
+# ---------------------------------------------------------
+def encode_batch(trips):
+    started = trips["started_at"]
+    minutes = ((trips["ended_at"] - started).dt.total_seconds() / 60).to_numpy()
+    timed = (minutes > 0) & (minutes <= 1440)
+
+    rider = pd.Categorical(trips["member_casual"].astype(str), categories=RIDER_TYPES).codes
+
+    encoded = pd.DataFrame({
+        "date": started.dt.normalize().astype("datetime64[ns]"),
+        "hour": started.dt.hour.astype("int8"),
+        "start": trips["start_station"].fillna(-1).astype("int32"),
+        "end": trips["end_station"].fillna(-1).astype("int32"),
+        "rider": rider.astype("int8"),
+        "season": SEASON_CODE_BY_MONTH[started.dt.month.to_numpy()],
+        "timed_rides": timed.astype("int32"),
+        "duration_sum": np.where(timed, minutes, 0.0),
+    })
+    return encoded
+
+################################################ Building ################################################
+
+## Sum the measures over a set of keys
+# ---------------------------------------------------------
+def rollup(frame, keys):
+    rolled = frame.groupby(keys, as_index=False, sort=False).agg(
+        rides=("rides", "sum"),
+        timed_rides=("timed_rides", "sum"),
+        duration_sum=("duration_sum", "sum"),
+    )
+    return rolled.astype({"rides": "int32", "timed_rides": "int32", "duration_sum": "float64"})
+
+
+## Add the period key (year * 100 + month)
+# ---------------------------------------------------------
+def with_period(frame):
+    frame = frame.copy()
+    frame["period"] = (frame["date"].dt.year * 100 + frame["date"].dt.month).astype("int32")
+    return frame
+
+
+## Build the whole cube, one dataset partition at a time
+# ---------------------------------------------------------
+def build_cube(dataset_dir=TRIPS_DATASET_DIR, cube_dir=CUBE_DIR, years=None, months=None):
+    cube_dir = Path(cube_dir)
+    rollups = {name: [] for name in ROLLUPS}
+
+    partitions = sorted({(path.parent.parent.name, path.parent.name)
+                         for path in dataset_files(dataset_dir, years, months)})
+
+    for year_dir, month_dir in partitions:
+        year, month = int(year_dir.split("=")[1]), int(month_dir.split("=")[1])
+
+        month_parts = []
+        for batch in iter_trip_batches(CUBE_COLUMNS, [year], [month], dataset_dir, decode=False):
+            encoded = encode_batch(batch)
+            encoded["rides"] = np.int32(1)
+            month_parts.append(rollup(encoded, ["date", "hour", "start", "end", "rider", "season"]))
+        if not month_parts:
+            continue
+
+        base = rollup(pd.concat(month_parts, ignore_index=True), ["date", "hour", "start", "end", "rider", "season"])
+        out_dir = cube_dir / "base" / year_dir / month_dir
+        out_dir.mkdir(parents=True, exist_ok=True)
+        base.to_parquet(out_dir / "cube.parquet", index=False)
+
+        base = with_period(base)
+        for name, keys in ROLLUPS.items():
+            rollups[name].append(rollup(base, keys))
+
+    dictionary = load_dictionary(dataset_dir)
+    cube = {"stations": dictionary[["station_id", "station_name", "lat", "lng"]]}
+    for name, keys in ROLLUPS.items():
+        parts = rollups[name]
+        # Trips that cross a month boundary can land in two partitions, so roll up once more
+        cube[name] = sort_rollup(rollup(pd.concat(parts, ignore_index=True), keys)) if parts else None
+
+    save_cube(cube, cube_dir)
+    return cube
+
+################################################ Year Partitions ################################################
+
+## Sort key of a rollup: period, or date for daily_hourly (None for the station table)
+# ---------------------------------------------------------
+def partition_key(columns):
+    return next((col for col in ["period", "date"] if col in columns), None)
+
+
+## A rollup sorted by its key (rollups written before they were kept sorted are sorted on load)
+# ---------------------------------------------------------
+def sort_rollup(frame):
+    key = partition_key(frame.columns)
+    if key is None or frame[key].is_monotonic_increasing:
+        return frame
+    return frame.sort_values(key, kind="stable", ignore_index=True)
+
+
+## First and last key value of a year (a period or a timestamp)
+# ---------------------------------------------------------
+def year_bounds(key, year):
+    if key == "period":
+        return year * 100, year * 100 + 99
+    return pd.Timestamp(year, 1, 1), pd.Timestamp(year, 12, 31, 23, 59, 59)
+
+
+## Rows of the given years, by binary search on the sorted key
+# ---------------------------------------------------------
+def year_rows(frame, years):
+    key = partition_key(frame.columns)
+    if years is None or key is None:
+        return frame
+    values = frame[key].to_numpy()
+    parts = []
+    for year in sorted(set(years)):
+        low, high = year_bounds(key, year)
+        lo = np.searchsorted(values, np.asarray(low, dtype=values.dtype), side="left")
+        hi = np.searchsorted(values, np.asarray(high, dtype=values.dtype), side="right")
+        parts.append(frame.iloc[lo:hi])
+    return parts[0] if len(parts) == 1 else pd.concat(parts)
+
+
+## Years present in a rollup
+# ---------------------------------------------------------
+def rollup_years(frame):
+    key = partition_key(frame.columns)
+    values = frame[key]
+    years = values // 100 if key == "period" else values.dt.year
+    return sorted(years.unique().tolist())
+
+
+## Save / load the station table and rollups
+# ---------------------------------------------------------
+# One row group per year, so readers with a years filter skip the other years.
+def save_cube(cube, cube_dir=CUBE_DIR):
+    cube_dir = Path(cube_dir)
+    cube_dir.mkdir(parents=True, exist_ok=True)
+    for name, frame in cube.items():
+        if frame is None:
+            continue
+        if partition_key(frame.columns) is None:
+            frame.to_parquet(cube_dir / f"{name}.parquet", index=False)
+            continue
+        frame = sort_rollup(frame)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        with pq.ParquetWriter(cube_dir / f"{name}.parquet", table.schema) as writer:
+            for year in rollup_years(frame):
+                writer.write_table(pa.Table.from_pandas(year_rows(frame, [year]), schema=table.schema,
+                                                        preserve_index=False))
+
+
+def read_cube_part(path, years=None):
+    filters = None
+    if years is not None:
+        key = partition_key(pq.read_schema(path).names)
+        if key is not None:
+            filters = [[(key, ">=", low), (key, "<=", high)]
+                       for low, high in (year_bounds(key, year) for year in sorted(set(years)))]
+    return sort_rollup(pd.read_parquet(path, filters=filters))
+
+
+## The station table and rollups (only the given years of each rollup when years is set)
+# ---------------------------------------------------------
+def load_cube(cube_dir=CUBE_DIR, reader=read_cube_part, years=None):
+    cube_dir = Path(cube_dir)
+    if years is None:
+        return {name: reader(cube_dir / f"{name}.parquet") for name in ["stations", *ROLLUPS]}
+    return {name: reader(cube_dir / f"{name}.parquet", years) for name in ["stations", *ROLLUPS]}
+
+################################################ Query API ################################################
+
+## Years a question can touch (None: all of them)
+# ---------------------------------------------------------
+def years_needed(years=None, periods=None, start_date=None, end_date=None):
+    needed = None if years is None else set(years)
+    if periods is not None:
+        period_years = {period // 100 for period in periods}
+        needed = period_years if needed is None else needed & period_years
+    first = pd.Timestamp(start_date).year if start_date is not None else None
+    last = pd.Timestamp(end_date).year if end_date is not None else None
+    if needed is None and first is not None and last is not None:
+        needed = set(range(first, last + 1))
+    elif needed is not None:
+        needed = {year for year in needed if (first is None or year >= first) and (last is None or year <= last)}
+    return needed
+
+
+## Keep the rows that match every given filter (None means no filter)
+# ---------------------------------------------------------
+# The years the filters allow are cut out first (year_rows), so the masks only scan them.
+def select(frame, periods=None, seasons=None, riders=None, start_date=None, end_date=None, years=None):
+    frame = year_rows(frame, years_needed(years, periods, start_date, end_date))
+    mask = np.ones(len(frame), dtype=bool)
+    if periods is not None:
+        mask &= frame["period"].isin(list(periods)).to_numpy()
+    if seasons is not None:
+        mask &= frame["season"].isin([SEASONS.index(s) for s in seasons]).to_numpy()
+    if riders is not None:
+        mask &= frame["rider"].isin([RIDER_TYPES.index(r) for r in riders]).to_numpy()
+    if start_date is not None:
+        mask &= (frame["date"] >= pd.Timestamp(start_date)).to_numpy()
+    if end_date is not None:
+        mask &= (frame["date"] <= pd.Timestamp(end_date)).to_numpy()
+    return frame[mask]
+
+
+## Station code -> name (and coordinates)
+# ---------------------------------------------------------
+def decode_stations(cube, codes, prefix):
+    stations = cube["stations"].set_index("station_id")
+    decoded = stations.reindex(codes)
+    return pd.DataFrame({
+        f"{prefix}_station_name": decoded["station_name"].to_numpy(),
+        f"{prefix}_lat": decoded["lat"].to_numpy(),
+        f"{prefix}_lng": decoded["lng"].to_numpy(),
+    })
+
+
+## Rides per day (same columns as daily_sub_df)
+# ---------------------------------------------------------
+def rides_per_day(cube, seasons=None, riders=None, start_date=None, end_date=None, years=None):
+    daily = select(cube["daily_hourly"], seasons=seasons, riders=riders,
+                   start_date=start_date, end_date=end_date, years=years)
+    return (
+        daily.groupby("date")["rides"].sum()
+        .sort_index()
+        .reset_index(name="bike_rides_daily")
+    )
+
+
+## Rides per hour of day
+# ---------------------------------------------------------
+def rides_per_hour(cube, seasons=None, riders=None, start_date=None, end_date=None, years=None):
+    hourly = select(cube["daily_hourly"], seasons=seasons, riders=riders,
+                    start_date=start_date, end_date=end_date, years=years)
+    return hourly.groupby("hour")["rides"].sum().reindex(range(24), fill_value=0).reset_index()
+
+
+## Top N start stations (same columns as top_stations_df)
+# ---------------------------------------------------------
+def top_stations(cube, n=20, periods=None, seasons=None, riders=None, years=None):
+    counts = station_counts(cube, periods, seasons, riders, years).nlargest(n)
+    top = decode_stations(cube, counts.index, "start")[["start_station_name"]]
+    top["value"] = counts.to_numpy().astype("int64")
+    return top
+
+
+## Rides per start station code
+# ---------------------------------------------------------
+def station_counts(cube, periods=None, seasons=None, riders=None, years=None):
+    stations = select(cube["station_months"], periods=periods, seasons=seasons, riders=riders, years=years)
+    stations = stations[stations["start"] >= 0]
+    return stations.groupby("start")["rides"].sum()
+
+
+## Top N routes (same columns as top500_routes)
+# ---------------------------------------------------------
+def top_routes(cube, n=500, periods=None, seasons=None, riders=None, years=None):
+    counts = route_counts(cube, periods, seasons, riders, years).nlargest(n)
+
+    start = decode_stations(cube, counts.index.get_level_values("start"), "start")
+    end = decode_stations(cube, counts.index.get_level_values("end"), "end")
+    top = pd.concat([start, end], axis=1)
+    top["trip_count"] = counts.to_numpy().astype("int64")
+    return top[["start_station_name", "end_station_name", "trip_count",
+                "start_lat", "start_lng", "end_lat", "end_lng"]]
+
+
+## Rides per (start, end) station code pair
+# ---------------------------------------------------------
+def route_counts(cube, periods=None, seasons=None, riders=None, years=None):
+    routes = select(cube["route_months"], periods=periods, seasons=seasons, riders=riders, years=years)
+    routes = routes[(routes["start"] >= 0) & (routes["end"] >= 0)]
+    return routes.groupby(["start", "end"])["rides"].sum()
+
+
+## Rank of the top N keys in one year next to their rank in a base year
+# ---------------------------------------------------------
+# counts and base_counts are ride counts by the same key (a station code or a route pair).
+# rank_change > 0 means the key climbed; base_rank is NaN for keys without rides in the base year.
+def rank_changes(counts, base_counts, n):
+    ranks = counts.rank(method="min", ascending=False)
+    base_ranks = base_counts.rank(method="min", ascending=False)
+    top = counts.nlargest(n)
+    return pd.DataFrame({
+        "rides": top.to_numpy().astype("int64"),
+        "base_rides": base_counts.reindex(top.index).fillna(0).to_numpy().astype("int64"),
+        "rank": ranks.reindex(top.index).to_numpy().astype("int64"),
+        "base_rank": base_ranks.reindex(top.index).to_numpy(),
+    }, index=top.index).assign(rank_change=lambda frame: frame["base_rank"] - frame["rank"])
+
+
+## Ride counts and average trip duration (0–24h trips) by rider type
+# ---------------------------------------------------------
+def duration_by_rider(cube, seasons=None, start_date=None, end_date=None, years=None):
+    daily = select(cube["daily_hourly"], seasons=seasons, start_date=start_date, end_date=end_date, years=years)
+    summary = daily[daily["rider"] >= 0].groupby("rider")[MEASURES].sum()
+    summary["avg_duration"] = summary["duration_sum"] / summary["timed_rides"]
+    summary.index = [RIDER_TYPES[code] for code in summary.index]
+    return summary.rename_axis("member_casual").reset_index()
+
+################################################ Command Line ################################################
+
+QUERIES = {
+    "rides_per_day": rides_per_day,
+    "rides_per_hour": rides_per_hour,
+    "top_stations": top_stations,
+    "top_routes": top_routes,
+    "duration_by_rider": duration_by_rider,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the CitiBike ride cube.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--query", choices=QUERIES, help="Run a query instead of building")
+    parser.add_argument("--periods", type=int, nargs="*", help="Periods as YYYYMM")
+    parser.add_argument("--seasons", nargs="*", choices=SEASONS)
+    parser.add_argument("--riders", nargs="*", choices=RIDER_TYPES)
+    parser.add_argument("--years", type=int, nargs="*", help="Only these years (read and scanned alone)")
+    parser.add_argument("-n", type=int, default=20, help="Top N for station/route queries")
+    args = parser.parse_args()
+
+    if args.query is None:
+        cube = build_cube(args.dataset)
+        print(f"Built cube with {len(cube['stations']):,} stations in {CUBE_DIR}")
+        return
+
+    cube = load_cube(years=args.years)
+    filters = {"seasons": args.seasons, "years": args.years}
+    if args.query != "duration_by_rider":
+        filters["riders"] = args.riders
+    if args.query in ("top_stations", "top_routes"):
+        filters.update(n=args.n, periods=args.periods)
+    print(QUERIES[args.query](cube, **filters).to_string())
+
+
+if __name__ == "__main__":
+    main()
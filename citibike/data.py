@@ -0,0 +1,258 @@
+################################################ CitiBike Dashboard Data ################################################
+
+# Data-access layer for CitiBike_dashboard_Part2.py.
+# Each prepared file is parsed once per process, with explicit dtypes, and the same object is
+# handed to every Streamlit session and rerun. A reload only happens when the file changes:
+# the file's mtime/size is checked on every call (one os.stat), and when it moved the content
+# hash decides whether the file really needs to be parsed again.
+#
+# The returned frames are shared between sessions, so callers filter them but never modify them.
+#
+# Usage (timing check):
+#   python -m citibike.data
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from citibike import cube, forecast, rebalancing, route_index, sketches, store, timeseries
+from citibike.aggregates import file_digest
+from citibike.paths import CUBE_DIR, PREPARED_DIR, STORE_DIR
+
+SEASON_ORDER = ["Winter", "Spring", "Summer", "Fall"]
+
+DAILY_PATH = PREPARED_DIR / "daily_sub_df.csv"
+TOP_STATIONS_PATH = PREPARED_DIR / "top_stations_df.csv"
+TOP_ROUTES_PATH = PREPARED_DIR / "top500_routes.csv"
+KEPLER_PATH = PREPARED_DIR / "kepler.gl.html"
+
+################################################ Process-wide Cache ################################################
+
+_cache = {}
+_lock = threading.Lock()
+
+
+## Load a file through the cache
+# ---------------------------------------------------------
+def load_cached(path, reader):
+    path = Path(path)
+    stat = path.stat()
+    version = (stat.st_mtime_ns, stat.st_size)
+    key = (str(path), reader)
+
+    with _lock:
+        entry = _cache.get(key)
+        if entry is not None and entry["version"] == version:
+            return entry["value"]
+
+        # The file was touched: only re-parse it if the content actually changed
+        digest = file_digest(path)
+        if entry is not None and entry["digest"] == digest:
+            entry["version"] = version
+            return entry["value"]
+
+        value = reader(path)
+        _cache[key] = {"version": version, "digest": digest, "value": value}
+        return value
+
+
+## Drop everything (used by the timing check)
+# ---------------------------------------------------------
+def clear_cache():
+    with _lock:
+        _cache.clear()
+
+################################################ Readers ################################################
+
+## daily_sub_df.csv: parsed date, numeric rides/temperature, ordered season categories
+# ---------------------------------------------------------
+def read_daily(path):
+    daily_df = pd.read_csv(
+        path,
+        parse_dates=["date"],
+        dtype={"bike_rides_daily": "float64", "avgTemp": "float64", "season": "string"},
+    )
+    daily_df["season"] = pd.Categorical(daily_df["season"], categories=SEASON_ORDER)
+    # Sorted by date, so queries can slice out single years
+    return cube.sort_rollup(daily_df)
+
+
+## top_stations_df.csv
+# ---------------------------------------------------------
+def read_top_stations(path):
+    return pd.read_csv(path, dtype={"start_station_name": "string", "value": "int64"})
+
+
+## top500_routes.csv
+# ---------------------------------------------------------
+def read_top_routes(path):
+    return pd.read_csv(path, dtype={"start_station_name": "string", "end_station_name": "string", "trip_count": "int64"})
+
+
+## Parquet files (the ride cube rollups), zero-copy from the shared store when it is up to date
+# ---------------------------------------------------------
+# store_dir=None always reads the Parquet file (citibike.store --measure compares the two).
+def read_parquet(path, store_dir=STORE_DIR):
+    mapped = store.fresh_store_path(path, store_dir) if store_dir is not None else None
+    if mapped is not None:
+        return store.read_mapped(mapped)
+    return pd.read_parquet(path)
+
+
+## A ride cube table, sorted by period so years can be sliced out (see cube.year_rows)
+# ---------------------------------------------------------
+def read_cube_part(path, store_dir=STORE_DIR):
+    return cube.sort_rollup(read_parquet(path, store_dir))
+
+
+## Months (YYYYMM) in a rollup, from its period column alone
+# ---------------------------------------------------------
+def read_periods(path):
+    return sorted(pd.read_parquet(path, columns=["period"])["period"].unique().tolist())
+
+
+## rides_timeseries.parquet: one frame per resolution
+# ---------------------------------------------------------
+def read_timeseries(path, store_dir=STORE_DIR):
+    return timeseries.split_series(read_parquet(path, store_dir))
+
+
+## The reader the dashboard uses for one of its Parquet files
+# ---------------------------------------------------------
+def parquet_reader(path):
+    path = Path(path).resolve()
+    if path == Path(timeseries.TIMESERIES_PATH).resolve():
+        return read_timeseries
+    if path.parent == Path(CUBE_DIR).resolve():
+        return read_cube_part
+    return read_parquet
+
+
+## Any text asset (the exported kepler.gl map)
+# ---------------------------------------------------------
+def read_text(path):
+    with open(path, "r") as f:
+        return f.read()
+
+## demand_forecast.csv: next-day / next-week forecasts with 95% intervals
+# ---------------------------------------------------------
+def read_forecast(path):
+    return pd.read_csv(
+        path,
+        parse_dates=["date"],
+        dtype={"series": "string", "horizon_days": "int64", "forecast": "float64",
+               "lower": "float64", "upper": "float64"},
+    )
+
+################################################ Public Loaders ################################################
+
+def load_daily(path=DAILY_PATH):
+    return load_cached(path, read_daily)
+
+
+def load_top_stations(path=TOP_STATIONS_PATH):
+    return load_cached(path, read_top_stations)
+
+
+## The top routes table, when it has been built (None otherwise)
+# ---------------------------------------------------------
+def load_top_routes(path=TOP_ROUTES_PATH):
+    if not Path(path).exists():
+        return None
+    return load_cached(path, read_top_routes)
+
+
+def load_kepler_html(path=KEPLER_PATH):
+    return load_cached(path, read_text)
+
+
+## Trip duration sketches, when they have been built (None otherwise)
+# ---------------------------------------------------------
+def load_duration_sketches(path=sketches.SKETCHES_PATH):
+    if not Path(path).exists():
+        return None
+    return load_cached(path, read_parquet)
+
+
+## The ride cube, when it has been built (None otherwise)
+# ---------------------------------------------------------
+def load_cube(cube_dir=CUBE_DIR):
+    if not (Path(cube_dir) / "station_months.parquet").exists():
+        return None
+    return cube.load_cube(cube_dir, reader=load_cube_part)
+
+
+def load_cube_part(path):
+    return load_cached(path, read_cube_part)
+
+
+## Months (YYYYMM) covered by a rollup (the month pickers), when it exists (empty otherwise)
+# ---------------------------------------------------------
+def load_periods(path=CUBE_DIR / "station_months.parquet"):
+    if not Path(path).exists():
+        return []
+    return load_cached(path, read_periods)
+
+## Multi-resolution ride / weather series, when they have been built (None otherwise)
+# ---------------------------------------------------------
+def load_timeseries(path=timeseries.TIMESERIES_PATH):
+    if not Path(path).exists():
+        return None
+    return load_cached(path, read_timeseries)
+
+
+## The route index behind the Trip Hotspots map, when it has been built (None otherwise)
+# ---------------------------------------------------------
+def load_route_index(path=route_index.ROUTE_INDEX_PATH, stations_path=route_index.ROUTE_STATIONS_PATH):
+    if not Path(path).exists():
+        return None
+    return {"routes": load_cached(path, read_parquet), "stations": load_cached(stations_path, read_parquet)}
+
+## Hourly station flows for the rebalancing simulation, when they have been built (None otherwise)
+# ---------------------------------------------------------
+def load_station_flows(path=rebalancing.FLOWS_PATH, stations_path=rebalancing.FLOW_STATIONS_PATH):
+    if not Path(path).exists():
+        return None
+    return {"flows": load_cached(path, read_parquet), "stations": load_cached(stations_path, read_parquet)}
+
+## Demand forecasts, when they have been built (None otherwise)
+# ---------------------------------------------------------
+def load_forecast(path=forecast.FORECAST_PATH):
+    if not Path(path).exists():
+        return None
+    return load_cached(path, read_forecast)
+
+################################################ Timing Check ################################################
+
+## Cold load vs. cached load, single viewer and many concurrent viewers
+# ---------------------------------------------------------
+def time_loads(viewers=64, reruns=200):
+    def rerun():
+        load_daily()
+        load_top_stations()
+        load_kepler_html()
+
+    clear_cache()
+    start = time.perf_counter()
+    rerun()
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(reruns):
+        rerun()
+    warm = (time.perf_counter() - start) / reruns
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=viewers) as pool:
+        list(pool.map(lambda _: rerun(), range(viewers * reruns)))
+    concurrent = (time.perf_counter() - start) / (viewers * reruns)
+
+    return {"cold_ms": cold * 1000, "cached_ms": warm * 1000, "concurrent_ms": concurrent * 1000}
+
+
+if __name__ == "__main__":
+    for name, value in time_loads().items():
+        print(f"{name}: {value:.3f}")
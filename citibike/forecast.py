@@ -0,0 +1,257 @@
+################################################ CitiBike Demand Forecasts ################################################
+
+# Daily demand models for the whole system and for every station at once.
+#
+# Every series (system rides, and departures per station) shares the same calendar and the
+# same weather, so one design matrix serves all of them:
+#   intercept, day of week, two annual Fourier pairs, temperature, temperature^2, precipitation
+# and log(1 + rides) of all ~2,000 stations is fitted in a single batched ridge solve
+# (a p x p system with one right-hand side per series). Intervals come from each series'
+# residual spread in log space.
+#
+# Forecasts for future days need their weather: known values (e.g. a forecast) can be passed
+# in; otherwise the historical average for the same week of the year is used.
+#
+# The rolling-origin backtest refits at every origin on the days before it and scores the next
+# 1 and 7 days (with the observed weather), reporting MAE, MAPE, interval coverage and fit
+# time. Origins are spread over a process pool.
+#
+# Usage:
+#   python -m citibike.forecast                  (write demand_forecast.csv)
+#   python -m citibike.forecast --backtest
+
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from citibike.paths import PREPARED_DIR
+from citibike.prepare import load_weather
+from citibike.weather import WEATHER_PATH
+
+FORECAST_PATH = PREPARED_DIR / "demand_forecast.csv"
+BACKTEST_PATH = PREPARED_DIR / "demand_backtest.csv"
+
+SYSTEM = "All stations"
+
+HORIZON_DAYS = 7
+RIDGE = 1.0
+Z_95 = 1.96
+
+# Backtest defaults: first origin after this many days, then one origin every step days
+MIN_TRAIN_DAYS = 120
+ORIGIN_STEP = 7
+
+################################################ Inputs ################################################
+
+## Daily demand: one column per series (system total first), one row per date
+# ---------------------------------------------------------
+# Days without a ride count (weather-only rows of daily_sub_df, whose ride count is blank) are
+# dropped; a station with no departures on a day that has rides counts zero.
+def demand_matrix(daily, flows=None, stations=None):
+    demand = daily.dropna(subset=["bike_rides_daily"]).set_index("date")["bike_rides_daily"].rename(SYSTEM).to_frame()
+    demand.index = pd.DatetimeIndex(demand.index).astype("datetime64[ns]")
+    if flows is not None:
+        per_station = (
+            flows.assign(date=flows["hour"].dt.normalize().astype("datetime64[ns]"))
+            .pivot_table(index="date", columns="station_id", values="departures", aggfunc="sum")
+        )
+        if stations is not None:
+            names = stations.set_index("station_id")["station_name"]
+            per_station.columns = [names.get(station_id, str(station_id)) for station_id in per_station.columns]
+        demand = demand.join(per_station, how="left").fillna(0)
+    return demand.sort_index().astype("float64")
+
+
+## Daily weather regressors (avgTemp, precipitation), from weather_df.csv when available
+# ---------------------------------------------------------
+def load_regressors(path=None):
+    if path is None and WEATHER_PATH.exists():
+        path = WEATHER_PATH
+    weather = load_weather(path)
+    if path is not None and "precipitation" in pd.read_csv(path, nrows=0).columns:
+        weather = weather.merge(pd.read_csv(path, usecols=["date", "precipitation"], parse_dates=["date"]), on="date")
+    else:
+        weather["precipitation"] = 0.0
+    weather["date"] = weather["date"].astype("datetime64[ns]")
+    return weather.set_index("date")[["avgTemp", "precipitation"]].astype("float64")
+
+
+## Weather for future days: the historical mean of the same week of the year
+# ---------------------------------------------------------
+def climatology(weather, dates):
+    week = weather.index.isocalendar().week.to_numpy()
+    means = weather.groupby(week).mean()
+    future = means.reindex(pd.DatetimeIndex(dates).isocalendar().week.to_numpy())
+    future.index = pd.DatetimeIndex(dates)
+    return future.fillna(weather.mean())
+
+################################################ Model ################################################
+
+## Design matrix: calendar terms plus weather (missing weather -> the column mean)
+# ---------------------------------------------------------
+def design(dates, weather, temp_mean=None):
+    dates = pd.DatetimeIndex(dates)
+    temp = weather["avgTemp"].reindex(dates).to_numpy()
+    temp = np.where(np.isnan(temp), np.nanmean(temp) if temp_mean is None else temp_mean, temp)
+    temp_mean = np.mean(temp) if temp_mean is None else temp_mean
+    rain = np.nan_to_num(weather["precipitation"].reindex(dates).to_numpy())
+
+    year_angle = 2 * np.pi * dates.dayofyear.to_numpy() / 365.25
+    weekday = np.eye(7)[dates.weekday.to_numpy()][:, 1:]
+    centered = temp - temp_mean
+    columns = [
+        np.ones(len(dates)),
+        *weekday.T,
+        np.sin(year_angle), np.cos(year_angle), np.sin(2 * year_angle), np.cos(2 * year_angle),
+        centered, centered ** 2, np.log1p(rain),
+    ]
+    return np.column_stack(columns), temp_mean
+
+
+## Fit every series at once (ridge on log1p demand; the intercept is not penalized)
+# ---------------------------------------------------------
+def fit(demand, weather, ridge=RIDGE):
+    X, temp_mean = design(demand.index, weather)
+    Y = np.log1p(demand.to_numpy())
+
+    penalty = ridge * np.eye(X.shape[1])
+    penalty[0, 0] = 0
+    coef = np.linalg.solve(X.T @ X + penalty, X.T @ Y)
+    residuals = Y - X @ coef
+    dof = max(len(X) - X.shape[1], 1)
+    return {
+        "series": demand.columns.to_numpy(),
+        "coef": coef,
+        "sigma": np.sqrt((residuals ** 2).sum(axis=0) / dof),
+        "temp_mean": temp_mean,
+    }
+
+
+## Point forecasts and 95% intervals for the given dates
+# ---------------------------------------------------------
+# Returns three date x series frames: forecast, lower, upper.
+def predict(model, dates, weather):
+    X, _ = design(dates, weather, model["temp_mean"])
+    log_mean = X @ model["coef"]
+    spread = Z_95 * model["sigma"]
+    frames = [
+        pd.DataFrame(np.expm1(values).clip(min=0), index=pd.DatetimeIndex(dates), columns=model["series"])
+        for values in (log_mean, log_mean - spread, log_mean + spread)
+    ]
+    return tuple(frames)
+
+
+## Next-day and next-week forecasts after the last observed day, in long format
+# ---------------------------------------------------------
+def forecast(demand, weather, horizon=HORIZON_DAYS, future_weather=None):
+    model = fit(demand, weather)
+    dates = pd.date_range(demand.index[-1] + pd.Timedelta(days=1), periods=horizon)
+    future = climatology(weather, dates)
+    if future_weather is not None:
+        future = future_weather.reindex(dates).combine_first(future)
+
+    # Observed weather, when the weather file already covers these days, wins over the estimate
+    point, lower, upper = predict(model, dates, pd.concat([future, weather]).groupby(level=0).last())
+    long = pd.concat(
+        {"forecast": point.stack(), "lower": lower.stack(), "upper": upper.stack()}, axis=1,
+    ).rename_axis(["date", "series"]).reset_index()
+    long["horizon_days"] = (long["date"] - demand.index[-1]).dt.days
+    return long[["series", "date", "horizon_days", "forecast", "lower", "upper"]]
+
+################################################ Backtest ################################################
+
+## Fit on the days before one origin and score the next horizon days
+# ---------------------------------------------------------
+def backtest_origin(demand, weather, origin, horizon=HORIZON_DAYS):
+    train = demand[demand.index < origin]
+    test = demand[(demand.index >= origin) & (demand.index < origin + pd.Timedelta(days=horizon))]
+
+    start = time.perf_counter()
+    model = fit(train, weather)
+    fit_seconds = time.perf_counter() - start
+
+    point, lower, upper = predict(model, test.index, weather)
+    actual = test.to_numpy()
+    horizon_days = (test.index - origin).days.to_numpy() + 1
+    return pd.DataFrame({
+        "origin": origin,
+        "horizon_days": np.repeat(horizon_days, actual.shape[1]),
+        "series": np.tile(demand.columns.to_numpy(), len(test)),
+        "actual": actual.ravel(),
+        "forecast": point.to_numpy().ravel(),
+        "covered": ((actual >= lower.to_numpy()) & (actual <= upper.to_numpy())).ravel(),
+        "fit_seconds": fit_seconds,
+    })
+
+
+## Rolling-origin backtest over the whole history
+# ---------------------------------------------------------
+def backtest(demand, weather, min_train_days=MIN_TRAIN_DAYS, step=ORIGIN_STEP, horizon=HORIZON_DAYS, workers=None):
+    origins = demand.index[min_train_days::step]
+    origins = [origin for origin in origins if origin + pd.Timedelta(days=horizon - 1) <= demand.index[-1]]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(backtest_origin, [demand] * len(origins), [weather] * len(origins),
+                              origins, [horizon] * len(origins)))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+
+
+## Accuracy per horizon, for the system series and over all stations
+# ---------------------------------------------------------
+def backtest_report(results):
+    results = results.assign(
+        scope=np.where(results["series"] == SYSTEM, SYSTEM, "Stations"),
+        abs_error=(results["forecast"] - results["actual"]).abs(),
+    )
+    scored = results[results["horizon_days"].isin([1, HORIZON_DAYS])]
+    report = scored.groupby(["scope", "horizon_days"]).agg(
+        mae=("abs_error", "mean"),
+        actual_mean=("actual", "mean"),
+        coverage=("covered", "mean"),
+        forecasts=("forecast", "size"),
+    )
+    report["mape"] = (
+        scored[scored["actual"] > 0].assign(ape=lambda df: df["abs_error"] / df["actual"])
+        .groupby(["scope", "horizon_days"])["ape"].mean()
+    )
+    return report.reset_index()
+
+################################################ Command Line ################################################
+
+def main():
+    # Imported here: the dashboard's loaders are the simplest way to reach the prepared files
+    from citibike.data import load_daily, load_station_flows
+
+    parser = argparse.ArgumentParser(description="Daily demand forecasts for the system and every station.")
+    parser.add_argument("--weather", help="CSV with date, avgTemp and (optionally) precipitation")
+    parser.add_argument("--system-only", action="store_true", help="Skip the per-station models")
+    parser.add_argument("--backtest", action="store_true", help="Run the rolling-origin backtest")
+    parser.add_argument("--workers", type=int, help="Backtest worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    flows = None if args.system_only else load_station_flows()
+    if flows is None:
+        demand = demand_matrix(load_daily())
+    else:
+        demand = demand_matrix(load_daily(), flows["flows"], flows["stations"])
+    weather = load_regressors(args.weather)
+    print(f"{demand.shape[1]:,} series over {len(demand):,} days")
+
+    if args.backtest:
+        start = time.perf_counter()
+        results = backtest(demand, weather, workers=args.workers)
+        results.to_csv(BACKTEST_PATH, index=False)
+        print(backtest_report(results).to_string(index=False))
+        print(f"{results['origin'].nunique()} origins in {time.perf_counter() - start:.1f} s "
+              f"(mean fit {results.groupby('origin')['fit_seconds'].first().mean() * 1000:.0f} ms for all series)")
+        return
+
+    forecasts = forecast(demand, weather)
+    forecasts.to_csv(FORECAST_PATH, index=False, date_format="%Y-%m-%d")
+    print(f"Wrote {len(forecasts):,} forecasts to {FORECAST_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+################################################ CitiBike Heavy Hitters ################################################
+
+# Single-pass top-K for start stations and routes with bounded memory, per slice
+# (whole data, month, season, rider type).
+#
+# Each slice keeps a Misra-Gries summary of at most k counters. A batch is first counted
+# exactly, added to the counters, and if more than k items remain the (k+1)-th largest count
+# is subtracted from every counter and the non-positive ones are dropped. The running total
+# of these subtractions ("decrement") bounds the error: for every item,
+#     estimate <= true count <= estimate + decrement,   and   decrement <= rows / (k + 1).
+# Summaries merge the same way, so they can be built per file or per worker and combined.
+#
+# A second pass counts the reported candidates exactly. An item the list left out is either
+# another counter of the summary (true count <= its estimate + decrement) or not in the summary
+# at all (true count <= decrement). So the top N is exact when the N-th confirmed count is at
+# least the (N+1)-th largest estimate + decrement (just the decrement when the summary holds
+# no more than N items).
+#
+# The result is the per-slice table top_by_slice.csv (the build's "slices" stage). The overall
+# top_stations_df.csv and top500_routes.csv stay with the build's stations / routes stages,
+# which count them exactly from the aggregates.
+#
+# Usage:
+#   python -m citibike.heavy_hitters                    (from the partitioned dataset)
+#   python -m citibike.heavy_hitters --source <folder>  (ingest the CSVs and track in the same pass)
+
+import argparse
+
+import pandas as pd
+
+from citibike.ingest import DEFAULT_CHUNKSIZE, ingest_folder, iter_trip_batches
+from citibike.paths import PREPARED_DIR, TRIPS_DATASET_DIR
+from citibike.prepare import SEASON_BY_MONTH, TOP_ROUTES_N, TOP_STATIONS_N
+
+TOP_BY_SLICE_PATH = PREPARED_DIR / "top_by_slice.csv"
+
+ITEMS = {
+    "stations": ["start_station_name"],
+    "routes": ["start_station_name", "end_station_name"],
+}
+
+# Slice dimensions; "all" is the whole data
+SLICES = ["all", "period", "season", "rider"]
+
+DEFAULT_CAPACITY = {"stations": 500, "routes": 20_000}
+
+ROUTE_COORDS = ["start_lat", "start_lng", "end_lat", "end_lng"]
+TRACK_COLUMNS = ["started_at", "member_casual", "start_station_name", "end_station_name"]
+
+################################################ Misra-Gries Summary ################################################
+
+## An empty summary with room for k counters
+# ---------------------------------------------------------
+def new_summary(k):
+    return {"k": k, "rows": 0, "decrement": 0, "counts": pd.Series(dtype="int64")}
+
+
+## Trim a set of counters back to k (returns the amount subtracted)
+# ---------------------------------------------------------
+def trim(counts, k):
+    if len(counts) <= k:
+        return counts, 0
+    threshold = int(counts.nlargest(k + 1).iloc[-1])
+    kept = counts[counts > threshold] - threshold
+    return kept, threshold
+
+
+## Add exact counts (or another summary's counters) into a summary
+# ---------------------------------------------------------
+def add_counts(summary, counts, rows, decrement=0):
+    merged = counts if summary["counts"].empty else summary["counts"].add(counts, fill_value=0)
+    merged, subtracted = trim(merged.astype("int64"), summary["k"])
+    return {
+        "k": summary["k"],
+        "rows": summary["rows"] + rows,
+        "decrement": summary["decrement"] + decrement + subtracted,
+        "counts": merged,
+    }
+
+
+## Merge two summaries
+# ---------------------------------------------------------
+def merge_summaries(a, b):
+    return add_counts(a, b["counts"], b["rows"], b["decrement"])
+
+################################################ Sliced Tracking ################################################
+
+## Slice labels for every trip in a batch
+# ---------------------------------------------------------
+def slice_columns(trips):
+    started = trips["started_at"]
+    return pd.DataFrame({
+        "all": "all",
+        "period": (started.dt.year * 100 + started.dt.month).astype("Int64").astype(str),
+        "season": started.dt.month.map(SEASON_BY_MONTH),
+        "rider": trips["member_casual"].astype(str),
+    }, index=trips.index)
+
+
+## Empty tracker: one summary per (item kind, slice dimension, slice value), created on demand
+# ---------------------------------------------------------
+def new_tracker(capacity=None):
+    return {"capacity": {**DEFAULT_CAPACITY, **(capacity or {})}, "summaries": {}}
+
+
+## Feed one batch of trips into the tracker
+# ---------------------------------------------------------
+def observe(tracker, trips):
+    labels = slice_columns(trips)
+    for kind, item_cols in ITEMS.items():
+        items = trips[item_cols].dropna()
+        for dimension in SLICES:
+            keyed = pd.concat([labels.loc[items.index, dimension], items], axis=1)
+            counts = keyed.groupby([dimension] + item_cols, observed=True).size()
+            for value, slice_counts in counts.groupby(level=0):
+                key = (kind, dimension, value)
+                summary = tracker["summaries"].get(key) or new_summary(tracker["capacity"][kind])
+                slice_counts = slice_counts.droplevel(0)
+                tracker["summaries"][key] = add_counts(summary, slice_counts, int(slice_counts.sum()))
+    return tracker
+
+
+## Merge two trackers (e.g. built by different workers)
+# ---------------------------------------------------------
+def merge_trackers(a, b):
+    merged = {"capacity": a["capacity"], "summaries": dict(a["summaries"])}
+    for key, summary in b["summaries"].items():
+        merged["summaries"][key] = merge_summaries(merged["summaries"][key], summary) \
+            if key in merged["summaries"] else summary
+    return merged
+
+
+## Candidates for the top N of one slice, with their error bounds
+# ---------------------------------------------------------
+def candidates(tracker, kind, n, dimension="all", value="all"):
+    summary = tracker["summaries"].get((kind, dimension, value)) or new_summary(0)
+    top = summary["counts"].nlargest(n).rename("estimate").to_frame()
+    top["upper_bound"] = top["estimate"] + summary["decrement"]
+    return top.reset_index()
+
+################################################ Exact Confirmation ################################################
+
+def new_items_frame(kind):
+    return pd.DataFrame(columns=ITEMS[kind], dtype=object)
+
+
+## Second pass: exact counts (and route coordinates) for the candidates of every slice
+# ---------------------------------------------------------
+def confirm(tracker, batches, n_by_kind):
+    wanted = {
+        key: candidates(tracker, key[0], n_by_kind[key[0]], key[1], key[2])
+        for key in tracker["summaries"]
+    }
+    # One lookup set per item kind, so each batch is filtered once per kind
+    lookup = {
+        kind: pd.MultiIndex.from_frame(
+            pd.concat([new_items_frame(kind)] + [frame[ITEMS[kind]] for key, frame in wanted.items() if key[0] == kind])
+            .astype(object)
+            .drop_duplicates()
+        )
+        for kind in ITEMS
+    }
+
+    exact = {key: None for key in wanted}
+    coords = None
+    for trips in batches:
+        labels = slice_columns(trips)
+        for kind, item_cols in ITEMS.items():
+            hit = pd.MultiIndex.from_frame(trips[item_cols].astype(object)).isin(lookup[kind])
+            items = trips.loc[hit, item_cols]
+            for dimension in SLICES:
+                keyed = pd.concat([labels.loc[items.index, dimension], items], axis=1)
+                counts = keyed.groupby([dimension] + item_cols, observed=True).size()
+                for value, slice_counts in counts.groupby(level=0):
+                    key = (kind, dimension, value)
+                    if key in exact:
+                        slice_counts = slice_counts.droplevel(0)
+                        exact[key] = slice_counts if exact[key] is None else exact[key].add(slice_counts, fill_value=0)
+
+            if kind == "routes" and set(ROUTE_COORDS) <= set(trips.columns):
+                first = trips.loc[hit].dropna(subset=ROUTE_COORDS).groupby(item_cols, observed=True)[ROUTE_COORDS].first()
+                coords = first if coords is None else coords.combine_first(first)
+
+    results = []
+    for key, frame in wanted.items():
+        kind, dimension, value = key
+        counts = exact[key] if exact[key] is not None else pd.Series(dtype="int64")
+        frame = frame.set_index(ITEMS[kind])
+        frame["count"] = counts.reindex(frame.index).fillna(0).astype("int64")
+        frame = frame.sort_values("count", ascending=False).reset_index()
+
+        # Exact when the N-th confirmed count reaches the most any left-out item can have
+        summary = tracker["summaries"][key]
+        n = n_by_kind[kind]
+        left_out = int(summary["counts"].nlargest(n + 1).iloc[n]) if len(summary["counts"]) > n else 0
+        bound = left_out + summary["decrement"]
+        frame["exact"] = bool(frame["count"].iloc[-1] >= bound) if len(frame) else summary["decrement"] == 0
+        frame.insert(0, "slice_value", value)
+        frame.insert(0, "slice", dimension)
+        frame.insert(0, "kind", kind)
+        results.append(frame)
+
+    table = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+    return table, coords
+
+################################################ Prepared Outputs ################################################
+
+## Write the per-slice table (routes with the coordinates of their first trip)
+# ---------------------------------------------------------
+def write_outputs(table, coords, path=TOP_BY_SLICE_PATH):
+    if coords is not None and len(table):
+        table = table.merge(coords.reset_index(), on=ITEMS["routes"], how="left")
+    table.to_csv(path, index=False)
+
+
+## Track during ingest (or over the dataset), confirm, and write the per-slice table
+# ---------------------------------------------------------
+def run(source=None, dataset_dir=TRIPS_DATASET_DIR, path=TOP_BY_SLICE_PATH, chunksize=DEFAULT_CHUNKSIZE,
+        capacity=None, years=None):
+    tracker = new_tracker(capacity)
+
+    if source is not None:
+        ingest_folder(source, dataset_dir, chunksize, on_chunk=lambda chunk: observe(tracker, chunk))
+    else:
+        for batch in iter_trip_batches(TRACK_COLUMNS, years, dataset_dir=dataset_dir):
+            observe(tracker, batch)
+
+    batches = iter_trip_batches(TRACK_COLUMNS + ROUTE_COORDS, years, dataset_dir=dataset_dir)
+    table, coords = confirm(tracker, batches, {"stations": TOP_STATIONS_N, "routes": TOP_ROUTES_N})
+    write_outputs(table, coords, path)
+    return table
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-pass top stations and routes per slice.")
+    parser.add_argument("--source", help="Folder of monthly CSVs to ingest and track in the same pass")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--station-capacity", type=int, default=DEFAULT_CAPACITY["stations"])
+    parser.add_argument("--route-capacity", type=int, default=DEFAULT_CAPACITY["routes"])
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per CSV chunk")
+    args = parser.parse_args()
+
+    capacity = {"stations": args.station_capacity, "routes": args.route_capacity}
+    table = run(args.source, args.dataset, TOP_BY_SLICE_PATH, args.chunksize, capacity)
+
+    overall = table[table["slice"] == "all"]
+    for kind in ITEMS:
+        exact = overall.loc[overall["kind"] == kind, "exact"].all()
+        print(f"{kind}: top list is {'exact' if exact else 'approximate (raise the capacity)'}")
+
+
+if __name__ == "__main__":
+    main()
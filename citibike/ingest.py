@@ -0,0 +1,420 @@
+################################################ CitiBike Streaming Ingest ################################################
+
+# Streams the monthly Citi Bike tripdata CSVs into a year/month partitioned Parquet dataset.
+# Each CSV is read in bounded-size chunks, cleaned (citibike.clean) and appended to its own
+# Parquet file as row groups, so peak memory depends on the chunk size only, not on how many
+# months are loaded. Rides whose ride_id was already loaded (in the same file or an earlier
+# month) are dropped on the way in (citibike.integrity).
+#
+# Any set of years can be loaded: the source folder is searched with its subfolders, and the
+# 2013-2020 files (pre-2021 schema: starttime, usertype, bikeid, ...) are mapped to the
+# current columns.
+#
+# Usage:
+#   python -m citibike.ingest --source "02_Data/Original_Data"      (every year folder in it)
+#   python -m citibike.ingest --source "02_Data/Original_Data/2022_citibike_tripdata"
+
+import argparse
+import csv
+import re
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from citibike import clean, integrity, stations
+from citibike.paths import ORIGINAL_DIR, TRIPS_DATASET_DIR
+
+################################################ Trip Schema ################################################
+
+## Explicit dtypes for the raw CSV columns
+# ---------------------------------------------------------
+CSV_DTYPES = {
+    "ride_id": str,
+    "rideable_type": "category",
+    "start_station_name": str,
+    "start_station_id": str,
+    "end_station_name": str,
+    "end_station_id": str,
+    "start_lat": "float64",
+    "start_lng": "float64",
+    "end_lat": "float64",
+    "end_lng": "float64",
+    "member_casual": "category",
+}
+
+TIMESTAMP_COLUMNS = ["started_at", "ended_at"]
+
+# Low-cardinality columns that are handed back as pandas categoricals
+CATEGORY_COLUMNS = ["rideable_type", "member_casual"]
+
+## Parquet schema (one compact schema for every partition)
+# ---------------------------------------------------------
+# Stations are int32 ids into the station dictionary (citibike.stations), which also holds the
+# canonical float32 coordinates; rider and bike types are dictionary-encoded; timestamps are
+# int64 epoch milliseconds.
+TRIP_SCHEMA = pa.schema([
+    ("ride_id", pa.string()),
+    ("rideable_type", pa.dictionary(pa.int8(), pa.string())),
+    ("started_at", pa.timestamp("ms")),
+    ("ended_at", pa.timestamp("ms")),
+    ("start_station", pa.int32()),
+    ("end_station", pa.int32()),
+    ("member_casual", pa.dictionary(pa.int8(), pa.string())),
+    # Written by the cleaning stage (citibike.clean)
+    ("date", pa.date32()),
+    ("hour", pa.int8()),
+    ("weekday", pa.int8()),
+    ("duration_s", pa.int32()),
+    ("reject_reason", pa.dictionary(pa.int8(), pa.string())),
+])
+
+# Columns of the raw CSVs, all of which can still be asked for when reading the dataset
+CSV_COLUMNS = ["ride_id", "rideable_type", "started_at", "ended_at",
+               "start_station_name", "start_station_id", "end_station_name", "end_station_id",
+               "start_lat", "start_lng", "end_lat", "end_lng", "member_casual"]
+
+LOGICAL_COLUMNS = CSV_COLUMNS + ["date", "hour", "weekday", "duration_s", "reject_reason"]
+
+DEFAULT_CHUNKSIZE = 500_000
+
+# Rough size of one tripdata CSV row, used to turn a row count into an Arrow read block size
+BYTES_PER_ROW = 160
+
+################################################ Reading the CSVs ################################################
+
+# Citi Bike names its files "202201-citibike-tripdata_1.csv" (2013-2016: "2014-07 - Citi Bike
+# trip data.csv"), so the period is in the file name
+PERIOD_NAME = re.compile(r"(\d{4})-?(\d{2})")
+
+
+## Find the monthly files
+# ---------------------------------------------------------
+# The folder and its subfolders (one per year, e.g. Original_Data/2022_citibike_tripdata), in
+# order of period; only files named after their period are trip files.
+def list_monthly_files(folder):
+    files = [path for path in Path(folder).rglob("*.csv") if PERIOD_NAME.match(path.name)]
+    return sorted(files, key=lambda path: (file_period(path), path.name))
+
+
+## Work out which year/month partition a file belongs to
+# ---------------------------------------------------------
+def file_period(csv_path):
+    match = PERIOD_NAME.match(Path(csv_path).name)
+    if match is None:
+        raise ValueError(f"Cannot read a YYYYMM period from the file name: {csv_path}")
+    return int(match.group(1)), int(match.group(2))
+
+################################################ Pre-2021 Schema ################################################
+
+## Columns of the 2013-2020 files (header spelling varies: "starttime", "Start Time")
+# ---------------------------------------------------------
+LEGACY_COLUMNS = {
+    "starttime": "started_at", "start time": "started_at",
+    "stoptime": "ended_at", "stop time": "ended_at",
+    "start station id": "start_station_id", "start station name": "start_station_name",
+    "start station latitude": "start_lat", "start station longitude": "start_lng",
+    "end station id": "end_station_id", "end station name": "end_station_name",
+    "end station latitude": "end_lat", "end station longitude": "end_lng",
+    "bikeid": "bike_id", "bike id": "bike_id",
+    "usertype": "member_casual", "user type": "member_casual",
+}
+
+LEGACY_RIDERS = {"Subscriber": "member", "Customer": "casual"}
+
+# Every pre-2021 trip was on a docked classic bike
+LEGACY_RIDEABLE_TYPE = "classic_bike"
+
+
+def read_header(csv_path):
+    with open(csv_path, newline="") as f:
+        return next(csv.reader(f), [])
+
+
+## Raw header name -> current column, for a file in the pre-2021 schema (None otherwise)
+# ---------------------------------------------------------
+def legacy_columns(header):
+    if "ride_id" in header:
+        return None
+    return {name: LEGACY_COLUMNS[name.strip().lower()] for name in header if name.strip().lower() in LEGACY_COLUMNS}
+
+
+## A pre-2021 chunk in the current columns
+# ---------------------------------------------------------
+# Those files have no ride_id; one is made from the bike and its start time, which identify a
+# trip, so rides repeated across files are still caught by the duplicate check.
+def from_legacy(chunk):
+    trip_keys = (chunk["bike_id"].fillna("") + "|" + chunk["started_at"].fillna("")).to_numpy(dtype=object)
+    chunk["ride_id"] = integrity.hex_ids(pd.util.hash_array(trip_keys))
+    chunk["rideable_type"] = LEGACY_RIDEABLE_TYPE
+    chunk["member_casual"] = chunk["member_casual"].map(LEGACY_RIDERS)
+    return chunk[CSV_COLUMNS]
+
+## Stream one CSV in chunks with explicit dtypes
+# ---------------------------------------------------------
+# Arrow's multi-threaded CSV reader streams blocks of about chunksize rows; the timestamps
+# are then parsed with the known Citi Bike formats in one vectorized pass (citibike.clean).
+# Files in the pre-2021 schema are mapped to the current columns on the way. Empty fields are missing values, so a trip without a station name gets no station (instead
+# of a station named "").
+def read_csv_chunks(csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    legacy = legacy_columns(read_header(csv_path))
+    column_types = {
+        col: pa.float64() if dtype == "float64" else pa.string()
+        for col, dtype in CSV_DTYPES.items()
+    }
+    column_types.update({col: pa.string() for col in TIMESTAMP_COLUMNS})
+    include_columns = CSV_COLUMNS
+    if legacy is not None:
+        column_types = {raw: column_types.get(col, pa.string()) for raw, col in legacy.items()}
+        include_columns = list(legacy)
+
+    reader = pv.open_csv(
+        csv_path,
+        read_options=pv.ReadOptions(block_size=chunksize * BYTES_PER_ROW),
+        convert_options=pv.ConvertOptions(column_types=column_types, include_columns=include_columns,
+                                           strings_can_be_null=True),
+    )
+    for batch in reader:
+        chunk = batch.to_pandas()
+        if legacy is not None:
+            chunk = from_legacy(chunk.rename(columns=legacy))
+        for col in CATEGORY_COLUMNS:
+            chunk[col] = chunk[col].astype("category")
+        for col in TIMESTAMP_COLUMNS:
+            chunk[col] = clean.parse_timestamps(chunk[col])
+        yield chunk
+
+
+## Convert a raw pandas chunk to a compact Arrow table (growing the station dictionary)
+# ---------------------------------------------------------
+def chunk_to_table(chunk, dictionary):
+    start_ids, end_ids, dictionary = stations.encode_trips(chunk, dictionary)
+    compact = pd.DataFrame({
+        "ride_id": chunk["ride_id"],
+        "rideable_type": chunk["rideable_type"],
+        "started_at": chunk["started_at"],
+        "ended_at": chunk["ended_at"],
+        "start_station": start_ids,
+        "end_station": end_ids,
+        "member_casual": chunk["member_casual"],
+        "date": chunk["date"],
+        "hour": chunk["hour"],
+        "weekday": chunk["weekday"],
+        "duration_s": chunk["duration_s"],
+        "reject_reason": chunk["reject_reason"],
+    })
+    table = pa.Table.from_pandas(compact, schema=TRIP_SCHEMA, preserve_index=False)
+    return table, dictionary
+
+################################################ Writing the Dataset ################################################
+
+## Partition folder for a given period
+# ---------------------------------------------------------
+def partition_dir(dataset_dir, year, month):
+    return Path(dataset_dir) / f"year={year}" / f"month={month}"
+
+
+## Ingest one CSV into its partition
+# ---------------------------------------------------------
+# Each chunk loses the rides already seen (seen: citibike.integrity.open_seen, shared across the
+# files of one load), goes through the cleaning stage and becomes one Parquet row group. Invalid
+# trips are kept with their reject_reason, or dropped with drop_invalid=True; either way the
+# counts, with the duplicates and the trips whose stations do not resolve, are written to
+# _rejections/<file>.csv. The file is written under a temporary name and renamed at the end,
+# so an interrupted run never leaves a half file behind.
+# on_chunk, if given, is called with every cleaned chunk (to track statistics during ingest).
+# Returns the rows read and the ingest check counts (integrity.INGEST_CHECKS).
+def ingest_file(csv_path, dataset_dir=TRIPS_DATASET_DIR, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None,
+                drop_invalid=False, seen=None):
+    year, month = file_period(csv_path)
+    out_dir = partition_dir(dataset_dir, year, month)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    name = Path(csv_path).stem
+    out_path = out_dir / f"{name}.parquet"
+    tmp_path = out_path.with_suffix(".parquet.tmp")
+
+    dictionary = stations.load_dictionary(dataset_dir)
+    if seen is None:
+        check_reingest([csv_path], dataset_dir)
+        seen = integrity.open_seen(integrity.ride_ids_dir(dataset_dir), expected_rows([csv_path]), exclude={name})
+
+    rows = 0
+    rejected = pd.Series(0, index=clean.REJECT_REASONS)
+    checks = pd.Series(0, index=integrity.INGEST_CHECKS)
+    with pq.ParquetWriter(tmp_path, TRIP_SCHEMA, compression="zstd") as writer:
+        for chunk in read_csv_chunks(csv_path, chunksize):
+            rows += len(chunk)
+            chunk, duplicates = integrity.drop_seen(chunk, seen)
+            checks["duplicate_ride_id"] += duplicates
+            chunk, counts = clean.clean_chunk(chunk)
+            rejected += counts
+            if drop_invalid:
+                chunk = chunk[chunk["reject_reason"].isna()]
+
+            table, dictionary = chunk_to_table(chunk, dictionary)
+            checks["unresolved_start_station"] += table["start_station"].null_count
+            checks["unresolved_end_station"] += table["end_station"].null_count
+            writer.write_table(table)
+            if on_chunk is not None:
+                on_chunk(chunk)
+
+    # The dictionary and the ride keys are saved before the file appears, so every id in the
+    # dataset can be decoded and a re-run does not count the file's rides twice
+    stations.save_dictionary(dictionary, dataset_dir)
+    integrity.commit_seen(seen, name)
+    clean.write_rejection_report(pd.concat([rejected, checks]), rows,
+                                 Path(dataset_dir) / "_rejections" / f"{name}.csv")
+    tmp_path.replace(out_path)
+    return rows, checks
+
+
+## Rough number of rides in some CSVs (sizes the duplicate filter)
+# ---------------------------------------------------------
+def expected_rows(csv_paths):
+    return sum(Path(path).stat().st_size for path in csv_paths) // BYTES_PER_ROW
+
+
+## Refuse a re-ingest that would lose rides
+# ---------------------------------------------------------
+# A re-ingested file no longer counts its own stored rides as seen, but its rides are still
+# checked against the files loaded after it, and those dropped the rides they shared with it
+# as duplicates: neither copy would survive. So a file already in the dataset can only be
+# re-ingested together with every stored file of a later period.
+def check_reingest(csv_paths, dataset_dir=TRIPS_DATASET_DIR):
+    stored = integrity.stored_files(integrity.ride_ids_dir(dataset_dir))
+    loading = {Path(path).stem for path in csv_paths}
+    reloaded = [(file_period(path), Path(path).stem) for path in csv_paths if Path(path).stem in stored]
+    if not reloaded:
+        return
+    first = min(reloaded)
+    later = sorted(name for name in stored - loading if (file_period(name), name) > first)
+    if later:
+        raise ValueError(
+            f"Re-ingesting {first[1]} would drop the rides it shares with files loaded after it; "
+            f"re-ingest it together with {', '.join(later)}"
+        )
+
+
+## Ingest every monthly CSV in a folder
+# ---------------------------------------------------------
+# The files are checked for duplicate rides against each other and against the months already
+# in the dataset; the earliest copy of a ride is kept. Returns one row per file (rows read,
+# duplicates dropped, partition).
+def ingest_folder(folder, dataset_dir=TRIPS_DATASET_DIR, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None,
+                  drop_invalid=False):
+    files = list_monthly_files(folder)
+    check_reingest(files, dataset_dir)
+    seen = integrity.open_seen(integrity.ride_ids_dir(dataset_dir), expected_rows(files),
+                               exclude={path.stem for path in files})
+
+    summary = []
+    for csv_path in files:
+        year, month = file_period(csv_path)
+        rows, checks = ingest_file(csv_path, dataset_dir, chunksize, on_chunk, drop_invalid, seen)
+        summary.append({"file": csv_path.name, "year": year, "month": month, "rows": rows,
+                        "duplicates": int(checks["duplicate_ride_id"])})
+    return pd.DataFrame(summary, columns=["file", "year", "month", "rows", "duplicates"])
+
+################################################ Reading the Dataset ################################################
+
+## Open the partitioned dataset
+# ---------------------------------------------------------
+def open_trips(dataset_dir=TRIPS_DATASET_DIR):
+    return ds.dataset(dataset_dir, format="parquet", partitioning="hive")
+
+
+## Build a partition filter so only the requested years/months are touched
+# ---------------------------------------------------------
+def partition_filter(years=None, months=None):
+    expr = None
+    if years is not None:
+        expr = ds.field("year").isin(list(years))
+    if months is not None:
+        month_expr = ds.field("month").isin(list(months))
+        expr = month_expr if expr is None else expr & month_expr
+    return expr
+
+
+## Physical columns needed to produce the requested logical columns
+# ---------------------------------------------------------
+def physical_columns(columns):
+    if columns is None:
+        return None
+    physical = []
+    for col in columns:
+        if col in TRIP_SCHEMA.names:
+            physical.append(col)
+        for end, mapping in stations.DECODED_COLUMNS.items():
+            if col in mapping:
+                physical.append(f"{end}_station")
+    return list(dict.fromkeys(physical))
+
+
+## Arrow -> pandas with the project's dtypes, decoding station columns when asked for
+# ---------------------------------------------------------
+# decode=False returns the compact representation (station ids, no coordinates).
+def to_frame(table, columns=None, dictionary=None):
+    df = table.to_pandas(date_as_object=False)
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    if columns is None or dictionary is None:
+        return df
+
+    df = stations.decode_trips(df, dictionary, columns)
+    return df[[col for col in columns if col in df.columns]]
+
+
+## Read the trips, projecting columns and pruning partitions
+# ---------------------------------------------------------
+def read_trips(columns=None, years=None, months=None, dataset_dir=TRIPS_DATASET_DIR, decode=True):
+    columns = LOGICAL_COLUMNS if columns is None and decode else columns
+    table = open_trips(dataset_dir).to_table(
+        columns=physical_columns(columns),
+        filter=partition_filter(years, months),
+    )
+    dictionary = stations.load_dictionary(dataset_dir) if decode else None
+    return to_frame(table, columns, dictionary)
+
+
+## Stream the trips batch by batch (bounded memory for full-year aggregation)
+# ---------------------------------------------------------
+def iter_trip_batches(columns=None, years=None, months=None, dataset_dir=TRIPS_DATASET_DIR,
+                      batch_size=DEFAULT_CHUNKSIZE, decode=True):
+    columns = LOGICAL_COLUMNS if columns is None and decode else columns
+    dictionary = stations.load_dictionary(dataset_dir) if decode else None
+    batches = open_trips(dataset_dir).to_batches(
+        columns=physical_columns(columns),
+        filter=partition_filter(years, months),
+        batch_size=batch_size,
+    )
+    for batch in batches:
+        if batch.num_rows:
+            yield to_frame(pa.Table.from_batches([batch]), columns, dictionary)
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream monthly Citi Bike CSVs into a partitioned Parquet dataset.")
+    parser.add_argument("--source", default=ORIGINAL_DIR,
+                        help="Folder holding the monthly tripdata CSVs (searched with its subfolders)")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Output dataset folder")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per CSV chunk")
+    parser.add_argument("--drop-invalid", action="store_true",
+                        help="Drop trips the cleaning stage rejects instead of flagging them")
+    args = parser.parse_args()
+
+    summary = ingest_folder(args.source, args.dataset, args.chunksize, drop_invalid=args.drop_invalid)
+    for file in summary.itertuples():
+        print(f"{file.file}: {file.rows:,} rows ({file.duplicates:,} duplicate rides dropped) "
+              f"-> year={file.year}/month={file.month}")
+    print(f"Ingested {summary['rows'].sum():,} rows from {len(summary)} files, "
+          f"dropped {summary['duplicates'].sum():,} duplicate rides")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+################################################ CitiBike Integrity Checks ################################################
+
+# Ride deduplication at ingest and referential checks on the dataset.
+#
+# Citi Bike's monthly exports overlap at the month boundaries and sometimes repeat a ride_id,
+# and pd.concat in Exercise 2.2 kept every copy. The ingest drops every ride whose ride_id was
+# already seen, in this file or in any month loaded before it (the earliest copy is kept):
+#   - ride_ids are 16 hex digits, so each one is stored exactly as a uint64 key (ids of any
+#     other form are hashed to 64 bits)
+#   - the keys of every ingested file are kept as a sorted array in _ride_ids/<file>.npy, next
+#     to the partitions, and memory-mapped when checking
+#   - a Bloom filter over all keys (12 bits per ride, about 1% false positives) screens every
+#     chunk; only its hits are confirmed exactly against the sorted arrays
+# Memory is the filter plus the keys of the file being ingested (8 bytes per ride).
+#
+# The referential checks report trips whose start or end station does not resolve in the
+# station dictionary, and trip dates without weather (the rows the merge(how="right") of
+# Exercise 2.7 dropped silently).
+#
+# Usage:
+#   python -m citibike.integrity [--dataset 02_Data/Trips_Dataset] [--weather weather_df.csv]
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from citibike import stations
+from citibike.paths import DATA_DIR, TRIPS_DATASET_DIR
+
+INTEGRITY_PATH = DATA_DIR / "integrity_report.csv"
+
+RIDE_IDS_DIR = "_ride_ids"
+
+# Counts the ingest adds to each file's report in _rejections/ (duplicates are dropped,
+# unresolved stations are kept with a missing station id)
+INGEST_CHECKS = ["duplicate_ride_id", "unresolved_start_station", "unresolved_end_station"]
+
+## Bloom filter sizing (about 1% false positives at capacity)
+# ---------------------------------------------------------
+# Register-blocked: all bits of a key fall in one uint64 word, so adding or testing a key
+# touches one word.
+BLOOM_BITS_PER_RIDE = 12
+BLOOM_HASHES = 6
+
+# Keys added to or built into the filter per step (bounds the temporary arrays)
+FILTER_BATCH = 1_000_000
+
+################################################ Ride Id Keys ################################################
+
+## Value of every ASCII hex digit, 255 for anything else
+# ---------------------------------------------------------
+HEX_VALUES = np.full(256, 255, dtype="uint8")
+HEX_VALUES[np.frombuffer(b"0123456789", dtype="uint8")] = np.arange(10)
+HEX_VALUES[np.frombuffer(b"ABCDEF", dtype="uint8")] = np.arange(10, 16)
+HEX_VALUES[np.frombuffer(b"abcdef", dtype="uint8")] = np.arange(10, 16)
+
+
+## uint64 key of every ride_id, and which rows have one
+# ---------------------------------------------------------
+# 16 hex digit ids are decoded straight from the Arrow string buffer; any other id is hashed.
+def ride_keys(ride_ids):
+    ids = pa.array(ride_ids, type=pa.string(), from_pandas=True)
+    keyed = ids.is_valid().to_numpy(zero_copy_only=False)
+    keys = np.zeros(len(ids), dtype="uint64")
+
+    sixteen = pc.fill_null(pc.equal(pc.binary_length(ids), 16), False).to_numpy(zero_copy_only=False)
+    decoded = np.zeros(len(ids), dtype=bool)
+    if sixteen.any():
+        fixed = ids.filter(pa.array(sixteen))
+        offsets = np.frombuffer(fixed.buffers()[1], dtype="int32")[fixed.offset:fixed.offset + len(fixed) + 1]
+        digits = HEX_VALUES[np.frombuffer(fixed.buffers()[2], dtype="uint8")[offsets[0]:offsets[-1]].reshape(-1, 16)]
+        is_hex = digits.max(axis=1) < 16
+        # Two digits per byte, read as a big-endian uint64
+        values = np.ascontiguousarray((digits[:, 0::2] << 4) | digits[:, 1::2]).view(">u8").ravel().astype("uint64")
+        rows = np.flatnonzero(sixteen)[is_hex]
+        keys[rows] = values[is_hex]
+        decoded[rows] = True
+
+    hashed = keyed & ~decoded
+    if hashed.any():
+        keys[hashed] = pd.util.hash_array(ids.filter(pa.array(hashed)).to_numpy(zero_copy_only=False))
+    return keys, keyed
+
+## 16 hex digit ride_ids for uint64 keys (ids made for files without a ride_id)
+# ---------------------------------------------------------
+HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype="uint8")
+
+
+def hex_ids(keys):
+    keys = np.asarray(keys, dtype="uint64")
+    shifts = np.arange(60, -4, -4, dtype="uint64")
+    digits = HEX_DIGITS[(keys[:, None] >> shifts) & np.uint64(15)]
+    return np.ascontiguousarray(digits).view("S16").ravel().astype(str).astype(object)
+
+################################################ Bloom Filter ################################################
+
+## Empty filter for about capacity rides (a power of two number of uint64 words)
+# ---------------------------------------------------------
+def new_filter(capacity):
+    words = 1 << max(6, int(np.ceil(np.log2(max(capacity, 1) * BLOOM_BITS_PER_RIDE / 64))))
+    return np.zeros(words, dtype="uint64")
+
+
+## Word and bit mask of every key (two multiplicative hashes: one picks the word, one the bits)
+# ---------------------------------------------------------
+def filter_slots(keys, words):
+    word = ((keys * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)) & np.uint64(len(words) - 1)
+    bits = keys * np.uint64(0xC2B2AE3D27D4EB4F)
+    mask = np.zeros(len(keys), dtype="uint64")
+    for i in range(BLOOM_HASHES):
+        mask |= np.uint64(1) << ((bits >> np.uint64(64 - 6 * (i + 1))) & np.uint64(63))
+    return word, mask
+
+
+def filter_add(words, keys):
+    for start in range(0, len(keys), FILTER_BATCH):
+        word, mask = filter_slots(np.asarray(keys[start:start + FILTER_BATCH], dtype="uint64"), words)
+        np.bitwise_or.at(words, word, mask)
+
+
+## Keys that may have been added (no false negatives)
+# ---------------------------------------------------------
+def filter_contains(words, keys):
+    word, mask = filter_slots(keys, words)
+    return (words[word] & mask) == mask
+
+################################################ Seen Rides ################################################
+
+def ride_ids_dir(dataset_dir=TRIPS_DATASET_DIR):
+    return Path(dataset_dir) / RIDE_IDS_DIR
+
+
+## Rides already loaded: the sorted keys of every ingested file and a filter over all of them
+# ---------------------------------------------------------
+# capacity is the number of new rides expected (the filter is sized for those plus the stored
+# ones). exclude leaves out the keys stored for the given files, so re-ingesting a file does
+# not count its own rides as duplicates (citibike.ingest.check_reingest makes sure the files
+# loaded after it are re-ingested with it).
+def open_seen(store_dir, capacity=0, exclude=()):
+    store_dir = Path(store_dir)
+    runs = [np.load(path, mmap_mode="r") for path in sorted(store_dir.glob("*.npy")) if path.stem not in exclude]
+    return new_seen(runs, capacity, store_dir)
+
+
+## Seen rides from sorted key arrays already in memory (store_dir: where commit_seen writes)
+# ---------------------------------------------------------
+def new_seen(runs=(), capacity=0, store_dir=None):
+    runs = [np.asarray(run, dtype="uint64") for run in runs]
+    words = new_filter(capacity + sum(len(run) for run in runs))
+    for run in runs:
+        filter_add(words, run)
+    return {"dir": store_dir, "words": words, "runs": runs, "current": [], "dropped": 0}
+
+
+## Is each key in any stored array or in the file being loaded? (exact)
+# ---------------------------------------------------------
+def seen_exactly(seen, keys):
+    found = np.zeros(len(keys), dtype=bool)
+    for run in seen["runs"] + seen["current"]:
+        if len(run) == 0:
+            continue
+        positions = np.minimum(np.searchsorted(run, keys), len(run) - 1)
+        found |= run[positions] == keys
+    return found
+
+
+## Drop the rides of a chunk that were already seen (or repeat earlier in the chunk)
+# ---------------------------------------------------------
+# The chunk's new keys are remembered for the rest of the file. Returns the kept rows and the
+# number of duplicates dropped (seen["dropped"] keeps the running total).
+def drop_seen(chunk, seen):
+    keys, keyed = ride_keys(chunk["ride_id"])
+
+    # Repeats within the chunk: every copy after the first
+    order = np.argsort(keys, kind="stable")
+    order = order[keyed[order]]
+    repeat = np.zeros(len(keys), dtype=bool)
+    repeat[order[1:]] = keys[order[1:]] == keys[order[:-1]]
+
+    # Seen before: screened by the filter, confirmed against the sorted keys
+    candidates = np.flatnonzero(keyed & ~repeat)
+    candidates = candidates[filter_contains(seen["words"], keys[candidates])]
+    candidates = candidates[np.argsort(keys[candidates])]
+    duplicate = repeat
+    duplicate[candidates[seen_exactly(seen, keys[candidates])]] = True
+
+    new_keys = np.sort(keys[keyed & ~duplicate])
+    filter_add(seen["words"], new_keys)
+    seen["current"].append(new_keys)
+
+    dropped = int(duplicate.sum())
+    seen["dropped"] += dropped
+    return (chunk[~duplicate] if dropped else chunk), dropped
+
+
+## Store the keys of the file just loaded (written under a temporary name, then renamed)
+# ---------------------------------------------------------
+def commit_seen(seen, name):
+    path = commit_keys(seen["dir"], name, seen_keys(seen))
+    seen["runs"].append(np.load(path, mmap_mode="r"))
+    seen["current"] = []
+
+
+## The sorted keys of the file being loaded
+# ---------------------------------------------------------
+def seen_keys(seen):
+    return np.sort(np.concatenate(seen["current"])) if seen["current"] else np.zeros(0, dtype="uint64")
+
+
+## Write one file's sorted keys to the store
+# ---------------------------------------------------------
+def commit_keys(store_dir, name, keys):
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    path = store_dir / f"{name}.npy"
+    tmp_path = path.with_suffix(".npy.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, keys)
+    tmp_path.replace(path)
+    return path
+
+
+## Files whose ride keys are stored (file name stems)
+# ---------------------------------------------------------
+def stored_files(store_dir):
+    return {path.stem for path in Path(store_dir).glob("*.npy")}
+
+################################################ Referential Checks ################################################
+
+## Trips per end whose station id is missing or not in the station dictionary, and rides per date
+# ---------------------------------------------------------
+# One pass over the compact columns (station ids and date) of the dataset.
+def scan_dataset(dataset_dir=TRIPS_DATASET_DIR, years=None):
+    from citibike.ingest import iter_trip_batches
+
+    known = stations.load_dictionary(dataset_dir)["station_id"].to_numpy()
+    unresolved = {"start": 0, "end": 0}
+    daily = []
+    columns = ["start_station", "end_station", "date"]
+    for batch in iter_trip_batches(columns, years, dataset_dir=dataset_dir, decode=False):
+        for end in unresolved:
+            ids = batch[f"{end}_station"]
+            unresolved[end] += int(ids.isna().sum() + (~ids.dropna().isin(known)).sum())
+        daily.append(batch["date"].value_counts())
+    rides = pd.concat(daily).groupby(level=0).sum() if daily else pd.Series(dtype="int64")
+    return unresolved, rides.rename_axis("date").sort_index()
+
+
+## Dates with rides but no temperature
+# ---------------------------------------------------------
+def dates_without_weather(rides, weather):
+    temps = weather.dropna(subset=["avgTemp"])["date"]
+    dates = pd.to_datetime(pd.Series(rides.index))
+    return dates[~dates.isin(temps)].reset_index(drop=True)
+
+
+## Totals of the per-file reports written by the ingest (cleaning rejections and ingest checks)
+# ---------------------------------------------------------
+def ingest_totals(dataset_dir=TRIPS_DATASET_DIR):
+    reports = [pd.read_csv(path) for path in sorted((Path(dataset_dir) / "_rejections").glob("*.csv"))]
+    if not reports:
+        return pd.Series(dtype="int64")
+    return pd.concat(reports).groupby("reason", sort=False)["trips"].sum()
+
+
+## The full report: one row per check with its count
+# ---------------------------------------------------------
+def integrity_report(dataset_dir=TRIPS_DATASET_DIR, weather=None, years=None):
+    if weather is None:
+        from citibike.prepare import load_weather
+        weather = load_weather()
+
+    totals = ingest_totals(dataset_dir)
+    unresolved, rides = scan_dataset(dataset_dir, years)
+    missing = dates_without_weather(rides, weather)
+    rows = [
+        ("trips", int(rides.sum()), ""),
+        ("duplicate_ride_id", int(totals.get("duplicate_ride_id", 0)), "dropped at ingest"),
+        ("unresolved_start_station", unresolved["start"], "station id missing or not in the dictionary"),
+        ("unresolved_end_station", unresolved["end"], "station id missing or not in the dictionary"),
+        ("dates_without_weather", len(missing), " ".join(missing.dt.strftime("%Y-%m-%d").head(10))),
+        ("trips_without_weather", int(rides[rides.index.isin(missing)].sum()), "left out of daily_sub_df.csv"),
+    ]
+    return pd.DataFrame(rows, columns=["check", "count", "detail"])
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Report duplicate rides and orphaned trips in the trip dataset.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--years", type=int, nargs="*", help="Only check these years")
+    parser.add_argument("--weather", help="CSV with date and avgTemp columns (default: weather_df.csv from citibike.weather)")
+    parser.add_argument("--out", default=INTEGRITY_PATH, help="Where to write the report")
+    args = parser.parse_args()
+
+    weather = None
+    if args.weather:
+        from citibike.prepare import load_weather
+        weather = load_weather(args.weather)
+    report = integrity_report(args.dataset, weather, args.years)
+    report.to_csv(args.out, index=False)
+    print(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+################################################ CitiBike Project Paths ################################################
+
+from pathlib import Path
+
+## Project folders
+# ---------------------------------------------------------
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+DATA_DIR = PROJECT_DIR / "02_Data"
+ORIGINAL_DIR = DATA_DIR / "Original_Data"
+PREPARED_DIR = DATA_DIR / "Prepared_Data"
+
+# Year/month partitioned Parquet dataset written by citibike.ingest
+TRIPS_DATASET_DIR = DATA_DIR / "Trips_Dataset"
+
+# Running aggregates (and the ledger of loaded months) behind the incremental refresh
+AGGREGATES_DIR = DATA_DIR / "Aggregates"
+
+# Integer-encoded ride cube and its rollups written by citibike.cube
+CUBE_DIR = DATA_DIR / "Cube"
+
+# Memory-mappable Arrow copies of the dashboard tables written by citibike.store
+STORE_DIR = DATA_DIR / "Store"
+
+VISUALS_DIR = PROJECT_DIR / "04_Analysis" / "Visualizations"
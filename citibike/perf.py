@@ -0,0 +1,259 @@
+################################################ CitiBike Dashboard Timing ################################################
+
+# Per-rerun timing of the dashboard: spans around data loads, figure builds and component
+# renders, with the size of what each one produced or sent to the browser.
+#
+# Every Streamlit rerun is one run (start_run ... finish_run) in the session's script thread.
+# Finished runs are kept per page in a rolling window shared by all sessions of the process,
+# which gives p50 / p95 per page and per span; they can also be appended to a JSON-lines log.
+#
+# Timing is off unless CITIBIKE_PERF=1 is set or the page is opened with ?perf=1. When off,
+# span() hands back one shared no-op context manager and timed() / render() call straight
+# through, so the cost is one attribute lookup per call. numpy and pandas are only imported by
+# the summaries, so importing this module adds nothing to the dashboard's cold start.
+#
+# Usage:
+#   CITIBIKE_PERF=1 CITIBIKE_PERF_LOG=perf.jsonl streamlit run CitiBike_dashboard_Part2.py
+#   python -m citibike.perf perf.jsonl            (p50 / p95 per page and span from a log)
+#   python -m citibike.perf --startup             (cold start and page navigation times)
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from citibike.paths import PROJECT_DIR
+
+# Finished runs kept per page for the rolling percentiles
+ROLLING_RUNS = 200
+
+DASHBOARD_SCRIPT = PROJECT_DIR / "CitiBike_dashboard_Part2.py"
+
+_local = threading.local()
+_history = defaultdict(lambda: deque(maxlen=ROLLING_RUNS))
+_lock = threading.Lock()
+_off = nullcontext()
+
+################################################ Recording ################################################
+
+## Size in bytes of what a step produced (frames in memory, figures/decks/HTML as sent)
+# ---------------------------------------------------------
+def payload_size(obj):
+    if obj is None:
+        return None
+    # A frame means pandas is loaded already; the check itself must not import it
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, (str, bytes)):
+        return len(obj)
+    if isinstance(obj, dict):
+        sizes = [payload_size(value) for value in obj.values()]
+        return sum(size for size in sizes if size is not None)
+    if hasattr(obj, "to_json"):
+        return len(obj.to_json())
+    return None
+
+
+## Start timing one rerun of a page (enabled by CITIBIKE_PERF=1 or the caller, e.g. ?perf=1)
+# ---------------------------------------------------------
+def start_run(page, enabled=False):
+    enabled = enabled or os.environ.get("CITIBIKE_PERF") == "1"
+    _local.run = {"page": page, "started": time.time(), "start": time.perf_counter(), "spans": []} if enabled else None
+
+
+def current_run():
+    return getattr(_local, "run", None)
+
+
+def enabled():
+    return current_run() is not None
+
+
+class Span:
+    def __init__(self, run, kind, name):
+        self.run, self.kind, self.name = run, kind, name
+        self.payload = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.run["spans"].append({
+            "kind": self.kind, "name": self.name, "ms": elapsed * 1000,
+            "bytes": payload_size(self.payload),
+        })
+
+
+## Time a block: with perf.span("figure", "rides_weather") as s: ...; s.payload = fig
+# ---------------------------------------------------------
+def span(kind, name):
+    run = current_run()
+    return _off if run is None else Span(run, kind, name)
+
+
+## Time a call and record the size of its result (data loads)
+# ---------------------------------------------------------
+def timed(kind, name, fn, *args, **kwargs):
+    run = current_run()
+    if run is None:
+        return fn(*args, **kwargs)
+    with Span(run, kind, name):
+        result = fn(*args, **kwargs)
+    run["spans"][-1]["bytes"] = payload_size(result)
+    return result
+
+
+## Render a component and record the size of what it sends (chart, deck, HTML, table)
+# ---------------------------------------------------------
+def render(name, component, payload, *args, **kwargs):
+    run = current_run()
+    if run is None:
+        return component(payload, *args, **kwargs)
+    with Span(run, "render", name):
+        result = component(payload, *args, **kwargs)
+    run["spans"][-1]["bytes"] = payload_size(payload)
+    return result
+
+
+## Close the run: add it to the rolling window and the log (CITIBIKE_PERF_LOG)
+# ---------------------------------------------------------
+def finish_run(log_path=None):
+    run = current_run()
+    if run is None:
+        return None
+    _local.run = None
+    record = {
+        "page": run["page"], "started": run["started"],
+        "total_ms": (time.perf_counter() - run["start"]) * 1000, "spans": run["spans"],
+    }
+    with _lock:
+        _history[run["page"]].append(record)
+        log_path = log_path or os.environ.get("CITIBIKE_PERF_LOG")
+        if log_path:
+            with open(log_path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+    return record
+
+################################################ Summaries ################################################
+
+## One run's spans as a table
+# ---------------------------------------------------------
+def run_frame(record):
+    import pandas as pd
+
+    frame = pd.DataFrame(record["spans"], columns=["kind", "name", "ms", "bytes"])
+    return frame.astype({"ms": "float64", "bytes": "float64"})
+
+
+## p50 / p95 per page (whole run) and per span, over the given runs
+# ---------------------------------------------------------
+def summarize(records):
+    import numpy as np
+    import pandas as pd
+
+    records = list(records)
+    if not records:
+        return pd.DataFrame(columns=["page", "kind", "name", "runs", "p50_ms", "p95_ms", "mean_kb"])
+    rows = [{"page": r["page"], "kind": "run", "name": "total", "ms": r["total_ms"], "bytes": np.nan}
+            for r in records]
+    rows += [{"page": r["page"], **span} for r in records for span in r["spans"]]
+    frame = pd.DataFrame(rows).astype({"ms": "float64", "bytes": "float64"})
+    summary = frame.groupby(["page", "kind", "name"], sort=False).agg(
+        runs=("ms", "size"),
+        p50_ms=("ms", lambda ms: np.percentile(ms, 50)),
+        p95_ms=("ms", lambda ms: np.percentile(ms, 95)),
+        mean_kb=("bytes", lambda b: b.mean() / 1024),
+    )
+    return summary.reset_index()
+
+
+## Rolling summary of this process (all sessions)
+# ---------------------------------------------------------
+def rolling_summary(page=None):
+    with _lock:
+        records = [r for p, runs in _history.items() if page in (None, p) for r in runs]
+    return summarize(records)
+
+
+def read_log(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+################################################ Startup Check ################################################
+
+## Cold start and page navigation of the dashboard script, in this process (see startup_check)
+# ---------------------------------------------------------
+# cold_ms: the first run, to the first paint of the default page; first_ms: the first open of
+# each page; again_ms: p50 of later opens with the same filters. Streamlit's AppTest drives
+# the script without a browser.
+def startup_timing(script, repeats=5):
+    import numpy as np
+    from streamlit.testing.v1 import AppTest
+
+    started = time.perf_counter()
+    app = AppTest.from_file(str(script), default_timeout=600).run()
+    cold_ms = (time.perf_counter() - started) * 1000
+    pages = list(app.sidebar.radio[0].options)
+
+    def open_page(page):
+        started = time.perf_counter()
+        app.sidebar.radio[0].set_value(page).run()
+        if app.exception:
+            raise RuntimeError(f"{page}: {app.exception[0].value}")
+        return (time.perf_counter() - started) * 1000
+
+    first = {page: open_page(page) for page in pages[1:] + pages[:1]}
+    again = defaultdict(list)
+    for _ in range(repeats):
+        for page in pages:
+            again[page].append(open_page(page))
+    return {
+        "cold_ms": cold_ms,
+        "pages": [{"page": page, "first_ms": first[page], "again_ms": float(np.percentile(again[page], 50))}
+                  for page in pages],
+    }
+
+
+## The same in a fresh process, so nothing is imported or loaded yet
+# ---------------------------------------------------------
+def startup_check(script, repeats=5):
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(startup_timing, str(script), repeats).result()
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="p50 / p95 per page and span from a dashboard timing log.")
+    parser.add_argument("log", nargs="?", help="JSON-lines file written with CITIBIKE_PERF_LOG")
+    parser.add_argument("--page", help="Only this page")
+    parser.add_argument("--startup", action="store_true", help="Time the cold start and page navigation instead")
+    parser.add_argument("--script", default=DASHBOARD_SCRIPT, help="Dashboard script for --startup")
+    parser.add_argument("--repeats", type=int, default=5, help="Later opens of each page for --startup")
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    if args.startup:
+        timing = startup_check(args.script, args.repeats)
+        print(f"Cold start to first paint: {timing['cold_ms']:,.0f} ms")
+        print(pd.DataFrame(timing["pages"]).round(1).to_string(index=False))
+        return
+    if args.log is None:
+        parser.error("give a log file or --startup")
+
+    records = [r for r in read_log(args.log) if args.page in (None, r["page"])]
+    print(summarize(records).round(1).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
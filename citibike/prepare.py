@@ -0,0 +1,151 @@
+################################################ CitiBike Prepared Data ################################################
+
+# Builds the files in 02_Data/Prepared_Data from mergeable partial aggregates
+# (see citibike.aggregates), so the full trip table is never held in memory.
+#
+# Usage:
+#   python -m citibike.prepare --years 2022                  (from the partitioned dataset)
+#   python -m citibike.prepare --parallel --source <folder>  (one monthly CSV per worker)
+
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from citibike import aggregates
+from citibike.ingest import DEFAULT_CHUNKSIZE, list_monthly_files
+from citibike.paths import AGGREGATES_DIR, PREPARED_DIR, TRIPS_DATASET_DIR
+from citibike.weather import WEATHER_PATH
+
+TOP_STATIONS_N = 20
+TOP_ROUTES_N = 500
+
+################################################ Helpers ################################################
+
+## Map months to seasons
+# ---------------------------------------------------------
+SEASON_BY_MONTH = {
+    12: "Winter", 1: "Winter", 2: "Winter",
+    3: "Spring", 4: "Spring", 5: "Spring",
+    6: "Summer", 7: "Summer", 8: "Summer",
+    9: "Fall", 10: "Fall", 11: "Fall",
+}
+
+
+def get_season(dates):
+    return pd.Series(dates).dt.month.map(SEASON_BY_MONTH).to_numpy()
+
+
+## Parquet files of the trip dataset for the selected years/months
+# ---------------------------------------------------------
+def dataset_files(dataset_dir=TRIPS_DATASET_DIR, years=None, months=None):
+    files = sorted(Path(dataset_dir).glob("year=*/month=*/*.parquet"))
+    return [
+        path for path in files
+        if (years is None or path.parent.parent.name in {f"year={y}" for y in years})
+        and (months is None or path.parent.name in {f"month={m}" for m in months})
+    ]
+
+################################################ Prepared Artifacts ################################################
+
+## Weather (date, avgTemp) used for the daily join
+# ---------------------------------------------------------
+# Defaults to the NOAA download (citibike.weather) when there is one, otherwise to the
+# temperatures already stored in daily_sub_df.csv
+def load_weather(path=None):
+    if path is None:
+        path = WEATHER_PATH if WEATHER_PATH.exists() else PREPARED_DIR / "daily_sub_df.csv"
+    weather = pd.read_csv(path, usecols=["date", "avgTemp"], parse_dates=["date"])
+    return weather.astype({"avgTemp": "float64"})
+
+
+## Weather for (re)building daily_sub_df: weather_df.csv, never daily_sub_df.csv itself
+# ---------------------------------------------------------
+# Reading the output back in as its source would keep only the dates it already had.
+def daily_weather(path=WEATHER_PATH):
+    if not Path(path).exists():
+        raise FileNotFoundError(
+            f"{path} is needed to build daily_sub_df.csv: download it with python -m citibike.weather "
+            "(or citibike.build --weather-start ... --weather-end ...), or pass a weather CSV"
+        )
+    return load_weather(path)
+
+
+## daily_sub_df: rides per day joined to the weather, with a season label
+# ---------------------------------------------------------
+# Days the weather covers but no loaded trip file does keep a blank ride count (not zero), so
+# they are not mistaken for days without rides.
+def build_daily_sub_df(daily_counts, weather):
+    daily_sub_df = daily_counts.merge(weather, how="right", on="date")
+    daily_sub_df["bike_rides_daily"] = daily_sub_df["bike_rides_daily"].astype("Int64")
+    daily_sub_df["season"] = get_season(daily_sub_df["date"])
+    return daily_sub_df[["date", "bike_rides_daily", "avgTemp", "season"]]
+
+
+## top_stations_df: the busiest start stations
+# ---------------------------------------------------------
+def build_top_stations(stations, n=TOP_STATIONS_N):
+    return stations.head(n).reset_index(drop=True)
+
+
+## top500_routes: the busiest station-to-station routes
+# ---------------------------------------------------------
+def build_top_routes(routes, n=TOP_ROUTES_N):
+    return routes.head(n).reset_index(drop=True)
+
+
+## Write every prepared artifact from merged aggregates
+# ---------------------------------------------------------
+def write_prepared(merged, out_dir=PREPARED_DIR, weather=None):
+    out_dir = Path(out_dir)
+    weather = daily_weather() if weather is None else weather
+
+    daily_sub_df = build_daily_sub_df(aggregates.daily_frame(merged), weather)
+    top_stations_df = build_top_stations(aggregates.stations_frame(merged))
+    top500_routes = build_top_routes(aggregates.routes_frame(merged))
+    duration_hist = aggregates.durations_frame(merged)
+
+    daily_sub_df.to_csv(out_dir / "daily_sub_df.csv", index=False, date_format="%Y-%m-%d")
+    top_stations_df.to_csv(out_dir / "top_stations_df.csv", index=False)
+    top500_routes.to_csv(out_dir / "top500_routes.csv", index=False)
+    duration_hist.to_csv(out_dir / "tripduration_hist.csv", index=False)
+    return daily_sub_df, top_stations_df, top500_routes
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Prepared_Data files from the trip dataset.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--years", type=int, nargs="*", help="Only use these years")
+    parser.add_argument("--months", type=int, nargs="*", help="Only use these months")
+    parser.add_argument("--weather", help="CSV with date and avgTemp columns (default: weather_df.csv from citibike.weather)")
+    parser.add_argument("--parallel", action="store_true",
+                        help="Aggregate the raw monthly CSVs in a process pool instead of reading the dataset "
+                             "(rides repeated across files are counted once; their keys go to the dataset's _ride_ids)")
+    parser.add_argument("--source", help="Folder of monthly CSVs (with --parallel)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per CSV chunk")
+    args = parser.parse_args()
+
+    if args.parallel:
+        if args.source is None:
+            parser.error("--parallel needs --source")
+        merged = aggregates.parallel_aggregates(args.source, args.workers, args.chunksize, args.dataset)
+        ledger = aggregates.ledger_rows(list_monthly_files(args.source))
+    else:
+        merged = aggregates.dataset_aggregates(args.years, args.months, args.dataset)
+        ledger = aggregates.ledger_rows(dataset_files(args.dataset, args.years, args.months), with_digest=False)
+
+    # Only a full build resets the running aggregates used by citibike.refresh; a --years /
+    # --months subset would leave refresh folding new months into a partial baseline
+    if args.years is None and args.months is None:
+        aggregates.save_aggregates(merged, AGGREGATES_DIR)
+        aggregates.save_ledger(ledger, AGGREGATES_DIR)
+
+    weather = load_weather(args.weather) if args.weather else None
+    write_prepared(merged, PREPARED_DIR, weather)
+    print(f"Wrote prepared data to {PREPARED_DIR}")
+
+
+if __name__ == "__main__":
+    main()
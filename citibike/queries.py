@@ -0,0 +1,322 @@
+################################################ CitiBike Queries ################################################
+
+# The aggregate queries behind the dashboard, shared by CitiBike_dashboard_Part2.py and the
+# JSON API (citibike.api): daily rides vs temperature, top stations, top routes and trip
+# duration percentiles, with the same filters everywhere.
+#
+# Every query reads through citibike.data (parsed once per process, reloaded when a file
+# changes) and uses the richest artifact that exists: the ride cube, route index and duration
+# sketches answer any filter; without them the prepared CSVs answer the unfiltered question.
+# Months, years, seasons and rider types filter exactly; a date range filters the daily series
+# by day and the other queries by the months it touches (they are stored per month). With
+# several years on disk, a question about one year only scans that year's rows.
+#
+# daily_by_year, station_ranks and route_ranks are the year-over-year views: each year's
+# daily rides on a common January-December axis, and how the top stations and routes of one
+# year ranked in another.
+#
+# data_version(query) identifies the files a query reads (by modification time and size), so
+# callers can key caches and ETags on it.
+#
+# Usage:
+#   python -m citibike.queries top_stations --n 10 --rider member --season Summer
+#   python -m citibike.queries station_ranks --year 2023 --base-year 2022 --n 20
+
+import argparse
+import hashlib
+from pathlib import Path
+
+import pandas as pd
+
+from citibike import cube, route_index, sketches
+from citibike.data import (DAILY_PATH, TOP_ROUTES_PATH, TOP_STATIONS_PATH, load_cube, load_daily, load_duration_sketches,
+                           load_periods, load_route_index, load_top_routes, load_top_stations)
+from citibike.paths import CUBE_DIR
+from citibike.prepare import TOP_ROUTES_N, TOP_STATIONS_N
+
+# Trip duration window of the Trip Duration page (minutes)
+DURATION_WINDOW = (1, 65)
+
+# Leap year the daily_by_year dates are moved to, so every year shares one axis (Feb 29 included)
+COMMON_YEAR = 2000
+
+## The files each query reads (the first existing artifact wins, as in the queries below)
+# ---------------------------------------------------------
+QUERY_FILES = {
+    "daily": [DAILY_PATH],
+    "top_stations": [CUBE_DIR / "station_months.parquet", CUBE_DIR / "stations.parquet", TOP_STATIONS_PATH],
+    "top_routes": [route_index.ROUTE_INDEX_PATH, route_index.ROUTE_STATIONS_PATH, TOP_ROUTES_PATH],
+    "durations": [sketches.SKETCHES_PATH],
+    "daily_by_year": [DAILY_PATH],
+    "station_ranks": [CUBE_DIR / "station_months.parquet", CUBE_DIR / "stations.parquet"],
+    "route_ranks": [route_index.ROUTE_INDEX_PATH, route_index.ROUTE_STATIONS_PATH, CUBE_DIR / "route_months.parquet",
+                    CUBE_DIR / "stations.parquet"],
+}
+
+
+class QueryError(ValueError):
+    pass
+
+
+class MissingDataError(FileNotFoundError):
+    pass
+
+################################################ Versions ################################################
+
+## Version of the data behind one query: a hash of its files' modification times and sizes
+# ---------------------------------------------------------
+def data_version(query):
+    parts = []
+    for path in QUERY_FILES[query]:
+        path = Path(path)
+        stat = path.stat() if path.exists() else None
+        parts.append(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size}" if stat else f"{path.name}:missing")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+################################################ Filters ################################################
+
+## Months (YYYYMM) touched by a date range, limited to the given ones
+# ---------------------------------------------------------
+def months_between(start=None, end=None, periods=None, available=()):
+    if start is None and end is None:
+        return periods
+    available = sorted(available)
+    low = pd.Timestamp(start).year * 100 + pd.Timestamp(start).month if start is not None else 0
+    high = pd.Timestamp(end).year * 100 + pd.Timestamp(end).month if end is not None else 999999
+    in_range = [period for period in available if low <= period <= high]
+    return in_range if periods is None else [period for period in in_range if period in set(periods)]
+
+
+## Months (YYYYMM) of the given years, limited to the given ones (for tables kept per month)
+# ---------------------------------------------------------
+def months_of_years(years=None, periods=None, available=()):
+    if years is None:
+        return periods
+    in_years = [period for period in sorted(available) if period // 100 in set(years)]
+    return in_years if periods is None else [period for period in in_years if period in set(periods)]
+
+
+def check_choices(values, options, name):
+    if values is None:
+        return None
+    unknown = [value for value in values if value not in options]
+    if unknown:
+        raise QueryError(f"Unknown {name}: {unknown} (choose from {list(options)})")
+    return list(values)
+
+
+def check_n(n, high):
+    if not 1 <= n <= high:
+        raise QueryError(f"n must be between 1 and {high}")
+    return n
+
+
+def check_years(years):
+    if years is None:
+        return None
+    years = [int(year) for year in years]
+    if any(not 1900 <= year <= 2100 for year in years):
+        raise QueryError(f"Years must be YYYY, got {years}")
+    return years
+
+
+## Rows of the daily series in the given years (it is sorted by date)
+# ---------------------------------------------------------
+def daily_years(daily, years):
+    return cube.year_rows(daily, years) if years is not None else daily
+
+################################################ Queries ################################################
+
+## Daily rides and average temperature (daily_sub_df rows)
+# ---------------------------------------------------------
+def daily_rides(start=None, end=None, seasons=None, years=None):
+    seasons = check_choices(seasons, cube.SEASONS, "season")
+    daily = daily_years(load_daily(), check_years(years))
+    mask = pd.Series(True, index=daily.index)
+    if start is not None:
+        mask &= daily["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= daily["date"] <= pd.Timestamp(end)
+    if seasons is not None:
+        mask &= daily["season"].isin(seasons)
+    return daily.loc[mask, ["date", "bike_rides_daily", "avgTemp", "season"]].reset_index(drop=True)
+
+
+## Top N start stations (start_station_name, value)
+# ---------------------------------------------------------
+def top_stations(n=TOP_STATIONS_N, periods=None, seasons=None, riders=None, start=None, end=None, years=None):
+    check_n(n, 5000)
+    seasons = check_choices(seasons, cube.SEASONS, "season")
+    riders = check_choices(riders, cube.RIDER_TYPES, "rider type")
+    years = check_years(years)
+    ride_cube = load_cube()
+    if ride_cube is None:
+        if any(value is not None for value in [periods, seasons, riders, start, end, years]):
+            raise MissingDataError("Filtered top stations need the ride cube (python -m citibike.cube)")
+        return load_top_stations().head(n).reset_index(drop=True)
+
+    periods = months_between(start, end, periods, load_periods())
+    return cube.top_stations(ride_cube, n=n, periods=periods, seasons=seasons, riders=riders, years=years)
+
+
+## Top N routes with arc widths, and the most rides any count can be missing
+# ---------------------------------------------------------
+def top_routes(n=TOP_ROUTES_N, periods=None, seasons=None, riders=None, bands=None, start=None, end=None, years=None):
+    check_n(n, 5000)
+    seasons = check_choices(seasons, cube.SEASONS, "season")
+    riders = check_choices(riders, cube.RIDER_TYPES, "rider type")
+    bands = check_choices(bands, route_index.BAND_NAMES, "time of day")
+    years = check_years(years)
+    index = load_route_index()
+    if index is None:
+        if any(value is not None for value in [periods, seasons, riders, bands, start, end, years]):
+            raise MissingDataError("Filtered top routes need the route index (python -m citibike.route_index)")
+        routes = load_top_routes()
+        if routes is None:
+            raise MissingDataError("No route data: build top500_routes.csv or the route index")
+        routes = routes.head(n).reset_index(drop=True)
+        return routes.assign(stroke_width=route_index.stroke_width(routes["trip_count"])), 0
+
+    periods = months_between(start, end, periods, load_periods(route_index.ROUTE_INDEX_PATH))
+    return route_index.top_arcs(index["routes"], index["stations"], n=n, periods=periods, seasons=seasons,
+                                riders=riders, bands=bands, years=years)
+
+
+## Trip duration statistics (minutes) per rider type, within the page's window
+# ---------------------------------------------------------
+# {"Member": {count, mean, q1, median, q3, p95, p99, fences, ...}, "Casual": {...}}
+def duration_stats(periods=None, seasons=None, riders=None, start=None, end=None, window=DURATION_WINDOW, years=None):
+    seasons = check_choices(seasons, cube.SEASONS, "season")
+    riders = check_choices(riders, cube.RIDER_TYPES, "rider type")
+    table = load_duration_sketches()
+    if table is None:
+        raise MissingDataError("Duration statistics need the duration sketches (python -m citibike.sketches)")
+
+    periods = months_between(start, end, periods, table["period"].unique())
+    periods = months_of_years(check_years(years), periods, table["period"].unique())
+    low, high = window
+    stats = {
+        rider.capitalize(): sketches.box_stats(sketch, low=low, high=high)
+        for rider, sketch in sorted(sketches.sketch_by_rider(table, periods=periods, seasons=seasons).items(),
+                                    reverse=True)
+        if riders is None or rider in riders
+    }
+    return {rider: values for rider, values in stats.items() if values is not None}
+
+################################################ Year over Year ################################################
+
+## Years with daily rides
+# ---------------------------------------------------------
+def available_years():
+    daily = load_daily()
+    return sorted(daily.loc[daily["bike_rides_daily"].notna(), "date"].dt.year.unique().tolist())
+
+
+## Daily rides of each year on a common axis (date moved to COMMON_YEAR, year kept)
+# ---------------------------------------------------------
+def daily_by_year(years=None, seasons=None):
+    daily = daily_rides(seasons=seasons, years=years)
+    dates = daily["date"]
+    return pd.DataFrame({
+        "year": dates.dt.year.to_numpy(),
+        "day": pd.to_datetime({"year": COMMON_YEAR, "month": dates.dt.month, "day": dates.dt.day}).to_numpy(),
+        "date": dates.to_numpy(),
+        "bike_rides_daily": daily["bike_rides_daily"].to_numpy(),
+    })
+
+
+## Top N start stations of one year with their rank in a base year
+# ---------------------------------------------------------
+def station_ranks(year, base_year, n=TOP_STATIONS_N, seasons=None, riders=None):
+    check_n(n, 5000)
+    seasons = check_choices(seasons, cube.SEASONS, "season")
+    riders = check_choices(riders, cube.RIDER_TYPES, "rider type")
+    year, base_year = check_years([year, base_year])
+    ride_cube = load_cube()
+    if ride_cube is None:
+        raise MissingDataError("Station rank changes need the ride cube (python -m citibike.cube)")
+
+    counts = cube.station_counts(ride_cube, seasons=seasons, riders=riders, years=[year])
+    base_counts = cube.station_counts(ride_cube, seasons=seasons, riders=riders, years=[base_year])
+    ranks = cube.rank_changes(counts, base_counts, n)
+    names = cube.decode_stations(ride_cube, ranks.index, "start")[["start_station_name"]]
+    return pd.concat([names, ranks.reset_index(drop=True)], axis=1)
+
+
+## Top N routes of one year with their rank in a base year
+# ---------------------------------------------------------
+# From the route index when it exists (its per-slice truncation can only miss routes far down
+# the ranking), otherwise from the cube's route rollup.
+def route_ranks(year, base_year, n=TOP_ROUTES_N, seasons=None, riders=None):
+    check_n(n, 5000)
+    seasons = check_choices(seasons, cube.SEASONS, "season")
+    riders = check_choices(riders, cube.RIDER_TYPES, "rider type")
+    year, base_year = check_years([year, base_year])
+    index = load_route_index()
+    if index is not None:
+        def counts_of(y):
+            return route_index.route_counts(index["routes"], seasons=seasons, riders=riders, years=[y])
+        stations = index["stations"]
+    else:
+        ride_cube = load_cube()
+        if ride_cube is None:
+            raise MissingDataError("Route rank changes need the route index or the ride cube")
+        def counts_of(y):
+            return cube.route_counts(ride_cube, seasons=seasons, riders=riders, years=[y])
+        stations = ride_cube["stations"]
+
+    ranks = cube.rank_changes(counts_of(year), counts_of(base_year), n)
+    by_id = stations.set_index("station_id")["station_name"]
+    names = pd.DataFrame({
+        "start_station_name": by_id.reindex(ranks.index.get_level_values(0)).to_numpy(),
+        "end_station_name": by_id.reindex(ranks.index.get_level_values(1)).to_numpy(),
+    })
+    return pd.concat([names, ranks.reset_index(drop=True)], axis=1)
+
+################################################ Command Line ################################################
+
+QUERIES = {
+    "daily": daily_rides,
+    "top_stations": top_stations,
+    "top_routes": top_routes,
+    "durations": duration_stats,
+    "daily_by_year": daily_by_year,
+    "station_ranks": station_ranks,
+    "route_ranks": route_ranks,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one of the dashboard's aggregate queries.")
+    parser.add_argument("query", choices=list(QUERIES))
+    parser.add_argument("--n", type=int, help="Top N (stations, routes)")
+    parser.add_argument("--month", type=int, nargs="*", dest="periods", help="Months as YYYYMM")
+    parser.add_argument("--years", type=int, nargs="*", help="Only these years")
+    parser.add_argument("--year", type=int, help="Year to rank (station_ranks, route_ranks)")
+    parser.add_argument("--base-year", type=int, help="Year to compare the ranks with")
+    parser.add_argument("--season", nargs="*", dest="seasons", choices=cube.SEASONS)
+    parser.add_argument("--rider", nargs="*", dest="riders", choices=cube.RIDER_TYPES)
+    parser.add_argument("--start", help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", help="Last day (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if args.query in ("station_ranks", "route_ranks"):
+        if args.year is None or args.base_year is None:
+            parser.error(f"{args.query} needs --year and --base-year")
+        kwargs = {"year": args.year, "base_year": args.base_year, "seasons": args.seasons, "riders": args.riders}
+    elif args.query == "daily_by_year":
+        kwargs = {"years": args.years, "seasons": args.seasons}
+    else:
+        kwargs = {"seasons": args.seasons, "start": args.start, "end": args.end, "years": args.years}
+        if args.query != "daily":
+            kwargs.update(periods=args.periods, riders=args.riders)
+    if args.n is not None:
+        kwargs["n"] = args.n
+    result = QUERIES[args.query](**kwargs)
+    if isinstance(result, tuple):
+        result = result[0]
+    print(pd.DataFrame(result).T.round(1) if isinstance(result, dict) else result.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
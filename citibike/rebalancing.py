@@ -0,0 +1,206 @@
+################################################ CitiBike Station Rebalancing ################################################
+
+# Where do bikes run out? Hourly departures and arrivals per station, their net flow, and a
+# dock inventory simulation over stations x hours.
+#
+# Departures are counted at the start station in the hour the trip started, arrivals at the
+# end station in the hour it ended. The simulation starts every station at a share of its
+# capacity and applies each hour's arrivals minus departures, clipped to [0, capacity]:
+#   - a stock-out hour is one where riders wanted more bikes than the station had
+#   - a dock-full hour is one where riders wanted to return more bikes than there were free docks
+# By default every day starts again from the starting stock (overnight rebalancing), so the
+# whole period is one array of stations x days x 24 hours stepped 24 times; with
+# reset_daily=False the stock carries over and the loop runs once per hour of the period.
+#
+# Dock counts are not in the trip data: pass a capacity per station (e.g. from the Citi Bike
+# GBFS station_information feed) or use the default for every station.
+#
+# Usage:
+#   python -m citibike.rebalancing                         (build station_flows.parquet)
+#   python -m citibike.rebalancing --simulate --seasons Summer --capacity 31
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from citibike.cube import SEASON_CODE_BY_MONTH, SEASONS
+from citibike.ingest import iter_trip_batches
+from citibike.paths import PREPARED_DIR, TRIPS_DATASET_DIR
+from citibike.stations import load_dictionary
+
+FLOWS_PATH = PREPARED_DIR / "station_flows.parquet"
+FLOW_STATIONS_PATH = PREPARED_DIR / "station_flows_stations.parquet"
+
+FLOW_COLUMNS = ["started_at", "ended_at", "start_station", "end_station"]
+
+# Docks per station when no capacity is given, and the starting share of docks holding a bike
+DEFAULT_CAPACITY = 31
+DEFAULT_START_FILL = 0.5
+
+################################################ Flows ################################################
+
+## Departures and arrivals per station and hour for one batch of compact trips
+# ---------------------------------------------------------
+def batch_flows(trips):
+    departures = pd.DataFrame({
+        "station_id": trips["start_station"],
+        "hour": trips["started_at"].dt.floor("h"),
+    }).dropna().groupby(["station_id", "hour"]).size().rename("departures")
+    arrivals = pd.DataFrame({
+        "station_id": trips["end_station"],
+        "hour": trips["ended_at"].dt.floor("h"),
+    }).dropna().groupby(["station_id", "hour"]).size().rename("arrivals")
+    return pd.concat([departures, arrivals], axis=1).fillna(0)
+
+
+## Hourly flows over the dataset (sparse: only station-hours with activity)
+# ---------------------------------------------------------
+def build_flows(dataset_dir=TRIPS_DATASET_DIR, years=None, months=None):
+    parts = [batch_flows(batch) for batch in
+             iter_trip_batches(FLOW_COLUMNS, years, months, dataset_dir, decode=False)]
+    if not parts:
+        return pd.DataFrame(columns=["station_id", "hour", "departures", "arrivals"])
+
+    flows = pd.concat(parts).groupby(level=["station_id", "hour"]).sum().reset_index()
+    return flows.astype({"station_id": "int32", "hour": "datetime64[ns]",
+                         "departures": "int32", "arrivals": "int32"})
+
+
+def write_flows(flows, dataset_dir=TRIPS_DATASET_DIR, path=FLOWS_PATH, stations_path=FLOW_STATIONS_PATH):
+    dictionary = load_dictionary(dataset_dir)
+    stations = dictionary[dictionary["station_id"].isin(flows["station_id"].unique())]
+    flows.to_parquet(path, index=False)
+    stations[["station_id", "station_name", "lat", "lng"]].to_parquet(stations_path, index=False)
+
+
+## Dense stations x hours arrays for the selected seasons / date range
+# ---------------------------------------------------------
+# Hours run from the first selected day's midnight to the last day's 23:00, so the arrays
+# reshape to stations x days x 24. Returns (station ids, days, departures, arrivals).
+def flow_matrix(flows, seasons=None, start_date=None, end_date=None):
+    hours = flows["hour"]
+    mask = np.ones(len(flows), dtype=bool)
+    if seasons is not None:
+        mask &= np.isin(SEASON_CODE_BY_MONTH[hours.dt.month.to_numpy()], [SEASONS.index(s) for s in seasons])
+    if start_date is not None:
+        mask &= (hours >= pd.Timestamp(start_date)).to_numpy()
+    if end_date is not None:
+        mask &= (hours < pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_numpy()
+    selected = flows[mask]
+
+    station_ids = np.sort(selected["station_id"].unique())
+    days = pd.DatetimeIndex(selected["hour"].dt.normalize().unique()).sort_values()
+    rows = np.searchsorted(station_ids, selected["station_id"].to_numpy())
+    cols = days.get_indexer(selected["hour"].dt.normalize()) * 24 + selected["hour"].dt.hour.to_numpy()
+
+    shape = (len(station_ids), len(days) * 24)
+    departures = np.zeros(shape, dtype="float32")
+    arrivals = np.zeros(shape, dtype="float32")
+    departures[rows, cols] = selected["departures"].to_numpy()
+    arrivals[rows, cols] = selected["arrivals"].to_numpy()
+    return station_ids, days, departures, arrivals
+
+################################################ Simulation ################################################
+
+## Step the dock inventory over the hours (last axis) of every row at once
+# ---------------------------------------------------------
+# departures / arrivals: (..., hours); capacity / start_stock: broadcastable to (...).
+# Returns the shortfall (bikes riders could not take) and overflow (bikes they could not
+# return) per hour.
+def step_inventory(departures, arrivals, capacity, start_stock):
+    stock = np.broadcast_to(np.asarray(start_stock, dtype="float32"), departures.shape[:-1]).copy()
+    capacity = np.broadcast_to(np.asarray(capacity, dtype="float32"), departures.shape[:-1])
+    shortfall = np.zeros_like(departures)
+    overflow = np.zeros_like(departures)
+    for hour in range(departures.shape[-1]):
+        stock = stock + arrivals[..., hour] - departures[..., hour]
+        shortfall[..., hour] = np.maximum(-stock, 0)
+        overflow[..., hour] = np.maximum(stock - capacity, 0)
+        stock = np.clip(stock, 0, capacity)
+    return shortfall, overflow
+
+
+## Simulate the selected period for every station
+# ---------------------------------------------------------
+# capacity: a number for every station or a Series indexed by station_id (missing ids get
+# DEFAULT_CAPACITY). Returns (per-station summary, stations x hour-of-day stock-out counts).
+def simulate(flows, capacity=DEFAULT_CAPACITY, start_fill=DEFAULT_START_FILL, reset_daily=True,
+             seasons=None, start_date=None, end_date=None):
+    station_ids, days, departures, arrivals = flow_matrix(flows, seasons, start_date, end_date)
+    if isinstance(capacity, pd.Series):
+        capacity = capacity.reindex(station_ids).fillna(DEFAULT_CAPACITY).to_numpy()
+    capacity = np.broadcast_to(np.asarray(capacity, dtype="float32"), station_ids.shape)
+    start_stock = np.round(capacity * start_fill)
+
+    if reset_daily:
+        by_day = (len(station_ids), len(days), 24)
+        shortfall, overflow = step_inventory(
+            departures.reshape(by_day), arrivals.reshape(by_day), capacity[:, None], start_stock[:, None],
+        )
+        shortfall, overflow = shortfall.reshape(departures.shape), overflow.reshape(departures.shape)
+    else:
+        shortfall, overflow = step_inventory(departures, arrivals, capacity, start_stock)
+
+    stockout = shortfall > 0
+    full = overflow > 0
+    summary = pd.DataFrame({
+        "station_id": station_ids,
+        "capacity": capacity,
+        "departures": departures.sum(axis=1).astype("int64"),
+        "arrivals": arrivals.sum(axis=1).astype("int64"),
+        "net_flow_per_day": (arrivals.sum(axis=1) - departures.sum(axis=1)) / max(len(days), 1),
+        "stockout_hours": stockout.sum(axis=1),
+        "full_hours": full.sum(axis=1),
+        "unmet_departures": shortfall.sum(axis=1).astype("int64"),
+        "unmet_returns": overflow.sum(axis=1).astype("int64"),
+    })
+    by_hour = stockout.reshape(len(station_ids), len(days), 24).sum(axis=1)
+    stockout_by_hour = pd.DataFrame(by_hour, index=station_ids, columns=range(24)).rename_axis("station_id")
+    return summary, stockout_by_hour
+
+
+## Stations with the most stock-out + dock-full hours (with names)
+# ---------------------------------------------------------
+def worst_stations(summary, stations, n=20):
+    summary = summary.assign(problem_hours=summary["stockout_hours"] + summary["full_hours"])
+    worst = summary.nlargest(n, "problem_hours")
+    return worst.merge(stations[["station_id", "station_name", "lat", "lng"]], on="station_id", how="left")
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Station flows and dock inventory simulation.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--years", type=int, nargs="*", help="Only use these years")
+    parser.add_argument("--simulate", action="store_true", help="Simulate from the stored flows instead of building")
+    parser.add_argument("--seasons", nargs="*", choices=SEASONS)
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY, help="Docks per station")
+    parser.add_argument("--capacity-file", help="CSV with station_name and capacity columns")
+    parser.add_argument("--start-fill", type=float, default=DEFAULT_START_FILL, help="Starting share of docks with a bike")
+    parser.add_argument("--carry-over", action="store_true", help="Carry stock over between days (no overnight reset)")
+    args = parser.parse_args()
+
+    if not args.simulate:
+        flows = build_flows(args.dataset, args.years)
+        write_flows(flows, args.dataset)
+        print(f"Wrote {len(flows):,} station-hours to {FLOWS_PATH}")
+        return
+
+    flows = pd.read_parquet(FLOWS_PATH)
+    stations = pd.read_parquet(FLOW_STATIONS_PATH)
+    capacity = args.capacity
+    if args.capacity_file:
+        docks = pd.read_csv(args.capacity_file).merge(stations, on="station_name")
+        capacity = docks.set_index("station_id")["capacity"]
+
+    start = time.perf_counter()
+    summary, _ = simulate(flows, capacity, args.start_fill, not args.carry_over, args.seasons)
+    elapsed = time.perf_counter() - start
+    print(worst_stations(summary, stations).to_string())
+    print(f"Simulated {len(summary):,} stations in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
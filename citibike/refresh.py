@@ -0,0 +1,114 @@
+################################################ CitiBike Incremental Refresh ################################################
+
+# Folds one newly published monthly file into the running aggregates saved in 02_Data/Aggregates
+# and rewrites only what changed: the dates it touches in daily_sub_df.csv, the re-ranked top
+# stations, the re-ranked top 500 routes and the duration histogram. The work is proportional
+# to the new file, not to the history. A file that is already in the ledger (same name or same
+# content hash) is skipped, so re-running a refresh never double counts, and rides already
+# loaded in an earlier month (by ride_id, citibike.integrity) are left out.
+#
+# Usage:
+#   python -m citibike.refresh 202301-citibike-tripdata_1.csv [--weather weather.csv] [--ingest]
+
+import argparse
+from pathlib import Path
+
+import pandas as pd
+
+from citibike import aggregates, integrity
+from citibike.ingest import DEFAULT_CHUNKSIZE, expected_rows, ingest_file
+from citibike.paths import AGGREGATES_DIR, PREPARED_DIR, TRIPS_DATASET_DIR
+from citibike.prepare import build_daily_sub_df, build_top_routes, build_top_stations, load_weather
+
+################################################ Refresh Steps ################################################
+
+## Has this file already been folded in?
+# ---------------------------------------------------------
+def already_loaded(ledger, entry):
+    same_name = ledger["file"] == entry["file"]
+    same_content = (ledger["sha256"] != "") & (ledger["sha256"] == entry["sha256"])
+    return bool((same_name | same_content).any())
+
+
+## Update the rows of daily_sub_df for the dates the new file touched
+# ---------------------------------------------------------
+# Temperatures come from the optional weather frame first, then from the existing rows;
+# dates with no known temperature keep a blank avgTemp until the weather is refreshed.
+def refresh_daily_sub_df(daily_sub_df, merged, touched_dates, weather=None):
+    daily = aggregates.daily_frame(merged)
+    daily = daily[daily["date"].isin(touched_dates)]
+
+    known_temps = daily_sub_df[["date", "avgTemp"]]
+    if weather is not None:
+        known_temps = pd.concat([weather[["date", "avgTemp"]], known_temps]).drop_duplicates("date")
+    temps = daily[["date"]].merge(known_temps, how="left", on="date")
+
+    updated = build_daily_sub_df(daily, temps)
+    untouched = daily_sub_df[~daily_sub_df["date"].isin(touched_dates)]
+    refreshed = pd.concat([untouched, updated]).sort_values("date").reset_index(drop=True)
+    return refreshed.astype({"bike_rides_daily": "Int64"})
+
+
+## Fold one monthly file into the saved aggregates and rewrite the affected outputs
+# ---------------------------------------------------------
+# Returns what was done: file, loaded (False when it was already in the ledger), rides folded
+# in and duplicate rides left out.
+def refresh_month(csv_path, state_dir=AGGREGATES_DIR, out_dir=PREPARED_DIR, weather=None,
+                  chunksize=DEFAULT_CHUNKSIZE, ingest=False, dataset_dir=TRIPS_DATASET_DIR):
+    state_dir, out_dir = Path(state_dir), Path(out_dir)
+
+    ledger = aggregates.load_ledger(state_dir)
+    entry = aggregates.ledger_rows([csv_path]).iloc[0]
+    if already_loaded(ledger, entry):
+        return {"file": Path(csv_path).name, "loaded": False, "rides": 0, "duplicates": 0}
+
+    # The ride keys live with the trip dataset, so --ingest later finds the same rides
+    name = Path(csv_path).stem
+    seen = integrity.open_seen(integrity.ride_ids_dir(dataset_dir), expected_rows([csv_path]), exclude={name})
+    partial = aggregates.file_aggregates(csv_path, chunksize, seen)
+    merged = aggregates.merge_aggregates([aggregates.load_aggregates(state_dir), partial])
+
+    # Save the running aggregates, the ledger and the ride keys together, before touching the outputs
+    aggregates.save_aggregates(merged, state_dir)
+    aggregates.save_ledger(pd.concat([ledger, entry.to_frame().T], ignore_index=True), state_dir)
+    integrity.commit_seen(seen, name)
+
+    daily_path = out_dir / "daily_sub_df.csv"
+    daily_sub_df = pd.read_csv(daily_path, parse_dates=["date"])
+    daily_sub_df = refresh_daily_sub_df(daily_sub_df, merged, partial["daily"].index, weather)
+    daily_sub_df.to_csv(daily_path, index=False, date_format="%Y-%m-%d")
+
+    build_top_stations(aggregates.stations_frame(merged)).to_csv(out_dir / "top_stations_df.csv", index=False)
+    build_top_routes(aggregates.routes_frame(merged)).to_csv(out_dir / "top500_routes.csv", index=False)
+    aggregates.durations_frame(merged).to_csv(out_dir / "tripduration_hist.csv", index=False)
+
+    if ingest:
+        # The keys just stored are this file's own (left out again), so no re-ingest check
+        seen = integrity.open_seen(integrity.ride_ids_dir(dataset_dir), expected_rows([csv_path]), exclude={name})
+        ingest_file(csv_path, dataset_dir, chunksize, seen=seen)
+
+    return {"file": Path(csv_path).name, "loaded": True, "rides": int(partial["daily"].sum()),
+            "duplicates": seen["dropped"]}
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold new monthly Citi Bike files into the prepared data.")
+    parser.add_argument("files", nargs="+", help="New monthly tripdata CSVs")
+    parser.add_argument("--weather", help="CSV with date and avgTemp columns covering the new dates")
+    parser.add_argument("--ingest", action="store_true", help="Also add the files to the partitioned dataset")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per CSV chunk")
+    args = parser.parse_args()
+
+    weather = load_weather(args.weather) if args.weather else None
+    for csv_path in args.files:
+        result = refresh_month(csv_path, weather=weather, chunksize=args.chunksize, ingest=args.ingest)
+        if not result["loaded"]:
+            print(f"{result['file']} is already loaded, nothing to do")
+            continue
+        print(f"{result['file']}: folded {result['rides']:,} rides into the prepared data "
+              f"({result['duplicates']:,} duplicate rides left out)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+################################################ CitiBike Static Charts ################################################
+
+# Renders the static chart images in 04_Analysis/Visualizations from the prepared data,
+# replacing the fig.write_image / plt.savefig cells of Exercise 2.4 and 2.7.
+#
+# Every chart declares its source files and a figure function (a plotly figure built from the
+# loaded sources) plus its size. Its key is a hash of the source contents, the figure
+# function's code, the size and the plotly version; charts whose key matches the last render
+# and whose image is still there are skipped, and the rest are rendered in a process pool
+# (plotly + kaleido). After a data refresh only the charts reading the changed files re-render.
+#
+# check_assets() reads the dashboard sources (the script and its page modules) for every image
+# they show and fails when one does not exist, so a missing asset stops the build instead of a
+# page at runtime.
+#
+# Usage:
+#   python -m citibike.render             (render stale charts, then check the dashboard assets)
+#   python -m citibike.render --force
+#   python -m citibike.render --check     (only check the dashboard assets)
+
+import argparse
+import hashlib
+import inspect
+import json
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from citibike.aggregates import file_digest
+from citibike.paths import DATA_DIR, PREPARED_DIR, PROJECT_DIR, VISUALS_DIR
+
+RENDER_STATE_PATH = DATA_DIR / "render_state.json"
+DASHBOARD_PATH = PROJECT_DIR / "CitiBike_dashboard_Part2.py"
+DASHBOARD_PAGES_DIR = PROJECT_DIR / "dashboard"
+
+# The trip duration charts' focus window (minutes)
+FOCUS_MINUTES = (1, 65)
+
+RIDER_COLORS = {"member": "blue", "casual": "orange"}
+
+################################################ Sources ################################################
+
+def read_daily():
+    return pd.read_csv(PREPARED_DIR / "daily_sub_df.csv", parse_dates=["date"])
+
+
+def read_top_stations():
+    return pd.read_csv(PREPARED_DIR / "top_stations_df.csv")
+
+
+## Minutes histogram per rider type, restricted to the focus window
+# ---------------------------------------------------------
+def read_duration_hist():
+    hist = pd.read_csv(PREPARED_DIR / "tripduration_hist.csv", dtype={"minute": str})
+    hist = hist[hist["minute"].str.isdigit()].astype({"minute": "int64"})
+    low, high = FOCUS_MINUTES
+    return hist[(hist["minute"] >= low) & (hist["minute"] < high)].set_index("minute")
+
+
+SOURCES = {
+    "daily": (PREPARED_DIR / "daily_sub_df.csv", read_daily),
+    "top_stations": (PREPARED_DIR / "top_stations_df.csv", read_top_stations),
+    "duration_hist": (PREPARED_DIR / "tripduration_hist.csv", read_duration_hist),
+}
+
+################################################ Figures ################################################
+
+## Quantile of a one-minute histogram (linear within each bin)
+# ---------------------------------------------------------
+def hist_quantile(counts, q):
+    edges = np.append(counts.index.to_numpy(), counts.index[-1] + 1).astype("float64")
+    cumulative = np.concatenate([[0], np.cumsum(counts.to_numpy())])
+    return float(np.interp(q * cumulative[-1], cumulative, edges))
+
+
+def figure_daily(sources):
+    daily = sources["daily"].sort_values("date")
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(go.Scatter(x=daily["date"], y=daily["bike_rides_daily"], name="Daily Bike Rides",
+                             line=dict(color="#ff7f0e")), secondary_y=False)
+    fig.add_trace(go.Scatter(x=daily["date"], y=daily["avgTemp"], name="Average Temperature",
+                             line=dict(color="#1f77b4")), secondary_y=True)
+    fig.update_layout(title="Daily Bike Rides and Temperature", template="plotly_white",
+                      legend=dict(orientation="h", y=1.08))
+    fig.update_yaxes(title_text="Bike Rides Daily", secondary_y=False)
+    fig.update_yaxes(title_text="Average Temperature", secondary_y=True, showgrid=False)
+    return fig
+
+
+def figure_top_stations(sources):
+    top20 = sources["top_stations"].head(20).sort_values("value", ascending=True)
+    fig = go.Figure(go.Bar(
+        x=top20["value"],
+        y=top20["start_station_name"],
+        orientation="h",
+        marker=dict(color=top20["value"], colorscale="Blues"),
+        text=[f"{value:,.0f}" for value in top20["value"]],
+        textposition="outside",
+    ))
+    fig.update_layout(title="Top 20 Starting Stations by Ride Count", xaxis_title="Number of Rides",
+                      yaxis_title="Starting Station", template="plotly_white")
+    return fig
+
+
+## Box plot from the histogram (the box statistics are computed, not the raw trips plotted)
+# ---------------------------------------------------------
+def figure_duration_box(sources):
+    hist = sources["duration_hist"]
+    fig = go.Figure()
+    for rider in [col for col in RIDER_COLORS if col in hist.columns]:
+        counts = hist[rider]
+        q1, median, q3 = (hist_quantile(counts, q) for q in (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        minutes = counts.index.to_numpy()
+        fig.add_trace(go.Box(
+            name=rider.capitalize(),
+            q1=[q1], median=[median], q3=[q3],
+            lowerfence=[max(q1 - 1.5 * iqr, minutes[0])],
+            upperfence=[min(q3 + 1.5 * iqr, minutes[-1] + 1)],
+            mean=[float(np.average(minutes + 0.5, weights=counts)) if counts.sum() else np.nan],
+            marker_color=RIDER_COLORS[rider],
+        ))
+    low, high = FOCUS_MINUTES
+    fig.update_layout(title=f"CitiBike NYC: Trip Duration by Rider Type ({low}–{high} Minutes)",
+                      xaxis_title="User Type", yaxis_title="Trip Duration (minutes)",
+                      showlegend=False, template="plotly_white")
+    return fig
+
+
+def figure_duration_facets(sources):
+    hist = sources["duration_hist"]
+    riders = [col for col in RIDER_COLORS if col in hist.columns]
+    fig = make_subplots(rows=1, cols=len(riders), subplot_titles=[f"{r.capitalize()} Riders" for r in riders])
+    for i, rider in enumerate(riders, start=1):
+        fig.add_trace(go.Bar(x=hist.index, y=hist[rider], marker_color="steelblue", showlegend=False),
+                      row=1, col=i)
+        fig.update_xaxes(title_text="Trip Duration (minutes)", row=1, col=i)
+    fig.update_yaxes(title_text="Count", row=1, col=1)
+    fig.update_layout(title="Trip Duration Distribution by User Type (Focused Range)",
+                      template="plotly_white", bargap=0)
+    return fig
+
+################################################ Charts ################################################
+
+## Every rendered chart: sources, figure function, size (px) and scale
+# ---------------------------------------------------------
+CHARTS = {
+    "tripduration_boxplot_static.png": {
+        "sources": ["duration_hist"], "figure": figure_duration_box, "size": (900, 500), "scale": 3,
+    },
+    "tripduration_boxplot_focused.png": {
+        "sources": ["duration_hist"], "figure": figure_duration_box, "size": (900, 500), "scale": 2,
+    },
+    "facetgrid_tripduration_by_user.png": {
+        "sources": ["duration_hist"], "figure": figure_duration_facets, "size": (1000, 450), "scale": 2,
+    },
+    "top20_starting_stations.png": {
+        "sources": ["top_stations"], "figure": figure_top_stations, "size": (1200, 1000), "scale": 2,
+    },
+    "Top 20 Most Popular CitiBike Stations.png": {
+        "sources": ["top_stations"], "figure": figure_top_stations, "size": (1200, 800), "scale": 2,
+    },
+    "daily_bikerides_vs_temperature.png": {
+        "sources": ["daily"], "figure": figure_daily, "size": (1200, 600), "scale": 2,
+    },
+    "Daily Rides and Temperature Trends.png": {
+        "sources": ["daily"], "figure": figure_daily, "size": (1400, 600), "scale": 2,
+    },
+}
+
+
+## Key of one chart: source contents, figure code, size, plotly version
+# ---------------------------------------------------------
+def chart_key(name):
+    chart = CHARTS[name]
+    parts = {
+        "sources": {source: file_digest(SOURCES[source][0]) for source in chart["sources"]},
+        "figure": inspect.getsource(chart["figure"]),
+        "size": chart["size"],
+        "scale": chart["scale"],
+        "plotly": plotly.__version__,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+## Render one chart (one worker's job); written under a temporary name, then renamed
+# ---------------------------------------------------------
+def render_chart(name, visuals_dir=VISUALS_DIR):
+    chart = CHARTS[name]
+    sources = {source: SOURCES[source][1]() for source in chart["sources"]}
+    fig = chart["figure"](sources)
+    width, height = chart["size"]
+
+    path = Path(visuals_dir) / name
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    fig.write_image(tmp_path, format=path.suffix[1:], width=width, height=height, scale=chart["scale"])
+    tmp_path.replace(path)
+    return name
+
+
+def load_state(path=RENDER_STATE_PATH):
+    return json.loads(Path(path).read_text()) if Path(path).exists() else {}
+
+
+def save_state(state, path=RENDER_STATE_PATH):
+    path = Path(path)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(state, indent=1))
+    tmp_path.replace(path)
+
+
+## Render every stale chart in a process pool
+# ---------------------------------------------------------
+# Charts whose sources are missing are left alone (their committed image stays).
+# Returns {chart: "rendered" | "up to date" | "no data"}.
+def render_all(names=None, force=False, workers=None, visuals_dir=VISUALS_DIR):
+    state = load_state()
+    report, keys = {}, {}
+    for name in names or CHARTS:
+        if not all(SOURCES[source][0].exists() for source in CHARTS[name]["sources"]):
+            report[name] = "no data"
+            continue
+        keys[name] = chart_key(name)
+        if not force and state.get(name) == keys[name] and (Path(visuals_dir) / name).exists():
+            report[name] = "up to date"
+
+    stale = [name for name in keys if name not in report]
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name in pool.map(render_chart, stale, [visuals_dir] * len(stale)):
+                state[name] = keys[name]
+                report[name] = "rendered"
+        save_state(state)
+    return report
+
+################################################ Dashboard Assets ################################################
+
+class MissingAssetError(FileNotFoundError):
+    pass
+
+
+## The dashboard script and its page modules
+# ---------------------------------------------------------
+def dashboard_sources(dashboard_path=DASHBOARD_PATH, pages_dir=DASHBOARD_PAGES_DIR):
+    return [Path(dashboard_path)] + sorted(Path(pages_dir).glob("*.py"))
+
+
+## Every image path the dashboard passes to st.image (directly or through page_image)
+# ---------------------------------------------------------
+def dashboard_assets(sources=None):
+    assets = set()
+    for path in sources or dashboard_sources():
+        source = Path(path).read_text(encoding="utf-8")
+        assets.update(re.findall(r"(?:st\.image|page_image)\(\s*[\"']([^\"']+)[\"']", source))
+    return sorted(assets)
+
+
+def check_assets(sources=None):
+    assets = dashboard_assets(sources)
+    missing = [asset for asset in assets if not (PROJECT_DIR / asset).exists()]
+    if missing:
+        raise MissingAssetError(f"The dashboard shows images that do not exist: {missing}")
+    return assets
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Render the static charts and check the dashboard's images.")
+    parser.add_argument("charts", nargs="*", help="Only these charts (file names)")
+    parser.add_argument("--force", action="store_true", help="Render even if up to date")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per core)")
+    parser.add_argument("--check", action="store_true", help="Only check the dashboard's images")
+    args = parser.parse_args()
+
+    if not args.check:
+        for name, status in render_all(args.charts, args.force, args.workers).items():
+            print(f"{status:>10}  {name}")
+    assets = check_assets()
+    print(f"All {len(assets)} dashboard images exist")
+
+
+if __name__ == "__main__":
+    main()
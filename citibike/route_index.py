@@ -0,0 +1,222 @@
+################################################ CitiBike Route Index ################################################
+
+# Per-slice route index behind the Trip Hotspots map, replacing the frozen kepler.gl export.
+# A slice is month x rider type x hour band; each slice keeps its busiest routes (station id
+# pairs) with exact counts, plus a cutoff: the largest count of any route it dropped. Summed
+# over the selected slices, the cutoffs bound how many rides a route's count can be missing
+# (zero when no selected slice dropped anything).
+#
+# Arcs for any filter are the selected slices summed per route, cut to the top N, so the
+# payload sent to the browser is bounded by N. Stroke widths use the bins from
+# Top500Trips.ipynb (< 1800, < 2200, < 3000 trips), scaled to the share of a year's rides
+# selected. The index is sorted by period, so a query only scans the years it touches.
+#
+# Usage:
+#   python -m citibike.route_index                                   (build)
+#   python -m citibike.route_index --query --periods 202207 --bands Evening -n 20
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from citibike.cube import RIDER_TYPES, SEASON_CODE_BY_MONTH, SEASONS, rollup_years, year_rows, years_needed
+from citibike.ingest import iter_trip_batches
+from citibike.paths import PREPARED_DIR, TRIPS_DATASET_DIR
+from citibike.prepare import TOP_ROUTES_N, dataset_files
+from citibike.stations import load_dictionary
+
+ROUTE_INDEX_PATH = PREPARED_DIR / "route_index.parquet"
+ROUTE_STATIONS_PATH = PREPARED_DIR / "route_index_stations.parquet"
+
+# Hour bands (start hour, end hour exclusive)
+HOUR_BANDS = {
+    "Night": (0, 6),
+    "Morning": (6, 10),
+    "Midday": (10, 16),
+    "Evening": (16, 20),
+    "Late": (20, 24),
+}
+BAND_NAMES = list(HOUR_BANDS)
+BAND_CODE_BY_HOUR = np.array([
+    BAND_NAMES.index(name) for hour in range(24)
+    for name, (low, high) in HOUR_BANDS.items() if low <= hour < high
+], dtype="int8")
+
+SLICE_KEYS = ["period", "rider", "band"]
+
+# Routes kept per slice; a few thousand keeps the index small and the error bound to a few rides
+DEFAULT_PER_SLICE = 3000
+
+INDEX_COLUMNS = ["started_at", "member_casual", "start_station", "end_station"]
+
+# Stroke width bins from Top500Trips.ipynb (trip counts over the full year)
+STROKE_BINS = np.array([1800, 2200, 3000])
+STROKE_WIDTHS = np.array([0.2, 1.0, 2.0, 3.0])
+
+################################################ Building ################################################
+
+## Route counts per slice for one batch of compact trips
+# ---------------------------------------------------------
+def count_routes(trips):
+    started = trips["started_at"]
+    keyed = pd.DataFrame({
+        "period": (started.dt.year * 100 + started.dt.month).to_numpy(),
+        "rider": pd.Categorical(trips["member_casual"].astype(str), categories=RIDER_TYPES).codes,
+        "band": BAND_CODE_BY_HOUR[started.dt.hour.to_numpy()],
+        "start": trips["start_station"],
+        "end": trips["end_station"],
+    }).dropna(subset=["start", "end"])
+    keyed = keyed[keyed["rider"] >= 0]
+    return keyed.groupby(SLICE_KEYS + ["start", "end"], as_index=False).size().rename(columns={"size": "rides"})
+
+
+## Keep the top routes of every slice, recording each slice's total and cutoff
+# ---------------------------------------------------------
+def truncate_slices(counts, per_slice):
+    counts = counts.sort_values(SLICE_KEYS + ["rides"], ascending=[True] * len(SLICE_KEYS) + [False])
+    rank = counts.groupby(SLICE_KEYS).cumcount()
+    slices = counts.groupby(SLICE_KEYS)["rides"]
+
+    kept = counts[rank < per_slice].copy()
+    dropped = counts[rank >= per_slice].groupby(SLICE_KEYS)["rides"].max()
+    kept = kept.join(slices.sum().rename("slice_rides"), on=SLICE_KEYS)
+    kept = kept.join(dropped.rename("cutoff"), on=SLICE_KEYS)
+    kept["cutoff"] = kept["cutoff"].fillna(0)
+    return kept
+
+
+## Build the index one dataset partition at a time
+# ---------------------------------------------------------
+# Trips that cross a month boundary can put the same slice in two partitions; the counts of
+# such a slice are summed and so are its cutoffs (each one bounds the routes it dropped).
+def build_route_index(dataset_dir=TRIPS_DATASET_DIR, years=None, months=None, per_slice=DEFAULT_PER_SLICE):
+    partitions = sorted({(path.parent.parent.name, path.parent.name)
+                         for path in dataset_files(dataset_dir, years, months)})
+
+    parts = []
+    for part, (year_dir, month_dir) in enumerate(partitions):
+        year, month = int(year_dir.split("=")[1]), int(month_dir.split("=")[1])
+        batches = [count_routes(batch) for batch in
+                   iter_trip_batches(INDEX_COLUMNS, [year], [month], dataset_dir, decode=False)]
+        if batches:
+            month_counts = pd.concat(batches).groupby(SLICE_KEYS + ["start", "end"], as_index=False)["rides"].sum()
+            parts.append(truncate_slices(month_counts, per_slice).assign(part=part))
+
+    columns = SLICE_KEYS + ["start", "end", "rides", "slice_rides", "cutoff"]
+    if not parts:
+        return pd.DataFrame(columns=columns)
+
+    combined = pd.concat(parts, ignore_index=True)
+    slice_totals = combined.drop_duplicates(SLICE_KEYS + ["part"]).groupby(SLICE_KEYS)[["slice_rides", "cutoff"]].sum()
+    index = combined.groupby(SLICE_KEYS + ["start", "end"], as_index=False)["rides"].sum()
+    index = index.join(slice_totals, on=SLICE_KEYS)[columns]
+    return index.astype({
+        "period": "int32", "rider": "int8", "band": "int8", "start": "int32", "end": "int32",
+        "rides": "int32", "slice_rides": "int64", "cutoff": "int32",
+    }).sort_values(SLICE_KEYS + ["rides"], ascending=[True, True, True, False], ignore_index=True)
+
+
+## Save the index and the stations it refers to
+# ---------------------------------------------------------
+def write_route_index(index, dataset_dir=TRIPS_DATASET_DIR, path=ROUTE_INDEX_PATH,
+                      stations_path=ROUTE_STATIONS_PATH):
+    used = np.union1d(index["start"].unique(), index["end"].unique())
+    dictionary = load_dictionary(dataset_dir)
+    stations = dictionary[dictionary["station_id"].isin(used)][["station_id", "station_name", "lat", "lng"]]
+    index.to_parquet(path, index=False)
+    stations.to_parquet(stations_path, index=False)
+
+################################################ Querying ################################################
+
+## Width of each arc from its trip count
+# ---------------------------------------------------------
+# scale shrinks the bins when only part of the rides is selected (e.g. one month)
+def stroke_width(trip_counts, scale=1.0):
+    return STROKE_WIDTHS[np.digitize(np.asarray(trip_counts), STROKE_BINS * scale)]
+
+
+## Slices of the index matching the chosen filters (None means no filter)
+# ---------------------------------------------------------
+def select_slices(index, periods=None, seasons=None, riders=None, bands=None, years=None):
+    index = year_rows(index, years_needed(years, periods))
+    mask = np.ones(len(index), dtype=bool)
+    if periods is not None:
+        mask &= index["period"].isin(list(periods)).to_numpy()
+    if seasons is not None:
+        codes = [SEASONS.index(s) for s in seasons]
+        mask &= np.isin(SEASON_CODE_BY_MONTH[(index["period"] % 100).to_numpy()], codes)
+    if riders is not None:
+        mask &= index["rider"].isin([RIDER_TYPES.index(r) for r in riders]).to_numpy()
+    if bands is not None:
+        mask &= index["band"].isin([BAND_NAMES.index(b) for b in bands]).to_numpy()
+    return index[mask]
+
+
+## Rides per (start, end) station id pair over the chosen slices
+# ---------------------------------------------------------
+def route_counts(index, periods=None, seasons=None, riders=None, bands=None, years=None):
+    return select_slices(index, periods, seasons, riders, bands, years).groupby(["start", "end"])["rides"].sum()
+
+
+## Top N arcs for the chosen filters (None means no filter)
+# ---------------------------------------------------------
+# Returns the arcs (same columns as top500_routes plus stroke_width) and the most rides any
+# count can be missing because of the per-slice truncation.
+def top_arcs(index, stations, n=TOP_ROUTES_N, periods=None, seasons=None, riders=None, bands=None, years=None):
+    selected = select_slices(index, periods, seasons, riders, bands, years)
+    counts = selected.groupby(["start", "end"])["rides"].sum().nlargest(n)
+    slices = selected.drop_duplicates(SLICE_KEYS)
+    bound = int(slices["cutoff"].sum())
+
+    by_id = stations.set_index("station_id")
+    start = by_id.reindex(counts.index.get_level_values("start"))
+    end = by_id.reindex(counts.index.get_level_values("end"))
+    arcs = pd.DataFrame({
+        "start_station_name": start["station_name"].to_numpy(),
+        "end_station_name": end["station_name"].to_numpy(),
+        "trip_count": counts.to_numpy().astype("int64"),
+        "start_lat": start["lat"].to_numpy(),
+        "start_lng": start["lng"].to_numpy(),
+        "end_lat": end["lat"].to_numpy(),
+        "end_lng": end["lng"].to_numpy(),
+    })
+
+    # Rides of an average year among the years the query touched
+    touched = year_rows(index, years_needed(years, periods))
+    total = touched.drop_duplicates(SLICE_KEYS)["slice_rides"].sum() / max(len(rollup_years(touched)), 1)
+    scale = slices["slice_rides"].sum() / total if total else 1.0
+    arcs["stroke_width"] = stroke_width(arcs["trip_count"], scale)
+    return arcs, bound
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the per-slice route index.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--years", type=int, nargs="*", help="Only use these years (building or querying)")
+    parser.add_argument("--per-slice", type=int, default=DEFAULT_PER_SLICE, help="Routes kept per slice")
+    parser.add_argument("--query", action="store_true", help="Query the index instead of building it")
+    parser.add_argument("--periods", type=int, nargs="*", help="Periods as YYYYMM")
+    parser.add_argument("--seasons", nargs="*", choices=SEASONS)
+    parser.add_argument("--riders", nargs="*", choices=RIDER_TYPES)
+    parser.add_argument("--bands", nargs="*", choices=BAND_NAMES)
+    parser.add_argument("-n", type=int, default=TOP_ROUTES_N, help="Number of arcs")
+    args = parser.parse_args()
+
+    if not args.query:
+        index = build_route_index(args.dataset, args.years, per_slice=args.per_slice)
+        write_route_index(index, args.dataset)
+        print(f"Wrote {len(index):,} routes over {len(index.drop_duplicates(SLICE_KEYS)):,} slices to {ROUTE_INDEX_PATH}")
+        return
+
+    arcs, bound = top_arcs(
+        pd.read_parquet(ROUTE_INDEX_PATH), pd.read_parquet(ROUTE_STATIONS_PATH), args.n,
+        args.periods, args.seasons, args.riders, args.bands, args.years,
+    )
+    print(arcs.to_string())
+    print("exact" if bound == 0 else f"counts may be low by up to {bound:,} rides (raise --per-slice)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+################################################ CitiBike Stratified Samples ################################################
+
+# Seeded, stratified reservoir samples of the trips in one streaming pass over the partitions,
+# replacing the unseeded DataFrame.sample calls of Exercise 2.7 (which needed the whole merged
+# dataset in memory and over-represented summer members).
+#
+# Every trip gets a random key; a sample is the trips with the smallest keys, so reservoirs
+# from different batches simply merge. With weights the key is -log(u) / weight
+# (Efraimidis-Spirakis), which favours heavy trips. Strata default to month x rider type.
+#   - fixed allocation: each stratum keeps its k smallest keys (memory: k x strata)
+#   - proportional allocation: each stratum keeps its smallest n * N_s / N keys (with the
+#     counts seen so far) plus a margin, so memory stays at about n rows. At the end every
+#     stratum gets its share of n (largest remainder rounding). The smallest key ever trimmed
+#     from each stratum is tracked, which proves the final sample equals a full-data one.
+#
+# Trips are read compact and only the sample is decoded, so the pass costs little more than
+# reading the few columns it needs. Samples are written as Parquet to Prepared_Data/Samples.
+#
+# Usage:
+#   python -m citibike.sampling --name citibike_sample_100k -n 100000
+#   python -m citibike.sampling --name tripdur_sample_500k -n 500000 --valid-only --seed 7
+#   python -m citibike.sampling --name per_month_2k --fixed 2000
+
+import argparse
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from citibike import stations
+from citibike.ingest import iter_trip_batches, physical_columns
+from citibike.paths import PREPARED_DIR, TRIPS_DATASET_DIR
+
+SAMPLES_DIR = PREPARED_DIR / "Samples"
+
+DEFAULT_SEED = 2022
+DEFAULT_STRATA = ["period", "member_casual"]
+
+SAMPLE_COLUMNS = ["ride_id", "rideable_type", "started_at", "ended_at", "start_station_name",
+                  "end_station_name", "start_lat", "start_lng", "end_lat", "end_lng", "member_casual"]
+
+# Extra reservoir room per stratum for proportional allocation: standard deviations of the
+# stratum's share, plus a few rows for very small strata
+MARGIN_SIGMAS = 6
+MARGIN_ROWS = 10
+
+################################################ Sampling ################################################
+
+## Stratum label of every trip (period = year * 100 + month)
+# ---------------------------------------------------------
+def stratum_labels(trips, strata):
+    labels = []
+    for stratum in strata:
+        if stratum == "period":
+            started = trips["started_at"]
+            labels.append((started.dt.year * 100 + started.dt.month).astype("Int64").astype(str))
+        else:
+            labels.append(trips[stratum].astype(str))
+    return labels[0].str.cat(labels[1:], sep="|") if len(labels) > 1 else labels[0]
+
+
+## Random keys: uniform, or exponential with rate = weight when weights are given
+# ---------------------------------------------------------
+def sample_keys(rng, size, weights=None):
+    u = rng.random(size)
+    if weights is None:
+        return u
+    weights = np.asarray(weights, dtype="float64")
+    with np.errstate(divide="ignore"):
+        return np.where(weights > 0, -np.log(u) / weights, np.inf)
+
+
+## Keep the k smallest keys of every stratum (k: a number, or a Series by stratum)
+# ---------------------------------------------------------
+# Returns the kept rows and the smallest dropped key per stratum.
+def smallest_per_stratum(frame, k):
+    frame = frame.sort_values("_key", kind="stable")
+    rank = frame.groupby("_stratum", sort=False).cumcount().to_numpy()
+    limit = k if np.isscalar(k) else frame["_stratum"].map(k).fillna(0).to_numpy()
+    kept = rank < limit
+    dropped = frame[~kept].groupby("_stratum", sort=False)["_key"].min()
+    return frame[kept], dropped
+
+
+## A new sampler
+# ---------------------------------------------------------
+# n: total sample size (proportional), or fixed: trips per stratum.
+def new_sampler(n=None, fixed=None, strata=DEFAULT_STRATA, weight=None, seed=DEFAULT_SEED):
+    if (n is None) == (fixed is None):
+        raise ValueError("Give either n (proportional allocation) or fixed (trips per stratum)")
+    return {
+        "n": n, "fixed": fixed, "strata": list(strata), "weight": weight,
+        "rng": np.random.default_rng(seed),
+        "reservoir": None,
+        "counts": pd.Series(dtype="int64"),
+        "trimmed": pd.Series(dtype="float64"),
+    }
+
+
+## Reservoir room per stratum under proportional allocation
+# ---------------------------------------------------------
+def proportional_caps(counts, n):
+    share = np.ceil(counts * n / counts.sum())
+    return (share + np.ceil(MARGIN_SIGMAS * np.sqrt(share)) + MARGIN_ROWS).astype("int64")
+
+
+## Feed one batch of trips
+# ---------------------------------------------------------
+def observe(sampler, trips):
+    keys = sample_keys(sampler["rng"], len(trips), None if sampler["weight"] is None else trips[sampler["weight"]])
+    labels = stratum_labels(trips, sampler["strata"])
+    sampler["counts"] = sampler["counts"].add(labels.value_counts(), fill_value=0).astype("int64")
+
+    batch = trips.assign(_key=keys, _stratum=labels.to_numpy())
+    merged = batch if sampler["reservoir"] is None else pd.concat([sampler["reservoir"], batch], ignore_index=True)
+    limit = sampler["fixed"] if sampler["n"] is None else proportional_caps(sampler["counts"], sampler["n"])
+    kept, dropped = smallest_per_stratum(merged, limit)
+
+    sampler["reservoir"] = kept.reset_index(drop=True)
+    sampler["trimmed"] = pd.concat([sampler["trimmed"], dropped]).groupby(level=0).min()
+    return sampler
+
+
+## Trips per stratum for proportional allocation (largest remainder rounding)
+# ---------------------------------------------------------
+def proportional_targets(counts, n):
+    size = min(n, counts.sum())
+    exact = counts / counts.sum() * size
+    targets = np.floor(exact).astype("int64")
+    targets[(exact - targets).nlargest(int(size - targets.sum())).index] += 1
+    return targets
+
+
+## The final sample (without the helper columns), plus the per-stratum allocation
+# ---------------------------------------------------------
+def finish(sampler):
+    reservoir = sampler["reservoir"]
+    if reservoir is None:
+        return pd.DataFrame(), pd.DataFrame(columns=["stratum", "trips", "sampled"])
+
+    sample = reservoir
+    if sampler["n"] is not None:
+        sample, _ = smallest_per_stratum(reservoir, proportional_targets(sampler["counts"], sampler["n"]))
+
+        # Exact when every stratum's largest sampled key is below the smallest key it ever dropped
+        largest = sample.groupby("_stratum")["_key"].max()
+        unsafe = largest[largest >= sampler["trimmed"].reindex(largest.index, fill_value=np.inf)]
+        if len(unsafe):
+            warnings.warn(f"Reservoir margin too small for strata {list(unsafe.index)}; raise MARGIN_SIGMAS")
+
+    allocation = pd.DataFrame({
+        "trips": sampler["counts"],
+        "sampled": sample["_stratum"].value_counts().reindex(sampler["counts"].index, fill_value=0),
+    }).rename_axis("stratum").reset_index()
+    sample = sample.sort_values("_key", kind="stable").drop(columns=["_key", "_stratum"]).reset_index(drop=True)
+    return sample, allocation
+
+
+## One pass over the dataset
+# ---------------------------------------------------------
+# valid_only drops trips the cleaning stage flagged (and, for datasets ingested before it,
+# trips with a non-positive or over-24h duration).
+def sample_trips(n=None, fixed=None, columns=SAMPLE_COLUMNS, strata=DEFAULT_STRATA, weight=None,
+                 seed=DEFAULT_SEED, valid_only=False, years=None, months=None, dataset_dir=TRIPS_DATASET_DIR):
+    needed = list(dict.fromkeys(list(columns) + ["started_at", "ended_at", "member_casual"]))
+    extra = [col for col in strata + ([weight] if weight else []) + (["reject_reason"] if valid_only else [])
+             if col != "period"]
+    physical = list(dict.fromkeys(physical_columns(needed) + extra))
+    sampler = new_sampler(n, fixed, strata, weight, seed)
+
+    for batch in iter_trip_batches(physical, years, months, dataset_dir, decode=False):
+        batch["tripduration"] = (batch["ended_at"] - batch["started_at"]).dt.total_seconds() / 60
+        if valid_only:
+            keep = (batch["tripduration"] > 0) & (batch["tripduration"] <= 1440)
+            if "reject_reason" in batch:
+                keep &= batch["reject_reason"].isna()
+            batch = batch[keep]
+        observe(sampler, batch)
+
+    sample, allocation = finish(sampler)
+    if len(sample):
+        sample = stations.decode_trips(sample, stations.load_dictionary(dataset_dir), columns)
+        sample = sample[[col for col in columns if col in sample.columns] + ["tripduration"]]
+    return sample, allocation
+
+################################################ Storing ################################################
+
+def write_sample(sample, name, samples_dir=SAMPLES_DIR):
+    samples_dir.mkdir(parents=True, exist_ok=True)
+    path = samples_dir / f"{name}.parquet"
+    sample.to_parquet(path, index=False)
+    return path
+
+
+def read_sample(name, samples_dir=SAMPLES_DIR):
+    return pd.read_parquet(samples_dir / f"{name}.parquet")
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Seeded, stratified reservoir sample of the trips.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--name", required=True, help="Sample name (file name in Prepared_Data/Samples)")
+    parser.add_argument("-n", type=int, help="Total sample size, allocated proportionally to the strata")
+    parser.add_argument("--fixed", type=int, help="Trips per stratum instead of proportional allocation")
+    parser.add_argument("--strata", nargs="*", default=DEFAULT_STRATA, help="period and/or trip columns")
+    parser.add_argument("--weight", help="Numeric column to weight trips by (e.g. duration_s)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--valid-only", action="store_true", help="Skip trips the cleaning stage rejected")
+    parser.add_argument("--years", type=int, nargs="*", help="Only use these years")
+    args = parser.parse_args()
+
+    if (args.n is None) == (args.fixed is None):
+        parser.error("give either -n or --fixed")
+    sample, allocation = sample_trips(
+        args.n, args.fixed, strata=args.strata, weight=args.weight, seed=args.seed,
+        valid_only=args.valid_only, years=args.years, dataset_dir=args.dataset,
+    )
+    path = write_sample(sample, args.name)
+    print(allocation.to_string(index=False))
+    print(f"Wrote {len(sample):,} trips to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+################################################ CitiBike Duration Sketches ################################################
+
+# Mergeable quantile sketches (t-digest) of trip duration, one per month x rider type.
+# A sketch is a few hundred weighted centroids plus the exact count, min and max. Sketches
+# for any filter (season, months, rider type) are merged on the fly, so the Trip Duration page
+# can show medians, quartiles, whiskers and tail percentiles without raw trips or a sample.
+#
+# Only valid trips are sketched (0 < duration <= 24h, the filter from Exercise 2.4). The
+# dashboard's 1–65 minute focus window is applied afterwards by truncating the sketch's CDF.
+#
+# Usage:
+#   python -m citibike.sketches          (build 02_Data/Prepared_Data/tripduration_sketches.parquet)
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from citibike.ingest import iter_trip_batches
+from citibike.paths import PREPARED_DIR, TRIPS_DATASET_DIR
+from citibike.prepare import SEASON_BY_MONTH
+
+SKETCHES_PATH = PREPARED_DIR / "tripduration_sketches.parquet"
+
+# Compression: more centroids = more accurate quantiles (about 1% rank error at 200)
+DEFAULT_DELTA = 200
+
+MAX_MINUTES = 1440
+
+################################################ t-digest ################################################
+
+## A sketch of a set of values
+# ---------------------------------------------------------
+def new_sketch():
+    return {"means": np.empty(0), "weights": np.empty(0), "min": np.inf, "max": -np.inf}
+
+
+def sketch_values(values, delta=DEFAULT_DELTA):
+    values = np.asarray(values, dtype="float64")
+    if not len(values):
+        return new_sketch()
+    sketch = {"means": values, "weights": np.ones(len(values)), "min": values.min(), "max": values.max()}
+    return compress(sketch, delta)
+
+
+## Merge neighbouring centroids so each covers at most one unit of the k1 scale
+# ---------------------------------------------------------
+# The k1 scale (delta / 2pi * arcsin(2q - 1)) keeps centroids small near the tails,
+# which is where the whiskers and tail percentiles are read.
+def compress(sketch, delta=DEFAULT_DELTA):
+    order = np.argsort(sketch["means"], kind="stable")
+    means, weights = sketch["means"][order], sketch["weights"][order]
+    if len(means) <= 1:
+        return {**sketch, "means": means, "weights": weights}
+
+    cumulative = np.cumsum(weights)
+    q_mid = (cumulative - weights / 2) / cumulative[-1]
+    k = delta / (2 * np.pi) * np.arcsin(2 * q_mid - 1)
+    bucket = np.floor(k - k.min()).astype("int64")
+
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    merged_weights = np.add.reduceat(weights, starts)
+    merged_means = np.add.reduceat(means * weights, starts) / merged_weights
+    return {"means": merged_means, "weights": merged_weights, "min": sketch["min"], "max": sketch["max"]}
+
+
+## Merge any number of sketches (exact count, min, max and sum)
+# ---------------------------------------------------------
+def merge_sketches(sketches, delta=DEFAULT_DELTA):
+    sketches = [s for s in sketches if len(s["weights"])]
+    if not sketches:
+        return new_sketch()
+    combined = {
+        "means": np.concatenate([s["means"] for s in sketches]),
+        "weights": np.concatenate([s["weights"] for s in sketches]),
+        "min": min(s["min"] for s in sketches),
+        "max": max(s["max"] for s in sketches),
+    }
+    return compress(combined, delta)
+
+
+## Cumulative distribution: share of values <= x
+# ---------------------------------------------------------
+def cdf(sketch, x):
+    means, weights = sketch["means"], sketch["weights"]
+    total = weights.sum()
+    xs = np.r_[sketch["min"], means, sketch["max"]]
+    ranks = np.r_[0.0, np.cumsum(weights) - weights / 2, total] / total
+    return np.interp(x, xs, ranks)
+
+
+## Quantile(s): the value below which a share q of values fall
+# ---------------------------------------------------------
+def quantile(sketch, q):
+    means, weights = sketch["means"], sketch["weights"]
+    total = weights.sum()
+    xs = np.r_[sketch["min"], means, sketch["max"]]
+    ranks = np.r_[0.0, np.cumsum(weights) - weights / 2, total] / total
+    return np.interp(q, ranks, xs)
+
+
+## Restrict a sketch to values in [low, high] (the dashboard's focus window)
+# ---------------------------------------------------------
+def truncate(sketch, low, high):
+    inside = (sketch["means"] >= low) & (sketch["means"] <= high)
+    if not inside.any():
+        return new_sketch()
+    return {
+        "means": sketch["means"][inside],
+        "weights": sketch["weights"][inside],
+        "min": max(low, sketch["min"]),
+        "max": min(high, sketch["max"]),
+    }
+
+################################################ Box Plot Statistics ################################################
+
+## Everything the Trip Duration page shows, from one sketch
+# ---------------------------------------------------------
+def box_stats(sketch, low=None, high=None):
+    if low is not None or high is not None:
+        low = sketch["min"] if low is None else low
+        high = sketch["max"] if high is None else high
+        sketch = truncate(sketch, low, high)
+    if not len(sketch["weights"]):
+        return None
+
+    p01, q1, median, q3, p95, p99 = quantile(sketch, [0.01, 0.25, 0.5, 0.75, 0.95, 0.99])
+    iqr = q3 - q1
+    count = sketch["weights"].sum()
+    return {
+        "count": int(round(count)),
+        "mean": float((sketch["means"] * sketch["weights"]).sum() / count),
+        "min": float(sketch["min"]),
+        "p01": float(p01),
+        "q1": float(q1),
+        "median": float(median),
+        "q3": float(q3),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(sketch["max"]),
+        "lowerfence": float(max(sketch["min"], q1 - 1.5 * iqr)),
+        "upperfence": float(min(sketch["max"], q3 + 1.5 * iqr)),
+    }
+
+################################################ Building and Storing ################################################
+
+## One sketch per (period, rider type), streamed over the dataset
+# ---------------------------------------------------------
+def build_sketches(dataset_dir=TRIPS_DATASET_DIR, years=None, months=None, delta=DEFAULT_DELTA):
+    sketches = {}
+    columns = ["started_at", "ended_at", "member_casual"]
+    for trips in iter_trip_batches(columns, years, months, dataset_dir):
+        minutes = (trips["ended_at"] - trips["started_at"]).dt.total_seconds() / 60
+        valid = (minutes > 0) & (minutes <= MAX_MINUTES)
+
+        keyed = pd.DataFrame({
+            "period": trips["started_at"].dt.year * 100 + trips["started_at"].dt.month,
+            "member_casual": trips["member_casual"].astype(str),
+            "minutes": minutes,
+        })[valid]
+        for (period, rider), group in keyed.groupby(["period", "member_casual"]):
+            key = (int(period), rider)
+            batch_sketch = sketch_values(group["minutes"].to_numpy(), delta)
+            sketches[key] = merge_sketches([sketches.get(key, new_sketch()), batch_sketch], delta)
+    return sketches
+
+
+## Flatten sketches into one table (one row per centroid)
+# ---------------------------------------------------------
+def sketches_frame(sketches):
+    frames = [
+        pd.DataFrame({
+            "period": period,
+            "member_casual": rider,
+            "mean": sketch["means"],
+            "weight": sketch["weights"],
+            "min": sketch["min"],
+            "max": sketch["max"],
+        })
+        for (period, rider), sketch in sorted(sketches.items())
+    ]
+    columns = ["period", "member_casual", "mean", "weight", "min", "max"]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def write_sketches(sketches, path=SKETCHES_PATH):
+    sketches_frame(sketches).to_parquet(path, index=False)
+
+
+def read_sketches(path=SKETCHES_PATH):
+    return pd.read_parquet(path)
+
+################################################ Querying ################################################
+
+## Merge the stored sketches that match the filters, per rider type
+# ---------------------------------------------------------
+def sketch_by_rider(table, periods=None, seasons=None, delta=DEFAULT_DELTA):
+    rows = table
+    if periods is not None:
+        rows = rows[rows["period"].isin(list(periods))]
+    if seasons is not None:
+        rows = rows[(rows["period"] % 100).map(SEASON_BY_MONTH).isin(list(seasons))]
+
+    merged = {}
+    for rider, group in rows.groupby("member_casual"):
+        parts = [
+            {
+                "means": part["mean"].to_numpy(),
+                "weights": part["weight"].to_numpy(),
+                "min": part["min"].iloc[0],
+                "max": part["max"].iloc[0],
+            }
+            for _, part in group.groupby("period")
+        ]
+        merged[rider] = merge_sketches(parts, delta)
+    return merged
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Build trip duration sketches per month and rider type.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--years", type=int, nargs="*", help="Only use these years")
+    parser.add_argument("--delta", type=int, default=DEFAULT_DELTA, help="Sketch compression")
+    args = parser.parse_args()
+
+    sketches = build_sketches(args.dataset, args.years, delta=args.delta)
+    write_sketches(sketches)
+
+    for rider, sketch in sketch_by_rider(sketches_frame(sketches)).items():
+        stats = box_stats(sketch)
+        print(f"{rider}: median {stats['median']:.1f} min, p95 {stats['p95']:.1f} min over {stats['count']:,} trips")
+
+
+if __name__ == "__main__":
+    main()
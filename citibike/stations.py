@@ -0,0 +1,158 @@
+################################################ CitiBike Station Dictionary ################################################
+
+# Canonical station dictionary built during ingest: integer station_id <-> station name <->
+# Citi Bike short id <-> canonical lat/lng. Trips in the partitioned dataset only carry the
+# int32 ids; names and coordinates are decoded from this table when a reader asks for them.
+#
+# Coordinates are the running mean of every position reported for the station (electric bikes
+# report GPS positions that wander a little around the dock), stored as float32. The running
+# sums are kept so new months keep refining the same canonical point. This replaces the
+# station_lookup dedup from Exercise 2.5.
+#
+# Usage (memory check on one month):
+#   python -m citibike.stations --year 2022 --month 7
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from citibike.paths import TRIPS_DATASET_DIR
+
+STATIONS_FILE = "_stations.parquet"
+
+DICTIONARY_COLUMNS = ["station_id", "station_name", "short_name", "lat", "lng",
+                      "lat_sum", "lng_sum", "coord_count"]
+
+# Logical trip columns that are decoded from the dictionary, per end of the trip
+DECODED_COLUMNS = {
+    "start": {"start_station_name": "station_name", "start_station_id": "short_name",
+              "start_lat": "lat", "start_lng": "lng"},
+    "end": {"end_station_name": "station_name", "end_station_id": "short_name",
+            "end_lat": "lat", "end_lng": "lng"},
+}
+
+################################################ Dictionary ################################################
+
+## Empty dictionary
+# ---------------------------------------------------------
+def new_dictionary():
+    return pd.DataFrame({
+        "station_id": pd.Series(dtype="int32"),
+        "station_name": pd.Series(dtype="string"),
+        "short_name": pd.Series(dtype="string"),
+        "lat": pd.Series(dtype="float32"),
+        "lng": pd.Series(dtype="float32"),
+        "lat_sum": pd.Series(dtype="float64"),
+        "lng_sum": pd.Series(dtype="float64"),
+        "coord_count": pd.Series(dtype="int64"),
+    })
+
+
+## Load / save the dictionary that sits next to the partitions
+# ---------------------------------------------------------
+# The leading underscore keeps the file out of the Parquet dataset scan.
+def load_dictionary(dataset_dir=TRIPS_DATASET_DIR):
+    path = Path(dataset_dir) / STATIONS_FILE
+    if not path.exists():
+        return new_dictionary()
+    return pd.read_parquet(path).astype(new_dictionary().dtypes.to_dict())
+
+
+def save_dictionary(dictionary, dataset_dir=TRIPS_DATASET_DIR):
+    path = Path(dataset_dir) / STATIONS_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    dictionary[DICTIONARY_COLUMNS].to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+
+
+## Encode one end (start or end) of a chunk of raw trips, growing the dictionary
+# ---------------------------------------------------------
+def encode_end(chunk, end, dictionary):
+    names = chunk[f"{end}_station_name"]
+    observed = pd.DataFrame({
+        "station_name": names,
+        "short_name": chunk[f"{end}_station_id"],
+        "lat": chunk[f"{end}_lat"],
+        "lng": chunk[f"{end}_lng"],
+    }).dropna(subset=["station_name"])
+
+    # New stations get the next free ids, in order of first appearance
+    unseen = ~observed["station_name"].isin(dictionary["station_name"])
+    if unseen.any():
+        added = observed[unseen].drop_duplicates("station_name")[["station_name", "short_name"]]
+        added.insert(0, "station_id", np.arange(len(dictionary), len(dictionary) + len(added), dtype="int32"))
+        added = added.assign(lat=np.nan, lng=np.nan, lat_sum=0.0, lng_sum=0.0, coord_count=0)
+        dictionary = pd.concat([dictionary, added], ignore_index=True).astype(new_dictionary().dtypes.to_dict())
+
+    # Fold this chunk's positions into the running means
+    positions = observed.dropna(subset=["lat", "lng"]).groupby("station_name").agg(
+        lat_sum=("lat", "sum"), lng_sum=("lng", "sum"), coord_count=("lat", "size"),
+    )
+    if len(positions):
+        dictionary = dictionary.set_index("station_name")
+        for col in ["lat_sum", "lng_sum", "coord_count"]:
+            dictionary.loc[positions.index, col] += positions[col]
+        dictionary = dictionary.reset_index()[DICTIONARY_COLUMNS]
+        dictionary["lat"] = (dictionary["lat_sum"] / dictionary["coord_count"]).astype("float32")
+        dictionary["lng"] = (dictionary["lng_sum"] / dictionary["coord_count"]).astype("float32")
+
+    ids = pd.Series(dictionary["station_id"].to_numpy(), index=dictionary["station_name"].to_numpy())
+    return names.map(ids).astype("Int32"), dictionary
+
+
+## Encode both ends of a chunk
+# ---------------------------------------------------------
+def encode_trips(chunk, dictionary):
+    start_ids, dictionary = encode_end(chunk, "start", dictionary)
+    end_ids, dictionary = encode_end(chunk, "end", dictionary)
+    return start_ids, end_ids, dictionary
+
+
+## Add decoded name / short id / coordinate columns to compact trips
+# ---------------------------------------------------------
+def decode_trips(trips, dictionary, columns):
+    by_id = dictionary.set_index("station_id")
+    for end, mapping in DECODED_COLUMNS.items():
+        wanted = [col for col in mapping if col in columns]
+        if not wanted:
+            continue
+        ids = trips[f"{end}_station"].astype("float64")
+        for col in wanted:
+            values = by_id[mapping[col]].reindex(ids.to_numpy()).to_numpy()
+            trips[col] = pd.Categorical(values) if mapping[col] == "station_name" else values
+    return trips
+
+################################################ Memory Check ################################################
+
+## Compare the decoded (wide) and compact in-memory size of one month
+# ---------------------------------------------------------
+def memory_report(year, month, dataset_dir=TRIPS_DATASET_DIR):
+    from citibike.ingest import LOGICAL_COLUMNS, read_trips
+
+    compact = read_trips(years=[year], months=[month], dataset_dir=dataset_dir, decode=False)
+    wide = read_trips(LOGICAL_COLUMNS, years=[year], months=[month], dataset_dir=dataset_dir)
+    wide = wide.astype({col: object for col in wide.columns if wide[col].dtype.name in ("category", "string")})
+    return {
+        "rows": len(compact),
+        "wide_mb": wide.memory_usage(deep=True).sum() / 1e6,
+        "compact_mb": compact.memory_usage(deep=True).sum() / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory use of the compact trip representation.")
+    parser.add_argument("--dataset", default=TRIPS_DATASET_DIR, help="Partitioned trip dataset folder")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--month", type=int, required=True)
+    args = parser.parse_args()
+
+    report = memory_report(args.year, args.month, args.dataset)
+    print(f"{report['rows']:,} trips: {report['wide_mb']:.1f} MB as object strings/float64 "
+          f"vs {report['compact_mb']:.1f} MB compact ({report['wide_mb'] / report['compact_mb']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+################################################ CitiBike Shared Columnar Store ################################################
+
+# Memory-mapped copies of the dashboard's Parquet tables (cube rollups, sketches, route index,
+# station flows, time series), so every Streamlit worker process shares one copy of the data
+# through the OS page cache instead of holding its own pandas frames.
+#
+# Each table is written as an uncompressed Arrow IPC file with a single record batch and
+# dictionary-encoded strings. Opened through a memory map, such a table converts to pandas
+# without copying: numeric, timestamp and category-code columns are read-only views of the
+# mapped pages. (Columns with nulls and plain strings would be copied, hence the encoding.)
+#
+# citibike.data picks the mapped copy automatically when it is at least as new as the Parquet file.
+#
+# Usage:
+#   python -m citibike.store                       (export the dashboard tables)
+#   python -m citibike.store --measure --workers 4 (memory per worker: Parquet vs mapped)
+
+import argparse
+import multiprocessing
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from citibike.paths import CUBE_DIR, DATA_DIR, PREPARED_DIR, STORE_DIR
+
+################################################ Writing ################################################
+
+## Store file for a source file (its path under 02_Data, flattened)
+# ---------------------------------------------------------
+def store_path(source, store_dir=STORE_DIR):
+    source = Path(source).resolve()
+    try:
+        name = "__".join(source.relative_to(DATA_DIR).with_suffix("").parts)
+    except ValueError:
+        name = source.stem
+    return Path(store_dir) / f"{name}.arrow"
+
+
+## Parquet files the dashboard reads
+# ---------------------------------------------------------
+def dashboard_sources():
+    return sorted(PREPARED_DIR.glob("*.parquet")) + sorted(CUBE_DIR.glob("*.parquet"))
+
+
+## One contiguous batch with dictionary-encoded strings (what makes the pandas view zero-copy)
+# ---------------------------------------------------------
+def mappable(table):
+    table = table.combine_chunks()
+    arrays = []
+    for column in table.columns:
+        array = column.chunk(0) if column.num_chunks else pa.array([], column.type)
+        if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            array = array.dictionary_encode()
+        arrays.append(array)
+    return pa.RecordBatch.from_arrays(arrays, names=table.column_names)
+
+
+def write_mapped(table, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    batch = mappable(table)
+    tmp_path = path.with_suffix(".arrow.tmp")
+    with pa.OSFile(str(tmp_path), "wb") as sink:
+        with pa.ipc.new_file(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+    tmp_path.replace(path)
+
+
+## Export every dashboard table
+# ---------------------------------------------------------
+def export_store(sources=None, store_dir=STORE_DIR):
+    written = []
+    for source in sources if sources is not None else dashboard_sources():
+        path = store_path(source, store_dir)
+        write_mapped(pq.read_table(source), path)
+        written.append(path)
+    return written
+
+################################################ Reading ################################################
+
+## Open a store file zero-copy (the frame's arrays are read-only views of the mapped file)
+# ---------------------------------------------------------
+def read_mapped(path):
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+## Mapped copy of a source file, when it exists and is up to date (None otherwise)
+# ---------------------------------------------------------
+def fresh_store_path(source, store_dir=STORE_DIR):
+    path = store_path(source, store_dir)
+    if path.exists() and path.stat().st_mtime_ns >= Path(source).stat().st_mtime_ns:
+        return path
+    return None
+
+################################################ Memory Check ################################################
+
+## Resident and private (anonymous) memory of this process in MB (Linux)
+# ---------------------------------------------------------
+def process_memory():
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f.readlines()[1:]:
+            key, value = line.split(":")
+            fields[key] = int(value.split()[0]) / 1024
+    return {"rss_mb": fields["Rss"], "pss_mb": fields["Pss"], "private_mb": fields["Anonymous"]}
+
+
+## One dashboard worker: load every table, touch every column, report memory
+# ---------------------------------------------------------
+# Tables are loaded through the dashboard's own readers (citibike.data), so the frames it
+# derives (the sorted cube rollups, the per-resolution time series) are measured too.
+def load_worker(mode, sources, store_dir, barrier):
+    from citibike import data
+
+    before = process_memory()
+    frames = []
+    for source in sources:
+        value = data.parquet_reader(source)(source, store_dir if mode == "mapped" else None)
+        frames.extend(value.values() if isinstance(value, dict) else [value])
+    for frame in frames:
+        for col in frame.columns:
+            if frame[col].dtype.kind in "iufM":
+                frame[col].max()
+    barrier.wait()
+    after = process_memory()
+    barrier.wait()
+    return {key: after[key] - before[key] for key in after}
+
+
+def measure(workers=4, sources=None, store_dir=STORE_DIR):
+    sources = sources if sources is not None else dashboard_sources()
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for mode in ["parquet", "mapped"]:
+        with context.Manager() as manager:
+            barrier = manager.Barrier(workers)
+            with context.Pool(workers) as pool:
+                per_worker = pool.starmap(load_worker, [(mode, sources, store_dir, barrier)] * workers)
+        results[mode] = pd.DataFrame(per_worker).mean()
+    return pd.DataFrame(results).T
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the dashboard tables as memory-mappable Arrow files.")
+    parser.add_argument("--measure", action="store_true", help="Compare per-worker memory: Parquet vs mapped")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes for --measure")
+    args = parser.parse_args()
+
+    if args.measure:
+        report = measure(args.workers)
+        print(f"Memory added per worker while {args.workers} workers hold every dashboard table (MB):")
+        print(report.round(1).to_string())
+        return
+
+    for path in export_store():
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+################################################ CitiBike Synthetic Trips ################################################
+
+# Seeded generator of monthly trip CSVs in the Citi Bike schema (the 2021+ files: ride_id,
+# rideable_type, started_at, ended_at, station names / ids, lat / lng, member_casual), so the
+# pipeline and the dashboard can be timed at 1M, 10M or 100M rows without the real download.
+#
+# What makes it look like the real data:
+#   - stations: dense in Manhattan, thinner in Brooklyn / Queens, with a skewed (Zipf-like)
+#     popularity; e-bike coordinates are GPS-jittered, classic ones are the station's
+#   - volume: a daily temperature / precipitation series drives rides per day (more in warm,
+#     dry weather, fewer on weekends); the share of casual riders rises in summer
+#   - trips: members ride at commute peaks, casual riders in the afternoon; most trips end at
+#     a nearby station (round trips too), durations follow distance and bike type
+#   - a small share of invalid trips (ended before started, over 24h, no end station), as in
+#     the real files, so the cleaning stage has something to reject
+#
+# The same seed gives the same files. Months are generated in chunks and written as parts of
+# at most file_rows rows (Citi Bike's own files hold about a million rows each), so memory
+# stays bounded at 100M rows. The weather series behind the volume is written next to the
+# folder as <folder>_weather_df.csv (date, avgTemp in °C, precipitation in mm), in the columns
+# and units of citibike.weather, so citibike.prepare and citibike.forecast can read it.
+#
+# Usage:
+#   python -m citibike.synthetic --rows 1000000 --out 02_Data/Synthetic/1M
+#   python -m citibike.synthetic --rows 100000000 --out /data/citibike_100M --year 2023
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+from citibike import spatial
+from citibike.ingest import CSV_COLUMNS
+from citibike.paths import DATA_DIR
+
+SYNTHETIC_DIR = DATA_DIR / "Synthetic"
+
+DEFAULT_STATIONS = 2_000
+DEFAULT_FILE_ROWS = 1_000_000
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Popularity skew: station weights follow 1 / rank ** POPULARITY_SKEW
+POPULARITY_SKEW = 0.45
+
+# Where trips end: the same station, one of the nearest stations, or anywhere by popularity
+ROUND_TRIP_SHARE = {"member": 0.02, "casual": 0.12}
+NEARBY_SHARE = 0.7
+NEARBY_STATIONS = 60
+NEARBY_SCALE_M = 2500
+
+# Riding speed in m/s along a route 1.3x the straight line
+RIDE_SPEED = {"classic_bike": 2.4, "electric_bike": 3.3}
+CASUAL_SLOWDOWN = 0.75
+DETOUR = 1.3
+
+# Shares of invalid trips (see citibike.clean.REJECT_REASONS)
+INVALID_SHARES = {"negative_duration": 0.0004, "over_24h": 0.0002, "missing_end": 0.001}
+
+# Manhattan runs from about (40.700, -74.015) to (40.820, -73.945)
+MANHATTAN = {"lat": (40.700, 40.820), "lng": (-74.015, -73.945), "width": 0.012}
+OUTER_BOROUGHS = {"lat": (40.640, 40.770), "lng": (-74.000, -73.900)}
+
+STREETS = [f"{n} St" for n in range(1, 160)] + [f"W {n} St" for n in range(1, 160)] + [f"E {n} St" for n in range(1, 160)]
+AVENUES = ["1 Ave", "2 Ave", "3 Ave", "Lexington Ave", "Park Ave", "Madison Ave", "5 Ave", "6 Ave", "7 Ave",
+           "8 Ave", "9 Ave", "10 Ave", "11 Ave", "12 Ave", "Broadway", "Amsterdam Ave", "Columbus Ave",
+           "West End Ave", "Riverside Dr", "Central Park West", "Atlantic Ave", "Flatbush Ave", "Bedford Ave",
+           "Nostrand Ave", "Myrtle Ave", "DeKalb Ave", "Fulton St", "Court St", "Smith St", "Vernon Blvd",
+           "Jackson Ave", "Queens Blvd", "Metropolitan Ave", "Grand St", "Kent Ave", "Wythe Ave"]
+
+################################################ Stations ################################################
+
+## Station names, ids, coordinates and popularity
+# ---------------------------------------------------------
+def make_stations(n=DEFAULT_STATIONS, seed=0):
+    rng = np.random.default_rng([seed, 1])
+    in_manhattan = rng.random(n) < 0.6
+
+    # Manhattan: along its axis, with a little width; the rest over Brooklyn / Queens
+    along = rng.random(n)
+    lat = np.where(
+        in_manhattan,
+        MANHATTAN["lat"][0] + along * np.diff(MANHATTAN["lat"])[0],
+        rng.uniform(*OUTER_BOROUGHS["lat"], n),
+    )
+    lng = np.where(
+        in_manhattan,
+        MANHATTAN["lng"][0] + along * np.diff(MANHATTAN["lng"])[0] + rng.uniform(-1, 1, n) * MANHATTAN["width"],
+        rng.uniform(*OUTER_BOROUGHS["lng"], n),
+    )
+
+    # Unique "street & avenue" names and "NNNN.NN" ids
+    pairs = rng.choice(len(STREETS) * len(AVENUES), n, replace=False)
+    names = [f"{STREETS[p // len(AVENUES)]} & {AVENUES[p % len(AVENUES)]}" for p in pairs]
+    ids = rng.choice(np.arange(200_000, 900_000), n, replace=False)
+
+    # Zipf-like popularity, busier in Manhattan
+    popularity = 1 / rng.permutation(np.arange(1, n + 1)) ** POPULARITY_SKEW
+    popularity *= np.where(in_manhattan, 1.5, 1.0)
+
+    return pd.DataFrame({
+        "station_id": np.arange(n),
+        "station_name": names,
+        "csv_id": [f"{i // 100}.{i % 100:02d}" for i in ids],
+        "lat": lat.round(6),
+        "lng": lng.round(6),
+        "popularity": popularity / popularity.sum(),
+    })
+
+
+## The nearest stations of every station and the chance of ending there
+# ---------------------------------------------------------
+# Weighted by popularity and falling off with distance; rows sum to 1.
+def nearby_table(stations, k=NEARBY_STATIONS):
+    index = spatial.build_index(stations)
+    near = spatial.nearest(index, stations["lat"], stations["lng"], k=k, exclude_self=True)
+    rank = near.groupby("query").cumcount()
+    positions = np.zeros((len(stations), k), dtype="int64")
+    weights = np.zeros((len(stations), k))
+    positions[near["query"], rank] = near["station_id"]
+    weights[near["query"], rank] = (
+        stations["popularity"].to_numpy()[near["station_id"]] * np.exp(-near["distance_m"] / NEARBY_SCALE_M)
+    )
+    return positions, np.cumsum(weights, axis=1) / weights.sum(axis=1, keepdims=True)
+
+################################################ Weather and Volume ################################################
+
+## Daily weather: seasonal temperature in °C (about 2 in January, 24 in July) with day-to-day persistence, and precipitation
+# ---------------------------------------------------------
+def make_weather(start, end, seed=0):
+    rng = np.random.default_rng([seed, 2])
+    dates = pd.date_range(start, end, freq="D")
+    day_of_year = dates.dayofyear.to_numpy()
+    seasonal = 13 - 11 * np.cos(2 * np.pi * (day_of_year - 18) / 365.25)
+
+    # AR(1) anomalies: warm and cold spells last a few days
+    shocks = rng.normal(0, 2.5, len(dates))
+    anomaly = np.zeros(len(dates))
+    for i in range(1, len(dates)):
+        anomaly[i] = 0.7 * anomaly[i - 1] + shocks[i]
+
+    wet = rng.random(len(dates)) < 0.32
+    return pd.DataFrame({
+        "date": dates,
+        "avgTemp": (seasonal + anomaly).round(1),
+        "precipitation": np.where(wet, rng.exponential(9.0, len(dates)), 0.0).round(1),
+    })
+
+
+## Share of all rides taken on each day
+# ---------------------------------------------------------
+def daily_shares(weather):
+    temperature = weather["avgTemp"].to_numpy()
+    weekend = weather["date"].dt.weekday.to_numpy() >= 5
+    volume = np.exp(0.045 * (np.minimum(temperature, 27) - 13))
+    volume *= np.where(weekend, 0.85, 1.0)
+    volume *= np.exp(-1.2 * np.minimum(weather["precipitation"].to_numpy() / 25, 1.0))
+    return volume / volume.sum()
+
+
+## Trips per day: the total split over the days, exactly
+# ---------------------------------------------------------
+def daily_counts(rows, weather, seed=0):
+    rng = np.random.default_rng([seed, 3])
+    return pd.Series(rng.multinomial(rows, daily_shares(weather)), index=weather["date"])
+
+################################################ Trips ################################################
+
+## Seconds after midnight, by rider type
+# ---------------------------------------------------------
+# Members: morning and evening commute peaks over a daytime base; casual riders: afternoons.
+def start_seconds(rng, member):
+    n = len(member)
+    peak = rng.random(n)
+    member_hours = np.where(
+        peak < 0.25, rng.normal(8.3, 1.1, n),
+        np.where(peak < 0.6, rng.normal(17.8, 1.4, n), rng.uniform(6, 23.5, n)),
+    )
+    casual_hours = rng.normal(15.0, 3.6, n)
+    hours = np.where(member, member_hours, casual_hours)
+    return (hours * 3600).astype("int64") % 86_400
+
+
+## Trip duration in seconds from the distance, the bike and the rider
+# ---------------------------------------------------------
+def trip_seconds(rng, distance_m, electric, member, round_trip):
+    speed = np.where(electric, RIDE_SPEED["electric_bike"], RIDE_SPEED["classic_bike"])
+    speed = speed * np.where(member, 1.0, CASUAL_SLOWDOWN)
+    riding = distance_m * DETOUR / speed * rng.lognormal(0, 0.25, len(distance_m))
+    loop = rng.lognormal(np.log(np.where(member, 900, 1800)), 0.7)
+    return (np.where(round_trip, loop, riding) + rng.uniform(30, 150, len(distance_m))).astype("int64")
+
+
+def ride_ids(rng, n):
+    return np.frombuffer(rng.bytes(8 * n).hex().upper().encode(), dtype="S16").astype(str)
+
+
+def format_times(epoch_ms):
+    return pc.strftime(pa.array(epoch_ms, type=pa.timestamp("ms")), format="%Y-%m-%d %H:%M:%S")
+
+
+## One chunk of trips (days: the day of each trip, as epoch days)
+# ---------------------------------------------------------
+# temperature holds each trip's day temperature, for the seasonal casual share.
+def make_trips(rng, days, temperature, stations, nearby):
+    n = len(days)
+    member = rng.random(n) >= np.clip(0.08 + 0.011 * (temperature - 4), 0.05, 0.35)
+    electric = rng.random(n) < 0.35
+    rideable = np.where(electric, "electric_bike", np.where(~member & (rng.random(n) < 0.03), "docked_bike", "classic_bike"))
+
+    # Start by popularity; end at the same station, a nearby one, or anywhere by popularity
+    cumulative = np.cumsum(stations["popularity"].to_numpy())
+    start = np.minimum(np.searchsorted(cumulative, rng.random(n)), len(stations) - 1)
+    round_trip = rng.random(n) < np.where(member, ROUND_TRIP_SHARE["member"], ROUND_TRIP_SHARE["casual"])
+    near_positions, near_cumulative = nearby
+    pick = (near_cumulative[start] < rng.random(n)[:, None]).sum(axis=1).clip(max=near_positions.shape[1] - 1)
+    anywhere = np.minimum(np.searchsorted(cumulative, rng.random(n)), len(stations) - 1)
+    end = np.where(round_trip, start, np.where(rng.random(n) < NEARBY_SHARE, near_positions[start, pick], anywhere))
+
+    lat, lng = stations["lat"].to_numpy(), stations["lng"].to_numpy()
+    origin = spatial.plane_origin(stations["lat"], stations["lng"])
+    x, y = spatial.project(lat, lng, origin)
+    distance = np.hypot(x[end] - x[start], y[end] - y[start])
+
+    started = days * 86_400_000 + start_seconds(rng, member) * 1000 + rng.integers(0, 1000, n)
+    duration_ms = trip_seconds(rng, distance, electric, member, round_trip) * 1000 + rng.integers(0, 1000, n)
+
+    # Invalid trips
+    kind = rng.random(n)
+    negative = kind < INVALID_SHARES["negative_duration"]
+    too_long = (kind >= INVALID_SHARES["negative_duration"]) & (kind < INVALID_SHARES["negative_duration"] + INVALID_SHARES["over_24h"])
+    no_end = rng.random(n) < INVALID_SHARES["missing_end"]
+    duration_ms = np.where(negative, -rng.integers(1_000, 600_000, n), duration_ms)
+    duration_ms = np.where(too_long, rng.integers(86_401_000, 5 * 86_400_000, n), duration_ms)
+
+    # E-bike positions are GPS readings near the dock
+    jitter = np.where(electric, 0.0002, 0.0)
+    names, csv_ids = stations["station_name"].to_numpy(), stations["csv_id"].to_numpy()
+    end_lat = np.where(no_end, np.nan, (lat[end] + rng.normal(0, 1, n) * jitter).round(6))
+    end_lng = np.where(no_end, np.nan, (lng[end] + rng.normal(0, 1, n) * jitter).round(6))
+
+    table = pa.table({
+        "ride_id": ride_ids(rng, n),
+        "rideable_type": rideable,
+        "started_at": format_times(started),
+        "ended_at": format_times(started + duration_ms),
+        "start_station_name": names[start],
+        "start_station_id": csv_ids[start],
+        "end_station_name": pa.array(names[end], mask=no_end),
+        "end_station_id": pa.array(csv_ids[end], mask=no_end),
+        "start_lat": (lat[start] + rng.normal(0, 1, n) * jitter).round(6),
+        "start_lng": (lng[start] + rng.normal(0, 1, n) * jitter).round(6),
+        "end_lat": pa.array(end_lat, mask=no_end),
+        "end_lng": pa.array(end_lng, mask=no_end),
+        "member_casual": np.where(member, "member", "casual"),
+    })
+    return table.select(CSV_COLUMNS)
+
+################################################ Writing ################################################
+
+## The weather file of a generated folder: <folder>_weather_df.csv next to it
+# ---------------------------------------------------------
+# Kept out of the folder itself, which holds only the monthly trip files the ingest reads.
+def weather_path(out_dir):
+    out_dir = Path(out_dir)
+    return out_dir.parent / f"{out_dir.name}_weather_df.csv"
+
+
+## Write one month as parts of at most file_rows rows ("202207-citibike-tripdata_1.csv", ...)
+# ---------------------------------------------------------
+# Trips are sorted by start time within each chunk, and chunks follow the calendar.
+def write_month(out_dir, year, month, counts, weather, stations, nearby, rng, file_rows=DEFAULT_FILE_ROWS,
+                chunk_rows=DEFAULT_CHUNK_ROWS):
+    month_counts = counts[(counts.index.year == year) & (counts.index.month == month)]
+    epoch_days = ((month_counts.index - pd.Timestamp("1970-01-01")) // pd.Timedelta(days=1)).to_numpy()
+    days = np.repeat(epoch_days, month_counts.to_numpy())
+    temperature = np.repeat(weather.set_index("date").loc[month_counts.index, "avgTemp"].to_numpy(),
+                            month_counts.to_numpy())
+
+    paths = []
+    for part, part_start in enumerate(range(0, len(days), file_rows), start=1):
+        path = Path(out_dir) / f"{year}{month:02d}-citibike-tripdata_{part}.csv"
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        part_end = min(part_start + file_rows, len(days))
+        writer = None
+        for start in range(part_start, part_end, chunk_rows):
+            stop = min(start + chunk_rows, part_end)
+            trips = make_trips(rng, days[start:stop], temperature[start:stop], stations, nearby).sort_by("started_at")
+            writer = writer or pv.CSVWriter(tmp_path, trips.schema)
+            writer.write_table(trips)
+        writer.close()
+        tmp_path.replace(path)
+        paths.append(path)
+    return paths
+
+
+## Write a year (or the given months) of trips and its weather
+# ---------------------------------------------------------
+# Returns the trip files written.
+def generate(out_dir, rows, year=2022, months=None, seed=0, n_stations=DEFAULT_STATIONS, file_rows=DEFAULT_FILE_ROWS,
+             chunk_rows=DEFAULT_CHUNK_ROWS, log=print):
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    months = sorted(months or range(1, 13))
+
+    stations = make_stations(n_stations, seed)
+    nearby = nearby_table(stations)
+    weather = make_weather(f"{year}-01-01", f"{year}-12-31", seed)
+    weather = weather[weather["date"].dt.month.isin(months)].reset_index(drop=True)
+    counts = daily_counts(rows, weather, seed)
+    weather.to_csv(weather_path(out_dir), index=False, date_format="%Y-%m-%d")
+
+    paths = []
+    for month in months:
+        started = time.perf_counter()
+        rng = np.random.default_rng([seed, 4, year, month])
+        month_paths = write_month(out_dir, year, month, counts, weather, stations, nearby, rng, file_rows, chunk_rows)
+        paths += month_paths
+        log(f"{year}-{month:02d}: {len(month_paths)} file(s) in {time.perf_counter() - started:.1f} s")
+    return paths
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Write seeded synthetic Citi Bike trip CSVs.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Trips in total (e.g. 1000000, 10000000, 100000000)")
+    parser.add_argument("--out", help="Output folder (default: 02_Data/Synthetic/<rows>)")
+    parser.add_argument("--year", type=int, default=2022)
+    parser.add_argument("--months", type=int, nargs="*", help="Only these months (default: all 12)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stations", type=int, default=DEFAULT_STATIONS)
+    parser.add_argument("--file-rows", type=int, default=DEFAULT_FILE_ROWS, help="Rows per CSV part")
+    args = parser.parse_args()
+
+    out_dir = args.out or SYNTHETIC_DIR / str(args.rows)
+    started = time.perf_counter()
+    paths = generate(out_dir, args.rows, args.year, args.months, args.seed, args.stations, args.file_rows)
+    size_mb = sum(path.stat().st_size for path in paths) / 1e6
+    print(f"{args.rows:,} trips in {len(paths)} files ({size_mb:,.0f} MB) in {time.perf_counter() - started:.1f} s; "
+          f"weather: {weather_path(out_dir)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+################################################ CitiBike Ride / Weather Time Series ################################################
+
+# Multi-resolution series behind the Daily Rides vs Weather chart.
+#
+# Rides and temperature are rolled up once to hour / day / week / month buckets (hourly rides
+# come from the ride cube, days from daily_sub_df). A chart view picks the finest resolution
+# that has at most a few times max_points buckets in the visible range, slices it by date with
+# a binary search on the sorted bucket times and by season with a precomputed code column, and
+# then downsamples with Largest-Triangle-Three-Buckets (LTTB), which keeps peaks and dips.
+# The chart payload stays at max_points per trace whether the range is one week or ten years.
+#
+# Usage:
+#   python -m citibike.timeseries          (build 02_Data/Prepared_Data/rides_timeseries.parquet)
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from citibike.cube import SEASON_CODE_BY_MONTH, SEASONS
+from citibike.paths import PREPARED_DIR
+
+TIMESERIES_PATH = PREPARED_DIR / "rides_timeseries.parquet"
+
+# Finest to coarsest, with the pandas period used to bucket days
+RESOLUTIONS = ["hour", "day", "week", "month"]
+PERIODS = {"week": "W", "month": "M"}
+
+MAX_POINTS = 2000
+
+# A resolution is used when its bucket count is within this factor of max_points (LTTB does the rest)
+OVERSAMPLE = 4
+
+SERIES_COLUMNS = ["time", "rides", "avgTemp", "season"]
+
+################################################ Building ################################################
+
+## Season code (cube.SEASONS order) of each bucket start
+# ---------------------------------------------------------
+def season_codes(times):
+    return SEASON_CODE_BY_MONTH[pd.DatetimeIndex(times).month.to_numpy()]
+
+
+## Hourly rides (from the cube's daily_hourly rollup) with the day's temperature
+# ---------------------------------------------------------
+def hourly_series(ride_cube, daily):
+    hourly = ride_cube["daily_hourly"].groupby(["date", "hour"], as_index=False)["rides"].sum()
+    hourly = hourly.merge(daily[["date", "avgTemp"]], on="date", how="left")
+    hourly["time"] = hourly["date"] + pd.to_timedelta(hourly["hour"], unit="h")
+    return hourly.sort_values("time")[["time", "rides", "avgTemp"]]
+
+
+## Every resolution: one frame per resolution, sorted by bucket time
+# ---------------------------------------------------------
+def build_series(daily, ride_cube=None):
+    day = pd.DataFrame({
+        "time": daily["date"].to_numpy(),
+        "rides": daily["bike_rides_daily"].to_numpy(),
+        "avgTemp": daily["avgTemp"].to_numpy(),
+    }).sort_values("time", ignore_index=True)
+
+    series = {"day": day}
+    if ride_cube is not None:
+        series["hour"] = hourly_series(ride_cube, daily)
+    for resolution, period in PERIODS.items():
+        bucket = day["time"].dt.to_period(period).dt.start_time.rename("time")
+        grouped = day.groupby(bucket)
+        # A bucket with no ride counts at all (weather only) stays blank rather than zero
+        series[resolution] = pd.DataFrame({
+            "rides": grouped["rides"].sum(min_count=1),
+            "avgTemp": grouped["avgTemp"].mean(),
+        }).reset_index()
+
+    for resolution, frame in series.items():
+        frame = frame.reset_index(drop=True).astype({"rides": "float64", "avgTemp": "float64"})
+        frame["time"] = frame["time"].astype("datetime64[ns]")
+        frame["season"] = season_codes(frame["time"])
+        series[resolution] = frame[SERIES_COLUMNS]
+    return series
+
+
+## Store all resolutions in one file (a resolution column tells them apart)
+# ---------------------------------------------------------
+# Rows are grouped in RESOLUTIONS order, so each resolution is one contiguous run of rows.
+def write_series(series, path=TIMESERIES_PATH):
+    frames = [series[resolution].assign(resolution=resolution) for resolution in RESOLUTIONS if resolution in series]
+    pd.concat(frames, ignore_index=True).to_parquet(path, index=False)
+
+
+def read_series(path=TIMESERIES_PATH):
+    return split_series(pd.read_parquet(path))
+
+
+## One frame per resolution, sliced out of the stored table
+# ---------------------------------------------------------
+# Each resolution's rows are found by binary search on its rank and taken as a row range, so
+# the frames are views of the table (of the mapped pages when read from citibike.store).
+# A table written in another order is sorted first.
+def split_series(table):
+    rank = pd.Index(RESOLUTIONS).get_indexer(table["resolution"])
+    if (np.diff(rank) < 0).any():
+        order = np.argsort(rank, kind="stable")
+        table, rank = table.iloc[order], rank[order]
+    bounds = np.searchsorted(rank, np.arange(len(RESOLUTIONS) + 1))
+    return {
+        resolution: table.iloc[start:stop][SERIES_COLUMNS].reset_index(drop=True)
+        for resolution, start, stop in zip(RESOLUTIONS, bounds[:-1], bounds[1:]) if stop > start
+    }
+
+################################################ Downsampling ################################################
+
+## Largest-Triangle-Three-Buckets: keep n_out points that preserve the visual shape
+# ---------------------------------------------------------
+# The first and last points are kept; every bucket in between contributes the point forming
+# the largest triangle with the previous pick and the next bucket's mean. NaN values are skipped.
+def lttb(x, y, n_out):
+    x, y = np.asarray(x, dtype="float64"), np.asarray(y, dtype="float64")
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= n_out or n_out < 3:
+        return valid
+    xv, yv = x[valid], y[valid]
+
+    edges = np.linspace(1, len(xv) - 1, n_out - 1).astype("int64")
+    picked = np.empty(n_out, dtype="int64")
+    picked[0], picked[-1] = 0, len(xv) - 1
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = edges[i + 1], edges[i + 2] if i + 2 < len(edges) else len(xv)
+        next_x, next_y = xv[next_lo:next_hi].mean(), yv[next_lo:next_hi].mean()
+        prev = picked[i]
+        area = np.abs((xv[prev] - next_x) * (yv[lo:hi] - yv[prev]) - (xv[prev] - xv[lo:hi]) * (next_y - yv[prev]))
+        picked[i + 1] = lo + int(np.argmax(area))
+    return valid[picked]
+
+
+## Min/max buckets: the lowest and highest point of every bucket (cheaper, keeps extremes)
+# ---------------------------------------------------------
+def minmax_buckets(y, n_out):
+    y = np.asarray(y, dtype="float64")
+    valid = np.flatnonzero(~np.isnan(y))
+    if len(valid) <= n_out:
+        return valid
+    buckets = np.array_split(valid, max(n_out // 2, 1))
+    picks = [bucket[[np.argmin(y[bucket]), np.argmax(y[bucket])]] for bucket in buckets]
+    return np.unique(np.concatenate(picks))
+
+################################################ Chart Views ################################################
+
+## Row range of the buckets starting in [start, stop) (bucket times are sorted)
+# ---------------------------------------------------------
+def visible(frame, start, stop):
+    return np.searchsorted(frame["time"].to_numpy(), [np.datetime64(start), np.datetime64(stop)])
+
+
+## Finest resolution that covers [start, stop) with a manageable number of buckets
+# ---------------------------------------------------------
+# Coverage matters for the hourly rides, which only exist for the months in the ride cube.
+def pick_resolution(series, start, stop, max_points=MAX_POINTS):
+    available = [resolution for resolution in RESOLUTIONS if resolution in series]
+    for resolution in available[:-1]:
+        times = series[resolution]["time"]
+        covers = len(times) and times.iloc[0] <= start and times.iloc[-1] >= stop - pd.Timedelta(days=1)
+        lo, hi = visible(series[resolution], start, stop)
+        if covers and hi - lo <= max_points * OVERSAMPLE:
+            return resolution
+    return available[-1]
+
+
+## Rides and temperature for the visible range and seasons, at most max_points per trace
+# ---------------------------------------------------------
+# start and end are dates (end included). Returns (rides, temperature, resolution); each
+# frame has time and value columns.
+def chart_view(series, start=None, end=None, seasons=None, max_points=MAX_POINTS, method="lttb"):
+    days = series["day"]["time"]
+    start = days.iloc[0] if start is None else pd.Timestamp(start)
+    stop = (days.iloc[-1] if end is None else pd.Timestamp(end)) + pd.Timedelta(days=1)
+
+    resolution = pick_resolution(series, start, stop, max_points)
+    frame = series[resolution]
+    lo, hi = visible(frame, start, stop)
+    frame = frame.iloc[lo:hi]
+    if seasons is not None:
+        frame = frame[frame["season"].isin([SEASONS.index(season) for season in seasons]).to_numpy()]
+
+    times = frame["time"].to_numpy()
+    views = []
+    for col in ["rides", "avgTemp"]:
+        values = frame[col].to_numpy()
+        if method == "minmax":
+            keep = minmax_buckets(values, max_points)
+        else:
+            keep = lttb(times.astype("int64"), values, max_points)
+        views.append(pd.DataFrame({"time": times[keep], "value": values[keep]}))
+    return views[0], views[1], resolution
+
+################################################ Command Line ################################################
+
+def main():
+    # Imported here: citibike.data itself loads the stored series through this module
+    from citibike.data import load_cube, load_daily
+
+    parser = argparse.ArgumentParser(description="Build the multi-resolution ride / weather series.")
+    parser.add_argument("--out", default=TIMESERIES_PATH, help="Output Parquet file")
+    args = parser.parse_args()
+
+    series = build_series(load_daily(), load_cube())
+    write_series(series, args.out)
+    print(", ".join(f"{resolution}: {len(frame):,} points" for resolution, frame in series.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+################################################ CitiBike NOAA Weather ################################################
+
+# Daily weather from the NOAA Climate Data Online (CDO) v2 API, for any date range and any
+# set of GHCND datatypes (TAVG, TMAX, TMIN, PRCP, SNOW), replacing the single request in
+# Exercise 2.2.
+#
+#   - the range is split into windows of at most one year (the API's limit) and every window
+#     is paged through with offset/limit until the result set is exhausted
+#   - every page is cached on disk as JSON, keyed by a hash of the request, so rebuilding the
+#     ride/weather join never has to hit the network again; offline=True only reads the cache
+#   - pages are parsed in one vectorized pass into a typed frame, one row per date
+#
+# The token is read from the NOAA_TOKEN environment variable. base_url can point to a local
+# fixture server that answers the same requests.
+#
+# Usage:
+#   python -m citibike.weather --start 2022-01-01 --end 2023-12-31
+#   python -m citibike.weather --start 2022-01-01 --end 2022-12-31 --offline
+
+import argparse
+import hashlib
+import json
+import os
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+import pandas as pd
+
+from citibike.paths import DATA_DIR, PREPARED_DIR
+
+BASE_URL = "https://www.ncdc.noaa.gov/cdo-web/api/v2/data"
+
+# LaGuardia Airport, the station used in Exercise 2.2
+DEFAULT_STATION = "GHCND:USW00014732"
+
+DATATYPES = ["TAVG", "TMAX", "TMIN", "PRCP", "SNOW"]
+
+# GHCND raw units -> output column and divisor (temperatures and rain come in tenths)
+COLUMNS = {
+    "TAVG": ("avgTemp", 10.0),
+    "TMAX": ("maxTemp", 10.0),
+    "TMIN": ("minTemp", 10.0),
+    "PRCP": ("precipitation", 10.0),
+    "SNOW": ("snow", 1.0),
+}
+
+PAGE_LIMIT = 1000
+
+WEATHER_CACHE_DIR = DATA_DIR / "Weather_Cache"
+WEATHER_PATH = PREPARED_DIR / "weather_df.csv"
+
+
+# Raised when a request is not in the cache and the client is offline
+class OfflineCacheMiss(LookupError):
+    pass
+
+################################################ Requests and Cache ################################################
+
+## Split [start, end] into windows of at most one calendar year
+# ---------------------------------------------------------
+def year_windows(start, end):
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    windows = []
+    while start <= end:
+        window_end = min(end, pd.Timestamp(year=start.year, month=12, day=31))
+        windows.append((start.strftime("%Y-%m-%d"), window_end.strftime("%Y-%m-%d")))
+        start = window_end + pd.Timedelta(days=1)
+    return windows
+
+
+## Cache file for one request (the hash does not depend on the token or the parameter order)
+# ---------------------------------------------------------
+def cache_path(params, cache_dir=WEATHER_CACHE_DIR):
+    key = json.dumps(sorted(params.items()), separators=(",", ":"))
+    return Path(cache_dir) / f"{hashlib.sha256(key.encode()).hexdigest()[:24]}.json"
+
+
+## One page of results, from the cache or the API
+# ---------------------------------------------------------
+def fetch_page(params, base_url=BASE_URL, cache_dir=WEATHER_CACHE_DIR, offline=False, token=None, timeout=60):
+    path = cache_path(params, cache_dir)
+    if path.exists():
+        return json.loads(path.read_text())
+    if offline:
+        raise OfflineCacheMiss(f"Not cached and offline: {params}")
+
+    token = token or os.environ.get("NOAA_TOKEN")
+    if token is None and base_url == BASE_URL:
+        raise RuntimeError("Set NOAA_TOKEN (or pass token=) to query the NOAA API")
+    url = f"{base_url}?{urllib.parse.urlencode(params)}"
+    request = urllib.request.Request(url, headers={"token": token} if token else {})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        page = json.loads(response.read())
+
+    # Written under a temporary name so an interrupted run never caches half a page
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".json.tmp")
+    tmp_path.write_text(json.dumps(page))
+    tmp_path.replace(path)
+    return page
+
+
+## Every result for a date range, paging through each one-year window
+# ---------------------------------------------------------
+def fetch_results(start, end, datatypes=DATATYPES, station=DEFAULT_STATION, **fetch_options):
+    results = []
+    for window_start, window_end in year_windows(start, end):
+        offset = 1
+        while True:
+            params = {
+                "datasetid": "GHCND",
+                "stationid": station,
+                "datatypeid": ",".join(sorted(datatypes)),
+                "startdate": window_start,
+                "enddate": window_end,
+                "limit": PAGE_LIMIT,
+                "offset": offset,
+            }
+            page = fetch_page(params, **fetch_options)
+            page_results = page.get("results", [])
+            results.extend(page_results)
+
+            count = page.get("metadata", {}).get("resultset", {}).get("count", 0)
+            offset += len(page_results)
+            if not page_results or offset > count:
+                break
+    return results
+
+################################################ Parsing ################################################
+
+## API results -> one row per date, one float column per datatype
+# ---------------------------------------------------------
+def parse_results(results, datatypes=DATATYPES):
+    columns = ["date"] + [COLUMNS[datatype][0] for datatype in datatypes]
+    if not results:
+        return pd.DataFrame({col: pd.Series(dtype="datetime64[ns]" if col == "date" else "float64")
+                             for col in columns})
+
+    raw = pd.DataFrame.from_records(results, columns=["date", "datatype", "value"])
+    raw = raw[raw["datatype"].isin(datatypes)]
+    raw["date"] = pd.to_datetime(raw["date"], format="%Y-%m-%dT%H:%M:%S")
+    raw["value"] = raw["value"].astype("float64") / raw["datatype"].map({d: COLUMNS[d][1] for d in datatypes})
+
+    weather = raw.pivot_table(index="date", columns="datatype", values="value", aggfunc="first")
+    weather = weather.reindex(columns=datatypes).rename(columns={d: COLUMNS[d][0] for d in datatypes})
+    return weather.rename_axis(columns=None).reset_index()[columns]
+
+
+## Daily weather for a date range
+# ---------------------------------------------------------
+def load_noaa_weather(start, end, datatypes=DATATYPES, station=DEFAULT_STATION, **fetch_options):
+    return parse_results(fetch_results(start, end, datatypes, station, **fetch_options), datatypes)
+
+################################################ Command Line ################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Download (or read from the cache) daily NOAA weather.")
+    parser.add_argument("--start", required=True, help="First date (YYYY-MM-DD)")
+    parser.add_argument("--end", required=True, help="Last date (YYYY-MM-DD)")
+    parser.add_argument("--station", default=DEFAULT_STATION)
+    parser.add_argument("--datatypes", nargs="*", default=DATATYPES, choices=DATATYPES)
+    parser.add_argument("--base-url", default=BASE_URL, help="API endpoint (e.g. a local fixture server)")
+    parser.add_argument("--cache", default=WEATHER_CACHE_DIR, help="Response cache folder")
+    parser.add_argument("--offline", action="store_true", help="Only read cached responses")
+    parser.add_argument("--out", default=WEATHER_PATH, help="Output CSV")
+    args = parser.parse_args()
+
+    weather = load_noaa_weather(
+        args.start, args.end, args.datatypes, args.station,
+        base_url=args.base_url, cache_dir=args.cache, offline=args.offline,
+    )
+    weather.to_csv(args.out, index=False, date_format="%Y-%m-%d")
+    print(f"Wrote {len(weather):,} days of weather to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
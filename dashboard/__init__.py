@@ -0,0 +1,115 @@
+################################################ CitiBike Dashboard Pages ################################################
+
+# The pages of CitiBike_dashboard_Part2.py, one module each, and what they share.
+#
+# PAGES maps the sidebar title of every page to its module. A page module is imported the
+# first time its page is opened (load_page), so its heavy imports (plotly, pydeck, pandas, the
+# citibike query layer) and its data are only paid for by the pages a visitor actually opens;
+# the Overview page needs none of them. Every module has a render() function that draws the
+# page on each rerun.
+#
+# cached_view keeps what a page computed and drew (figures, decks, tables) per filter
+# combination, for every session of the process, so a rerun with filters seen before skips
+# the queries and the figure building. An entry is only reused while the data it was built
+# from is the same object: the citibike.data loaders hand out one object per file until the
+# file changes, so a rebuilt artifact invalidates the views drawn from it.
+#
+# Usage:
+#   streamlit run CitiBike_dashboard_Part2.py
+
+import importlib
+import io
+import threading
+from collections import OrderedDict
+from datetime import datetime as dt
+from functools import lru_cache
+from pathlib import Path
+
+## Sidebar title -> page module (in sidebar order)
+# ---------------------------------------------------------
+PAGES = {
+    "Overview": "dashboard.overview",
+    "Daily Rides vs Weather": "dashboard.daily",
+    "Trip Duration": "dashboard.duration",
+    "Top Stations": "dashboard.top_stations",
+    "Trip Hotspots": "dashboard.hotspots",
+    "Station Density": "dashboard.density",
+    "Station Rebalancing": "dashboard.rebalancing",
+    "Insights & Recommendations": "dashboard.insights",
+}
+
+# Views kept across reruns and sessions (oldest dropped first)
+VIEW_CACHE_SIZE = 256
+
+# Longest side of the photos sent to the browser (twice the 450 px they are shown at)
+DISPLAY_IMAGE_PX = 900
+
+_views = OrderedDict()
+_lock = threading.Lock()
+
+
+## The module of one page, imported on its first open (Python keeps it for the next reruns)
+# ---------------------------------------------------------
+def load_page(title):
+    return importlib.import_module(PAGES[title])
+
+################################################ View Cache ################################################
+
+def freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+## What build() returns, computed once per view name, filters and source objects
+# ---------------------------------------------------------
+# key: the filters (lists are fine); sources: the loaded frames the view is drawn from.
+def cached_view(name, key, sources, build):
+    cache_key = (name, freeze(key))
+    with _lock:
+        entry = _views.get(cache_key)
+        if entry is not None and len(entry["sources"]) == len(sources) and all(
+                cached is source for cached, source in zip(entry["sources"], sources)):
+            _views.move_to_end(cache_key)
+            return entry["value"]
+
+    value = build()
+    with _lock:
+        _views[cache_key] = {"sources": tuple(sources), "value": value}
+        _views.move_to_end(cache_key)
+        while len(_views) > VIEW_CACHE_SIZE:
+            _views.popitem(last=False)
+    return value
+
+
+def clear_views():
+    with _lock:
+        _views.clear()
+
+################################################ Shared Helpers ################################################
+
+## Month picker label of a period (202207 -> Jul 2022)
+# ---------------------------------------------------------
+def month_label(period):
+    return dt(period // 100, period % 100, 1).strftime("%b %Y")
+
+
+## A photo scaled down to what the page shows (JPEG bytes), once per file version
+# ---------------------------------------------------------
+# The originals are camera-sized; decoding and resizing one on every rerun costs a few hundred ms.
+def page_image(path):
+    stat = Path(path).stat()
+    return scaled_image(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=16)
+def scaled_image(path, mtime_ns, size):
+    from PIL import Image
+
+    with Image.open(path) as image:
+        image.draft("RGB", (DISPLAY_IMAGE_PX, DISPLAY_IMAGE_PX))
+        image = image.convert("RGB")
+        image.thumbnail((DISPLAY_IMAGE_PX, DISPLAY_IMAGE_PX))
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
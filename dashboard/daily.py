@@ -0,0 +1,211 @@
+################################################ CitiBike NYC Daily Rides vs Temperature Chart ################################################
+
+# Daily rides against the average temperature (timeline), or each year's daily rides on a
+# common January–December axis when more than one year is loaded (compare years).
+
+import streamlit as st
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from citibike import perf, queries, timeseries
+from citibike.data import load_daily, load_timeseries
+from dashboard import cached_view
+
+## Each year's daily rides on one axis, and the yearly totals with the change from the year before
+# ---------------------------------------------------------
+def year_view(years, seasons, smooth):
+    by_year = perf.timed("compute", "daily_by_year", queries.daily_by_year, years=years, seasons=seasons)
+
+    # ---------------------------------------------------------
+    # Plot Chart (one line per year on a common January–December axis)
+    # ---------------------------------------------------------
+    with perf.span("figure", "rides_by_year"):
+        fig = go.Figure()
+        for year, rides in by_year.groupby("year"):
+            values = rides["bike_rides_daily"]
+            if smooth:
+                values = values.rolling(7, min_periods=1).mean()
+            fig.add_trace(
+                go.Scatter(
+                    x=rides["day"],
+                    y=values,
+                    name=str(year),
+                    customdata=rides["date"].dt.strftime("%b %d, %Y"),
+                    hovertemplate="%{customdata}: %{y:,.0f} rides<extra></extra>"
+                )
+            )
+        fig.update_layout(
+            title="Daily CitiBike Rides by Year" + (" (7-day average)" if smooth else ""),
+            xaxis_title="Day of Year",
+            yaxis_title="Bike Rides per Day",
+            template="plotly_white",
+            height=600,
+            width=1000,
+            legend_title="Year"
+        )
+        fig.update_xaxes(tickformat="%b")
+
+    totals = by_year.groupby("year").agg(
+        days=("bike_rides_daily", "count"),
+        total_rides=("bike_rides_daily", "sum"),
+        rides_per_day=("bike_rides_daily", "mean"),
+    )
+    totals["total_rides"] = totals["total_rides"].astype("int64")
+    totals["change_vs_prior_year_%"] = (totals["rides_per_day"].pct_change() * 100).round(1)
+    return fig, totals
+
+
+## Rides and temperature over the chosen dates (the resolution follows the visible range)
+# ---------------------------------------------------------
+def timeline_figure(rides_series, date_range, seasons):
+    # At most a few thousand points per trace
+    rides_view, temp_view, resolution = perf.timed(
+        "compute", "chart_view", timeseries.chart_view,
+        rides_series,
+        start=date_range[0],
+        end=date_range[1],
+        seasons=seasons
+    )
+
+    # ---------------------------------------------------------
+    # Plot Chart
+    # ---------------------------------------------------------
+    with perf.span("figure", "rides_weather"):
+        fig = make_subplots(specs=[[{"secondary_y": True}]])
+
+        fig.add_trace(
+            go.Scatter(
+                x=rides_view["time"],
+                y=rides_view["value"],
+                name=f"Bike Rides per {resolution.capitalize()}",
+                line=dict(color="blue")
+            ),
+            secondary_y=False
+        )
+
+        fig.add_trace(
+            go.Scatter(
+                x=temp_view["time"],
+                y=temp_view["value"],
+                name="Average Temperature (°F)",
+                line=dict(color="orange")
+            ),
+            secondary_y=True
+        )
+
+        days = rides_series["day"]["time"]
+        years = sorted({days.iloc[0].year, days.iloc[-1].year})
+        fig.update_layout(
+            title=f"CitiBike Rides per {resolution.capitalize()} and Temperature in NYC ({'–'.join(map(str, years))})",
+            xaxis_title="Date",
+            template="plotly_white",
+            height=600,
+            width=1000,
+            legend_title="Metrics"
+        )
+
+        fig.update_yaxes(title_text=f"Bike Rides per {resolution.capitalize()}", secondary_y=False)
+        fig.update_yaxes(title_text="Temperature (°F)", secondary_y=True)
+    return fig
+
+
+## Dual-Axis Chart
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE (matches Overview styling)
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='
+                text-align:center;
+                font-size:46px;
+                margin-top:0px;
+                margin-bottom:10px;
+            '>
+                Daily Rides vs Weather
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    # --------------------------------
+    # INSIGHTS
+    # --------------------------------
+    st.markdown("""
+
+    The dual‑axis chart below shows a strong seasonal relationship between temperature and Citi Bike ridership. 
+    Warmer days consistently have higher ride volume, while colder seasons see a predictable decline. This pattern 
+    is especially visible from March through September, when rising temperatures coincide with a steady increase 
+    in daily rides.
+
+    CitiBike's peak ridership occurs during the late summer and early fall, with September showing both some of 
+    the highest daily peaks and some unusually low days, suggesting weather patterns are unpredictable during 
+    this time. As temperatures fall and daylight decreases in November, daily ridership drops sharply, reflecting 
+    the seasonal shift toward colder, shorter, and more unpredictable days.
+
+    Overall, the chart highlights a clear correlation: as temperatures rise, ridership increases, and as temperatures 
+    fall, ridership declines. This seasonal pattern is a crucial variable in understanding CitiBike's demand and 
+    planning bike availability throughout the year.
+
+    NOTE: Use the "Filter by Season" section in the sidebar to navigate various seasons.
+    """)
+
+    daily_df = perf.timed("load", "daily", load_daily)
+
+    # Multi-resolution ride / weather series (hourly when built from the cube; day/week/month otherwise)
+    rides_series = perf.timed("load", "timeseries", load_timeseries) or cached_view(
+        "rides_series", (), [daily_df], lambda: timeseries.build_series(daily_df)
+    )
+
+    # ---------------------------------------------------------
+    # Seasonal Filter
+    # ---------------------------------------------------------
+    season_options = ["All"] + list(daily_df['season'].unique())
+
+    st.sidebar.markdown("### Filter by Season")
+    season_filter = st.sidebar.multiselect(
+        label="Select season(s)",
+        options=season_options,
+        default=["All"]
+    )
+
+    # Year-over-year view (only offered when more than one year has been ingested)
+    ride_years = cached_view("ride_years", (), [daily_df], queries.available_years)
+    daily_view = "Timeline"
+    if len(ride_years) > 1:
+        daily_view = st.sidebar.radio("View", ["Timeline", "Compare years"])
+
+    if daily_view == "Compare years":
+        compare_years = st.sidebar.multiselect("Select year(s)", options=ride_years, default=ride_years[-2:]) or ride_years
+        smooth = st.sidebar.checkbox("7-day average", value=True)
+
+        fig, totals = cached_view(
+            "rides_by_year", (compare_years, season_filter, smooth), [daily_df],
+            lambda: year_view(compare_years, None if "All" in season_filter else season_filter, smooth)
+        )
+
+        perf.render("rides_by_year", st.plotly_chart, fig, use_container_width=True)
+
+        st.dataframe(totals.round({"rides_per_day": 0}).reset_index(), hide_index=True)
+
+    else:
+        first_day = rides_series["day"]["time"].iloc[0].date()
+        last_day = rides_series["day"]["time"].iloc[-1].date()
+        date_range = st.sidebar.slider(
+            "Date range",
+            min_value=first_day,
+            max_value=last_day,
+            value=(first_day, last_day),
+            format="MMM D, YYYY"
+        )
+
+        fig = cached_view(
+            "rides_weather", (date_range, season_filter), [rides_series],
+            lambda: timeline_figure(rides_series, date_range, None if "All" in season_filter else season_filter)
+        )
+
+        perf.render("rides_weather", st.plotly_chart, fig, use_container_width=True)
@@ -0,0 +1,158 @@
+################################################ CitiBike Station Density ################################################
+
+# Rides summed over hexagonal cells for any months, seasons and rider types (from the ride cube,
+# or by season from the hourly station flows), and the stations within walking distance of one.
+
+import streamlit as st
+import numpy as np
+import pydeck as pdk
+
+from citibike import cube, perf, spatial
+from citibike.data import load_cube, load_periods, load_station_flows
+from dashboard import cached_view, month_label
+
+## Rides per station, the station index and the hexagon map for one set of filters
+# ---------------------------------------------------------
+def density_view(ride_cube, station_flows, periods, seasons, riders, hex_size):
+    if ride_cube is not None:
+        station_rides = spatial.station_rides(
+            ride_cube,
+            periods=periods,
+            seasons=seasons,
+            riders=riders
+        )
+    else:
+        flows = station_flows["flows"]
+        if seasons:
+            season_codes = cube.SEASON_CODE_BY_MONTH[flows["hour"].dt.month.to_numpy()]
+            flows = flows[np.isin(season_codes, [cube.SEASONS.index(s) for s in seasons])]
+        station_rides = station_flows["stations"].merge(
+            flows.groupby("station_id", as_index=False)["departures"].sum().rename(columns={"departures": "rides"}),
+            on="station_id"
+        ).dropna(subset=["lat", "lng"])
+    stations = station_flows["stations"] if ride_cube is None else ride_cube["stations"]
+    station_index = cached_view("station_index", (), [stations], lambda: spatial.build_index(stations))
+
+    cells = perf.timed(
+        "compute", "hex_density", spatial.hex_density,
+        station_rides["lat"], station_rides["lng"], hex_size,
+        weights=station_rides["rides"], origin=station_index["origin"]
+    )
+    cells["fill"] = (cells["value"] / max(cells["value"].max(), 1)).map(
+        lambda share: [255, int(200 * (1 - share)), 40, int(60 + 160 * share)]
+    )
+
+    hex_layer = pdk.Layer(
+        "PolygonLayer",
+        data=cells[["polygon", "fill", "value", "stations"]],
+        get_polygon="polygon",
+        get_fill_color="fill",
+        get_line_color=[80, 80, 80, 80],
+        line_width_min_pixels=1,
+        pickable=True
+    )
+    hex_deck = pdk.Deck(
+        layers=[hex_layer],
+        initial_view_state=pdk.ViewState(latitude=40.74, longitude=-73.98, zoom=11.5),
+        tooltip={"text": "{value} rides\n{stations} stations"}
+    )
+    return station_rides, station_index, hex_deck
+
+
+## Rides per hexagon and nearby stations
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='
+                text-align:center;
+                font-size:46px;
+                margin-top:0px;
+                margin-bottom:10px;
+            '>
+                Where Is Demand Clustered?
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    st.markdown("""
+    Rides are counted at their start station and summed over hexagonal cells, so dense clusters of busy stations stand out 
+    even when no single station tops the rankings. Below the map, pick a station to see its nearest neighbours: the stations 
+    riders can be pointed to when it runs out of bikes or docks.
+
+    NOTE: Use the "Filter Density" section in the sidebar to change the months, seasons, rider types and the hexagon size.
+    """)
+
+    # Ride cube (optional): month / rider type filters; otherwise the hourly station flows (season only)
+    ride_cube = perf.timed("load", "cube", load_cube)
+    station_flows = perf.timed("load", "station_flows", load_station_flows) if ride_cube is None else None
+
+    if ride_cube is None and station_flows is None:
+        st.info("Build the ride cube first: `python -m citibike.cube`")
+    else:
+
+        # ---------------------------------------------------------
+        # Month / Season / Rider Type Filters (the cube); season only from the station flows
+        # ---------------------------------------------------------
+        st.sidebar.markdown("### Filter Density")
+        density_periods, density_riders = [], []
+        if ride_cube is not None:
+            density_periods = st.sidebar.multiselect(
+                label="Select month(s)",
+                options=load_periods(),
+                format_func=month_label
+            )
+        density_seasons = st.sidebar.multiselect(label="Select season(s)", options=cube.SEASONS)
+        if ride_cube is not None:
+            density_riders = st.sidebar.multiselect(
+                label="Select rider type(s)",
+                options=cube.RIDER_TYPES,
+                format_func=str.capitalize
+            )
+        hex_size = st.sidebar.slider("Hexagon size (m)", min_value=200, max_value=2000,
+                                     value=spatial.DEFAULT_HEX_M, step=100)
+
+        station_rides, station_index, hex_deck = cached_view(
+            "hex_density",
+            (density_periods, density_seasons, density_riders, hex_size),
+            [ride_cube["station_months"], ride_cube["stations"]] if ride_cube is not None
+            else [station_flows["flows"], station_flows["stations"]],
+            lambda: density_view(ride_cube, station_flows, density_periods or None, density_seasons or None,
+                                 density_riders or None, hex_size)
+        )
+
+        st.subheader(f"Rides per {hex_size:,} m Hexagon")
+
+        perf.render("hex_density", st.pydeck_chart, hex_deck, height=700)
+
+        # --------------------------------
+        # NEARBY STATIONS
+        # --------------------------------
+        st.subheader("Stations Nearby")
+        busiest = station_rides.sort_values("rides", ascending=False)["station_name"]
+        if busiest.empty:
+            st.info("No rides for the selected filters.")
+        else:
+            near_left, near_right = st.columns([2, 1])
+            with near_left:
+                near_station = st.selectbox("Station", options=busiest.tolist())
+            with near_right:
+                near_radius = st.slider("Walking distance (m)", min_value=100, max_value=1500, value=500, step=50)
+
+            nearby = spatial.stations_near(station_index, near_station, radius_m=near_radius)
+            if nearby.empty:
+                nearby = spatial.stations_near(station_index, near_station, k=5)
+                st.caption(f"No station within {near_radius:,} m; showing the 5 nearest.")
+            nearby = nearby.merge(station_rides[["station_id", "rides"]], on="station_id", how="left")
+            perf.render(
+                "nearby_stations", st.dataframe,
+                nearby[["station_name", "distance_m", "rides"]].round({"distance_m": 0}).fillna({"rides": 0}),
+                hide_index=True
+            )
@@ -0,0 +1,156 @@
+################################################ CitiBike NYC: Trip Duration by Rider Type (1–65 Minutes) ################################################
+
+# Trip duration by rider type: a box plot and summary drawn from the duration sketches for any
+# season filter, or the static chart and the 2022 figures when the sketches are not built.
+
+import streamlit as st
+import plotly.graph_objects as go
+
+from citibike import cube, perf, queries
+from citibike.data import load_duration_sketches
+from dashboard import cached_view
+
+## Duration statistics per rider type and their box plot (1–65 minutes)
+# ---------------------------------------------------------
+def duration_view(seasons):
+    rider_stats = perf.timed("compute", "duration_stats", queries.duration_stats, seasons=seasons)
+
+    with perf.span("figure", "duration_box"):
+        fig = go.Figure()
+        for (rider, stats), color in zip(rider_stats.items(), ["blue", "orange"]):
+            fig.add_trace(go.Box(
+                x=[rider],
+                q1=[stats["q1"]],
+                median=[stats["median"]],
+                q3=[stats["q3"]],
+                lowerfence=[stats["lowerfence"]],
+                upperfence=[stats["upperfence"]],
+                mean=[stats["mean"]],
+                name=rider,
+                marker_color=color
+            ))
+
+        fig.update_layout(
+            title="CitiBike NYC: Trip Duration by Rider Type (1–65 Minutes)",
+            xaxis_title="User Type",
+            yaxis_title="Trip Duration (minutes)",
+            showlegend=False,
+            template="plotly_white",
+            height=500
+        )
+    return rider_stats, fig
+
+
+## Box Plot
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='
+                text-align:center;
+                font-size:46px;
+                margin-top:0px;
+                margin-bottom:10px;
+            '>
+                CitiBike NYC — Trip Duration by Rider Type
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    # --------------------------------
+    # KEY INSIGHTS
+    # --------------------------------
+    st.markdown("""
+    Trip duration provides a clear look into CitiBike’s customer behavior and how different rider groups use the system. 
+    From the box plot, there is an immediate distinction between Member and Casual riders. Members tend to take shorter, 
+    more consistent trips that align with routine, purpose‑driven travel. Casual riders, on the other hand, take longer 
+    and more variable trips, reflecting leisure‑oriented behavior and more flexible travel patterns.
+
+    These differences help clarify how each group engages with the system and what types of trips they rely on CitiBike for. 
+    Together, the trip duration summary and box plot offer a concise view of how long bikes remain in use and how usage differs 
+    by rider type — an important piece of understanding overall demand and how the system is used throughout the city.
+    """)
+
+    # --------------------------------
+    # TWO-COLUMN LAYOUT
+    # --------------------------------
+    col1, col2 = st.columns([2, 1])
+
+    # Trip duration sketches (optional): live box plot and summary
+    duration_sketches = perf.timed("load", "duration_sketches", load_duration_sketches)
+    if duration_sketches is not None:
+
+        # ---------------------------------------------------------
+        # Seasonal Filter (statistics come from the merged duration sketches)
+        # ---------------------------------------------------------
+        st.sidebar.markdown("### Filter by Season")
+        duration_season_filter = st.sidebar.multiselect(
+            label="Select season(s)",
+            options=["All"] + cube.SEASONS,
+            default=["All"]
+        )
+        seasons = None if "All" in duration_season_filter or not duration_season_filter else duration_season_filter
+
+        rider_stats, fig = cached_view(
+            "duration_box", seasons, [duration_sketches], lambda: duration_view(seasons)
+        )
+
+        # Left column — Box Plot drawn from the sketch statistics
+        with col1:
+            perf.render("duration_box", st.plotly_chart, fig, use_container_width=True)
+
+        # Right column — Summary per rider type
+        with col2:
+            st.markdown(
+                """
+                <div style='text-align:center; margin-bottom:10px;'>
+                    <h2 style='margin-bottom:2px;'>Trip Duration Summary</h2>
+                    <p style='font-size:18px; margin-top:0px; color:#555;'>(1–65 Minutes)</p>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+            for rider, stats in rider_stats.items():
+                st.markdown(f"""
+**{rider}** ({stats["count"]:,} trips)
+- **Median trip duration:** {stats["median"]:.1f} minutes  
+- **Average trip duration:** {stats["mean"]:.1f} minutes  
+- **Middle 50% of trips:** {stats["q1"]:.1f}–{stats["q3"]:.1f} minutes  
+- **95th / 99th percentile:** {stats["p95"]:.1f} / {stats["p99"]:.1f} minutes  
+""")
+
+    else:
+
+        # Left column — Box Plot
+        with col1:
+            st.image(
+                "04_Analysis/Visualizations/tripduration_boxplot_static.png",
+                use_column_width=True
+            )
+
+        # Right column — Summary (centered + tight)
+        with col2:
+            st.markdown(
+                """
+                <div style='text-align:center; margin-bottom:10px;'>
+                    <h2 style='margin-bottom:2px;'>Trip Duration Summary</h2>
+                    <p style='font-size:18px; margin-top:0px; color:#555;'>(1–65 Minutes)</p>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+            st.markdown("""
+            - **Median trip duration:** 10.0 minutes  
+            - **Average trip duration:** 13.3 minutes  
+            - **Shortest trip:** 1.0 minute  
+            - **Longest trip:** 65.4 minutes  
+            """)
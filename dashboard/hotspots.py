@@ -0,0 +1,126 @@
+################################################ CitiBike NYC Trip Hotspots (500 Busiest Routes) ################################################
+
+# The busiest routes as arcs for any months, seasons, rider types and times of day (from the
+# route index), or the kepler.gl export of the top 500 routes when the index is not built.
+
+import streamlit as st
+import pydeck as pdk
+
+from citibike import cube, perf, queries, route_index
+from citibike.data import load_kepler_html, load_periods, load_route_index
+from dashboard import cached_view, month_label
+
+## Arc map of the top N routes (only the selected arcs are sent to the browser)
+# ---------------------------------------------------------
+# Returns the deck, the number of arcs and the most rides any count can be missing.
+def arcs_view(n, periods, seasons, riders, bands):
+    arcs, count_bound = perf.timed(
+        "compute", "top_routes", queries.top_routes,
+        n=n,
+        periods=periods,
+        seasons=seasons,
+        riders=riders,
+        bands=bands
+    )
+
+    arc_layer = pdk.Layer(
+        "ArcLayer",
+        data=arcs,
+        get_source_position=["start_lng", "start_lat"],
+        get_target_position=["end_lng", "end_lat"],
+        get_source_color=[31, 119, 180, 160],
+        get_target_color=[255, 127, 14, 160],
+        get_width="stroke_width",
+        width_scale=2,
+        pickable=True
+    )
+    arc_deck = pdk.Deck(
+        layers=[arc_layer],
+        initial_view_state=pdk.ViewState(latitude=40.74, longitude=-73.98, zoom=11.5, pitch=40),
+        tooltip={"text": "{start_station_name} → {end_station_name}\n{trip_count} trips"}
+    )
+    return arc_deck, len(arcs), count_bound
+
+
+## Trip Flow Map
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='
+                text-align:center;
+                font-size:46px;
+                margin-top:0px;
+                margin-bottom:10px;
+            '>
+                NYC CitiBike – Top 500 Trip Routes
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    # Insights of the chart
+    # ---------------------------------------------------------
+    st.markdown("""
+
+    The top 500 CitiBike trip flows reveal the strongest routes in the network, highlighting where riders most frequently travel between stations. These patterns cluster around Midtown, Lower Manhattan, and key waterfront areas, reflecting a mix of commuter routes, short neighborhood hops, and popular recreational pathways. These trip patterns also align with the station‑level trends shown on the “Top 20 Stations” page, reinforcing how rider activity concentrates around areas with heavy foot traffic, strong transit access, and well‑established bike‑friendly routes. A noticeable cluster of high‑volume routes appears along the southern edge of Central Park, where several nearby stations consistently rank among the busiest in the system.
+
+    NOTE: You can use the left‑side editing panel to access the filter options; it opens by default and can be collapsed with the arrow button. The small panel in the top‑right corner of the map provides quick access to basic map controls.
+     
+         """)
+
+    # Route index (optional): the map is drawn from data for the chosen filters
+    routes_index = perf.timed("load", "route_index", load_route_index)
+    if routes_index is not None:
+
+        # ---------------------------------------------------------
+        # Month / Season / Rider Type / Time of Day Filters (answered from the route index)
+        # ---------------------------------------------------------
+        st.sidebar.markdown("### Filter Routes")
+        route_period_filter = st.sidebar.multiselect(
+            label="Select month(s)",
+            options=load_periods(route_index.ROUTE_INDEX_PATH),
+            format_func=month_label
+        )
+        route_season_filter = st.sidebar.multiselect(label="Select season(s)", options=cube.SEASONS)
+        route_rider_filter = st.sidebar.multiselect(
+            label="Select rider type(s)",
+            options=cube.RIDER_TYPES,
+            format_func=str.capitalize
+        )
+        route_band_filter = st.sidebar.multiselect(
+            label="Select time of day",
+            options=route_index.BAND_NAMES,
+            format_func=lambda band: f"{band} ({route_index.HOUR_BANDS[band][0]}:00–{route_index.HOUR_BANDS[band][1]}:00)"
+        )
+        route_n = st.sidebar.slider("Number of routes", min_value=50, max_value=1000, value=500, step=50)
+
+        arc_deck, trip_count, count_bound = cached_view(
+            "route_arcs",
+            (route_n, route_period_filter, route_season_filter, route_rider_filter, route_band_filter),
+            [routes_index["routes"]],
+            lambda: arcs_view(route_n, route_period_filter or None, route_season_filter or None,
+                              route_rider_filter or None, route_band_filter or None)
+        )
+
+        st.subheader(f"Top {trip_count} Trips")
+
+        perf.render("route_arcs", st.pydeck_chart, arc_deck, height=800)
+        if count_bound:
+            st.caption(f"Trip counts may be low by up to {count_bound:,} rides (routes outside each month's index).")
+
+    else:
+        st.subheader("Top 500 Trips")
+
+        # Read file and keep in variable (cached after the first render)
+        # ---------------------------------------------------------
+        html_data = perf.timed("load", "kepler_html", load_kepler_html)
+
+        # Show in webpage
+        perf.render("kepler_map", st.components.v1.html, html_data, height=1000)
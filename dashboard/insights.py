@@ -0,0 +1,113 @@
+################################################ Recommendations Page ################################################
+
+# What the analysis found, the next-week demand outlook (from the demand forecasts, when built)
+# and what CitiBike should do about it.
+
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+
+from citibike import forecast, perf
+from citibike.data import load_forecast
+from dashboard import cached_view, page_image
+
+## Demand outlook: the system forecast figure and the busiest stations tomorrow
+# ---------------------------------------------------------
+def outlook_view(demand_forecast):
+    system_forecast = demand_forecast[demand_forecast["series"] == forecast.SYSTEM]
+    with perf.span("figure", "demand_outlook"):
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=pd.concat([system_forecast["date"], system_forecast["date"][::-1]]),
+            y=pd.concat([system_forecast["upper"], system_forecast["lower"][::-1]]),
+            fill="toself",
+            fillcolor="rgba(31, 119, 180, 0.2)",
+            line=dict(color="rgba(0, 0, 0, 0)"),
+            name="95% interval"
+        ))
+        fig.add_trace(go.Scatter(
+            x=system_forecast["date"],
+            y=system_forecast["forecast"],
+            mode="lines+markers",
+            line=dict(color="blue"),
+            name="Forecast rides"
+        ))
+        fig.update_layout(
+            title="Forecast Daily Rides, Next 7 Days",
+            xaxis_title="Date",
+            yaxis_title="Daily Bike Rides",
+            template="plotly_white",
+            height=450
+        )
+
+    next_day = demand_forecast[(demand_forecast["series"] != forecast.SYSTEM) & (demand_forecast["horizon_days"] == 1)]
+    busiest = (next_day.nlargest(10, "forecast")[["series", "forecast", "lower", "upper"]]
+               .rename(columns={"series": "Station", "forecast": "Forecast", "lower": "Low", "upper": "High"})
+               .round(0))
+    return fig, busiest
+
+
+## Recommendations Page
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='text-align:center; font-size:46px; margin-top:0px; margin-bottom:10px;'>
+                Insights & Recommendations
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    # --------------------------------
+    # INSIGHTS
+    # --------------------------------
+    st.markdown("""
+### Insights
+
+The weather has a clear and predictable impact on CitiBike ridership. Colder temperatures consistently reduce daily ride counts, while warmer seasons support higher usage. November is a strong example: ridership remains high early in the month, but once temperatures drop, the number of rides falls sharply. This lower demand period continues through mid-April, when warmer weather brings ridership back up. Customer type also plays a role in how the system is used. Members tend to take more short trips compared to casual riders, suggesting that membership behavior is tied to quick, routine travel rather than longer recreational rides. Understanding these patterns can help tailor incentives and operational decisions to better support each rider group. The most popular stations and the top routes provide a clear picture of where demand is concentrated. High traffic areas, especially those with strong public transportation access, heavy foot traffic, and intuitive bike-friendly paths, consistently appear at the top of both lists. These insights help identify where additional stations, more docks, or increased bike availability would have the greatest impact.
+""")
+
+    # --------------------------------
+    # DEMAND OUTLOOK (from the demand forecasts)
+    # --------------------------------
+    # Demand forecasts (optional): next-day / next-week outlook
+    demand_forecast = perf.timed("load", "forecast", load_forecast)
+    if demand_forecast is not None:
+        st.markdown("### Demand Outlook")
+
+        fig, busiest = cached_view("demand_outlook", (), [demand_forecast], lambda: outlook_view(demand_forecast))
+        perf.render("demand_outlook", st.plotly_chart, fig, use_container_width=True)
+
+        if len(busiest):
+            st.markdown("**Busiest stations tomorrow** (forecast departures with 95% interval)")
+            perf.render("forecast_table", st.dataframe, busiest, hide_index=True)
+
+    # --------------------------------
+    # RECOMMENDATIONS
+    # --------------------------------
+    st.markdown("""
+### Recommendations
+
+During the colder months, when overall ridership drops, bikes should be prioritized at the most consistently popular stations. This ensures that the riders who continue using the system during the off‑season still have reliable access. In contrast, during the peak spring and summer seasons, CitiBike should consider adding more stations or expanding existing ones in the high‑demand areas identified in the analysis.
+
+Given that members take more short trips, CitiBike could explore seasonal promotions tailored to this group. During peak months, small incentives, such as discounts for returning bikes to specific stations, could help reduce the need for frequent restocking. In the off‑season, stronger incentives or cost‑saving promotions could help boost ridership when demand naturally declines. A rewards or points system for members could also encourage more consistent usage throughout the year. Offering higher rewards during the down‑season would help balance demand and keep riders engaged. Finally, understanding the top stations and most frequently traveled routes provides a roadmap for operational planning. These insights can inform decisions about where to place new stations, where to expand dock capacity, and where to allocate additional bikes to meet demand. Strengthening the busiest corridors, particularly those surrounding transit hubs, waterfronts, and Central Park, would support the natural flow of rider behavior and enhance overall system reliability.
+""")
+
+    # --------------------------------
+    # IMAGE
+    # --------------------------------
+    img_left, img_center, img_right = st.columns([1, 2, 1])
+    with img_center:
+        st.markdown(
+            "<div style='text-align:center; margin-top:8px; margin-bottom:10px;'>",
+            unsafe_allow_html=True
+        )
+        st.image(page_image("04_Analysis/Visualizations/recommendations.jpg"), width=450)
+        st.markdown("</div>", unsafe_allow_html=True)
@@ -0,0 +1,107 @@
+################################################ CitiBike Strategy Overview Page ################################################
+
+# The landing page: purpose, objective and what each page covers. It uses no data, so opening
+# the dashboard only imports Streamlit.
+
+import streamlit as st
+
+from dashboard import page_image
+
+## Overview Page
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='
+                text-align:center;
+                font-size:46px;
+                margin-top:0px;
+                margin-bottom:10px;
+            '>
+                CitiBike Strategy Dashboard
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    # --------------------------------
+    # IMAGE
+    # --------------------------------
+    img_left, img_center, img_right = st.columns([1, 2, 1])
+    with img_center:
+        st.markdown(
+            """
+            <div style='
+                display: flex;
+                justify-content: center;
+                align-items: center;
+                margin-top: 5px;
+                margin-bottom: 15px;
+            '>
+            """,
+            unsafe_allow_html=True
+        )
+        st.image(page_image("04_Analysis/Visualizations/green_light_bike.jpg"), width=450)
+        st.markdown("</div>", unsafe_allow_html=True)
+
+    # --------------------------------
+    # INTRO 
+    # --------------------------------
+    intro_left, intro_center, intro_right = st.columns([0.18, 1.65, 0.17])
+    with intro_center:
+        st.markdown("""
+This dashboard provides a descriptive analysis of New York City’s Citi Bike system, enabling the business strategy team to understand current usage patterns and identify opportunities to enhance bike availability throughout the city.
+""")
+
+    # --------------------------------
+    # TWO-COLUMN MAIN CONTENT
+    # --------------------------------
+    col_left, col_right = st.columns([1, 1.3])
+
+    with col_left:
+        st.markdown("""
+### Project Objective
+As the lead analyst, the goal is to identify where distribution issues originate and provide actionable insights that support informed operational decision-making. The analysis focuses on understanding whether availability problems stem from:
+- uneven station demand  
+- weather-driven fluctuations  
+- trip behavior  
+- geographic hotspots  
+- or a combination of these factors  
+
+Understanding these patterns is essential for improving system reliability and ensuring riders can consistently find and return bikes across the city.
+""")
+
+    with col_right:
+        st.markdown("""
+### What This Dashboard Covers
+The analysis is organized into several pages, each focusing on a key aspect of system performance:
+
+- **Most Popular Stations**  
+  Identifies high‑demand hubs and highlights where capacity is consistently strained.
+
+- **Weather and Daily Rides**  
+  Examines how temperature and conditions influence daily trip volume.
+
+- **Trip Duration Patterns**  
+  Explores how long riders typically travel and what that reveals about user behavior.
+
+- **Geographic Hotspots**  
+  Maps where trips cluster across the city to reveal spatial demand patterns.
+
+- **Station Density**  
+  Bins rides into hexagons and finds the stations near any station that could absorb its overflow.
+
+- **Station Rebalancing**  
+  Simulates dock inventory to show where and when stations run out of bikes or docks.
+
+- **Recommendations**  
+  Summarizes opportunities to improve distribution, expand capacity, and support future growth.
+
+NOTE: Use the **Navigate to** in the sidebar to move between sections.
+""")
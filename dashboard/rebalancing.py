@@ -0,0 +1,136 @@
+################################################ CitiBike Station Rebalancing ################################################
+
+# Dock inventory simulated hour by hour from the station flows: the stations and hours where
+# riders found no bike or no free dock, for any seasons, dock count and starting stock.
+
+import streamlit as st
+import plotly.graph_objects as go
+
+from citibike import cube, perf, rebalancing
+from citibike.data import load_station_flows
+from dashboard import cached_view
+
+## The worst stations, their stock-outs by hour and the table for one set of simulation settings
+# ---------------------------------------------------------
+def rebalancing_view(station_flows, capacity, start_fill, seasons):
+    station_summary, stockout_by_hour = perf.timed(
+        "compute", "simulate", rebalancing.simulate,
+        station_flows["flows"],
+        capacity=capacity,
+        start_fill=start_fill,
+        seasons=seasons
+    )
+    worst = rebalancing.worst_stations(station_summary, station_flows["stations"], n=20)
+
+    # --------------------------------
+    # WORST STATIONS
+    # --------------------------------
+    worst_sorted = worst.sort_values("problem_hours", ascending=True)
+    with perf.span("figure", "worst_stations"):
+        worst_fig = go.Figure()
+        worst_fig.add_trace(go.Bar(
+            x=worst_sorted["stockout_hours"],
+            y=worst_sorted["station_name"],
+            orientation="h",
+            name="Stock-out hours (no bikes)",
+            marker_color="#d62728"
+        ))
+        worst_fig.add_trace(go.Bar(
+            x=worst_sorted["full_hours"],
+            y=worst_sorted["station_name"],
+            orientation="h",
+            name="Dock-full hours (no free docks)",
+            marker_color="#1f77b4"
+        ))
+        worst_fig.update_layout(
+            barmode="stack",
+            title="20 Stations with the Most Stock-out and Dock-full Hours",
+            xaxis_title="Hours",
+            yaxis_title="Station Name",
+            template="plotly_white",
+            height=650
+        )
+
+    # --------------------------------
+    # WORST HOURS
+    # --------------------------------
+    heat = stockout_by_hour.loc[worst["station_id"]]
+    with perf.span("figure", "stockout_heatmap"):
+        heat_fig = go.Figure(go.Heatmap(
+            z=heat.to_numpy(),
+            x=[f"{hour}:00" for hour in heat.columns],
+            y=worst["station_name"],
+            colorscale="Reds",
+            colorbar=dict(title="Stock-outs")
+        ))
+        heat_fig.update_layout(
+            title="Stock-outs by Hour of Day",
+            xaxis_title="Hour of Day",
+            yaxis=dict(autorange="reversed"),
+            template="plotly_white",
+            height=650
+        )
+
+    worst_table = worst[["station_name", "stockout_hours", "full_hours", "unmet_departures", "unmet_returns",
+                         "net_flow_per_day"]].round({"net_flow_per_day": 1})
+    return worst_fig, heat_fig, worst_table
+
+
+## Stock-outs and full docks from the inventory simulation
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='
+                text-align:center;
+                font-size:46px;
+                margin-top:0px;
+                margin-bottom:10px;
+            '>
+                Where Do Bikes Run Out?
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    st.markdown("""
+    Every station starts the day with part of its docks filled, then each hour's arrivals and departures move bikes in and out. 
+    A **stock-out hour** is an hour when riders wanted more bikes than the station had; a **dock-full hour** is an hour when 
+    riders could not return their bike because every dock was taken. The stations below are where rebalancing trucks, 
+    extra docks, or return incentives would help the most.
+
+    NOTE: Use the "Simulation Settings" section in the sidebar to change the season, dock count and starting stock.
+    """)
+
+    # Hourly station flows (optional): the dock inventory is simulated from them
+    station_flows = perf.timed("load", "station_flows", load_station_flows)
+    if station_flows is None:
+        st.info("Build the station flows first: `python -m citibike.rebalancing`")
+    else:
+
+        # ---------------------------------------------------------
+        # Simulation Settings
+        # ---------------------------------------------------------
+        st.sidebar.markdown("### Simulation Settings")
+        rebalancing_seasons = st.sidebar.multiselect(label="Select season(s)", options=cube.SEASONS)
+        dock_capacity = st.sidebar.slider("Docks per station", min_value=10, max_value=80,
+                                          value=rebalancing.DEFAULT_CAPACITY)
+        start_fill = st.sidebar.slider("Starting stock (share of docks)", min_value=0.0, max_value=1.0,
+                                       value=rebalancing.DEFAULT_START_FILL, step=0.05)
+
+        worst_fig, heat_fig, worst_table = cached_view(
+            "rebalancing",
+            (rebalancing_seasons, dock_capacity, start_fill),
+            [station_flows["flows"], station_flows["stations"]],
+            lambda: rebalancing_view(station_flows, dock_capacity, start_fill, rebalancing_seasons or None)
+        )
+
+        perf.render("worst_stations", st.plotly_chart, worst_fig, use_container_width=True)
+        perf.render("stockout_heatmap", st.plotly_chart, heat_fig, use_container_width=True)
+        perf.render("worst_stations_table", st.dataframe, worst_table, hide_index=True)
@@ -0,0 +1,193 @@
+################################################ CitiBike NYC Top Stations Chart ################################################
+
+# The 20 busiest start stations for any months and rider types (from the ride cube, else
+# top_stations_df.csv), or, with several years in the cube, one year's top stations against
+# their rank in another year and the rank changes of the top stations and routes.
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+
+from citibike import cube, perf, queries
+from citibike.data import load_cube, load_periods, load_route_index, load_top_stations
+from dashboard import cached_view, month_label
+
+## Top 20 stations (bar chart)
+# ---------------------------------------------------------
+def top_stations_figure(periods, riders):
+    top_stations_view = perf.timed(
+        "compute", "top_stations", queries.top_stations,
+        n=20,
+        periods=periods,
+        riders=riders
+    )
+
+    # --------------------------------
+    # Sort DATA for plotting
+    # --------------------------------
+    top20 = top_stations_view.sort_values("value", ascending=True)
+
+    # --------------------------------
+    # PLOT
+    # --------------------------------
+    with perf.span("figure", "top_stations"):
+        fig = go.Figure(go.Bar(
+            x=top20["value"],
+            y=top20["start_station_name"],
+            orientation="h",
+            marker=dict(
+                color=top20["value"],
+                colorscale="Blues"
+            )
+        ))
+
+        fig.update_layout(
+            title="Top 20 Stations",
+            xaxis_title="Ride Count",
+            yaxis_title="Station Name",
+            template="plotly_white",
+            height=600
+        )
+    return fig
+
+
+## One year's top 20 stations colored by rank change, and the station and route rank changes
+# ---------------------------------------------------------
+def ranks_view(rank_year, base_year, riders):
+    station_ranks = perf.timed(
+        "compute", "station_ranks", queries.station_ranks,
+        rank_year, base_year,
+        n=20,
+        riders=riders
+    )
+    route_ranks = perf.timed(
+        "compute", "route_ranks", queries.route_ranks,
+        rank_year, base_year,
+        n=20,
+        riders=riders
+    )
+
+    # --------------------------------
+    # PLOT (bars colored by rank change; stations without rides in the base year count as unchanged)
+    # --------------------------------
+    with perf.span("figure", "station_ranks"):
+        ranked = station_ranks.sort_values("rides", ascending=True)
+        base_rank = ranked["base_rank"].map(lambda rank: "–" if pd.isna(rank) else f"#{rank:.0f}")
+        fig = go.Figure(go.Bar(
+            x=ranked["rides"],
+            y=ranked["start_station_name"],
+            orientation="h",
+            customdata=np.column_stack([ranked["rank"], base_rank, ranked["base_rides"]]),
+            hovertemplate=(f"%{{y}}<br>{rank_year}: #%{{customdata[0]}} (%{{x:,}} rides)"
+                           f"<br>{base_year}: %{{customdata[1]}} (%{{customdata[2]:,}} rides)<extra></extra>"),
+            marker=dict(
+                color=ranked["rank_change"].fillna(0),
+                colorscale="RdBu",
+                cmid=0,
+                colorbar=dict(title="Rank change")
+            )
+        ))
+
+        fig.update_layout(
+            title=f"Top 20 Stations in {rank_year} and Their Rank in {base_year}",
+            xaxis_title="Ride Count",
+            yaxis_title="Station Name",
+            template="plotly_white",
+            height=600
+        )
+    return fig, station_ranks, route_ranks
+
+
+## Bar Chart
+# ---------------------------------------------------------
+def render():
+
+    # --------------------------------
+    # TITLE
+    # --------------------------------
+    title_left, title_center, title_right = st.columns([0.38, 1, 0.62])
+    with title_center:
+        st.markdown(
+            """
+            <h1 style='
+                text-align:center;
+                font-size:46px;
+                margin-top:0px;
+                margin-bottom:10px;
+            '>
+                Top 20 Most Popular CitiBike Stations in NYC
+            </h1>
+            """,
+            unsafe_allow_html=True
+        )
+
+    # --------------------------------
+    # INSIGHTS
+    # --------------------------------
+    st.markdown("""
+The top 20 CitiBike stations represent the busiest points in the network, reflecting where large numbers of people move through the city each day. These stations tend to be located in areas with dense foot traffic, strong transit connections, and easy‑to‑spot locations that riders naturally encounter as they move through the area. The pattern aligns with the broader spatial trends seen in the Geographic Trip Hotspots map, where Midtown, Lower Manhattan, and key waterfront areas emerge as consistent activity centers. Together, these high‑volume stations illustrate where CitiBike demand is most concentrated and where the system experiences the greatest day‑to‑day pressure to keep bikes available.
+    """)
+
+    # Ride cube (optional): enables the month / rider type filters
+    ride_cube = perf.timed("load", "cube", load_cube)
+
+    # ---------------------------------------------------------
+    # Month / Rider Type Filters (answered from the ride cube)
+    # ---------------------------------------------------------
+    period_filter, rider_filter = [], []
+    station_view = "Top stations"
+    if ride_cube is not None:
+        period_options = load_periods()
+        cube_years = sorted({period // 100 for period in period_options}, reverse=True)
+
+        st.sidebar.markdown("### Filter Stations")
+        if len(cube_years) > 1:
+            station_view = st.sidebar.radio("View", ["Top stations", "Year over year"])
+        if station_view == "Year over year":
+            rank_year = st.sidebar.selectbox("Year", options=cube_years)
+            base_year = st.sidebar.selectbox("Compared with", options=[year for year in cube_years if year != rank_year])
+        else:
+            period_filter = st.sidebar.multiselect(
+                label="Select month(s)",
+                options=period_options,
+                format_func=month_label
+            )
+        rider_filter = st.sidebar.multiselect(
+            label="Select rider type(s)",
+            options=cube.RIDER_TYPES,
+            format_func=str.capitalize
+        )
+
+    if station_view == "Year over year":
+
+        # Top 20 stations of the year with their rank the other year (rank_change > 0: climbed);
+        # route ranks from the route index when it is built
+        routes = perf.timed("load", "route_index", load_route_index)
+        rank_sources = [ride_cube["station_months"], routes["routes"] if routes is not None else ride_cube["route_months"]]
+        fig, station_ranks, route_ranks = cached_view(
+            "station_ranks", (rank_year, base_year, rider_filter), rank_sources,
+            lambda: ranks_view(rank_year, base_year, rider_filter or None)
+        )
+
+        perf.render("station_ranks", st.plotly_chart, fig, use_container_width=True)
+
+        st.markdown(f"#### Rank changes, {base_year} → {rank_year}")
+        stations_col, routes_col = st.columns(2)
+        with stations_col:
+            st.markdown("**Stations**")
+            st.dataframe(station_ranks, hide_index=True)
+        with routes_col:
+            st.markdown("**Routes**")
+            st.dataframe(route_ranks, hide_index=True)
+
+    else:
+
+        # Ride cube when built, otherwise top_stations_df (citibike.queries, shared with the JSON API)
+        fig = cached_view(
+            "top_stations", (period_filter, rider_filter),
+            [ride_cube["station_months"] if ride_cube is not None else load_top_stations()],
+            lambda: top_stations_figure(period_filter or None, rider_filter or None)
+        )
+
+        perf.render("top_stations", st.plotly_chart, fig, use_container_width=True)
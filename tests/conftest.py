@@ -0,0 +1,12 @@
+################################################ CitiBike Tests ################################################
+
+# Shared helpers for the tests. The project root is put on sys.path so the citibike package
+# imports without being installed.
+#
+# Usage:
+#   python -m pytest tests
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,79 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from citibike import aggregates, ingest, integrity, synthetic
+
+
+@pytest.fixture(scope="module")
+def trips(tmp_path_factory):
+    root = tmp_path_factory.mktemp("trips")
+    source, dataset = root / "source", root / "dataset"
+    synthetic.generate(source, rows=6000, months=[3, 4], seed=7, n_stations=60, file_rows=2000, log=lambda message: None)
+    ingest.ingest_folder(source, dataset)
+    return source, dataset
+
+
+## Names as plain strings (the dataset decodes them as categories, the CSVs as strings)
+# ---------------------------------------------------------
+def plain(frame):
+    names = [col for col in ["start_station_name", "end_station_name"] if col in frame]
+    return frame.astype({col: object for col in names})
+
+
+## The same trips with rides repeated across two files and within one
+# ---------------------------------------------------------
+@pytest.fixture(scope="module")
+def repeated_trips(trips, tmp_path_factory):
+    root = tmp_path_factory.mktemp("repeated")
+    source, dataset = root / "source", root / "dataset"
+    shutil.copytree(trips[0], source)
+    first, *_, last = ingest.list_monthly_files(source)
+    shared = pd.read_csv(first, nrows=5)
+    last_rows = pd.read_csv(last)
+    pd.concat([last_rows, shared, last_rows.head(2)]).to_csv(last, index=False)
+    ingest.ingest_folder(source, dataset)
+    return source, dataset
+
+
+def assert_same_aggregates(parallel, streamed):
+    pd.testing.assert_frame_equal(aggregates.daily_frame(parallel), aggregates.daily_frame(streamed))
+    pd.testing.assert_frame_equal(plain(aggregates.stations_frame(parallel)), plain(aggregates.stations_frame(streamed)))
+    pd.testing.assert_frame_equal(aggregates.durations_frame(parallel), aggregates.durations_frame(streamed))
+    routes = ["start_station_name", "end_station_name", "trip_count"]
+    pd.testing.assert_frame_equal(plain(aggregates.routes_frame(parallel)[routes]),
+                                  plain(aggregates.routes_frame(streamed)[routes]))
+
+
+def test_parallel_build_equals_dataset_build(trips, tmp_path):
+    source, dataset = trips
+    parallel = aggregates.parallel_aggregates(source, workers=2, chunksize=700, dataset_dir=tmp_path)
+    assert_same_aggregates(parallel, aggregates.dataset_aggregates(dataset_dir=dataset))
+
+
+def test_parallel_build_counts_repeated_rides_once(repeated_trips, tmp_path):
+    source, dataset = repeated_trips
+    parallel = aggregates.parallel_aggregates(source, workers=2, chunksize=700, dataset_dir=tmp_path)
+    assert_same_aggregates(parallel, aggregates.dataset_aggregates(dataset_dir=dataset))
+    assert aggregates.daily_frame(parallel)["bike_rides_daily"].sum() == 6000
+
+    # The stored ride keys match the ones the ingest kept, file by file
+    stored = integrity.ride_ids_dir(dataset)
+    for path in ingest.list_monthly_files(source):
+        np.testing.assert_array_equal(np.load(integrity.ride_ids_dir(tmp_path) / f"{path.stem}.npy"),
+                                      np.load(stored / f"{path.stem}.npy"))
+
+
+def test_merge_is_exact_in_any_order(trips):
+    source, _ = trips
+    parts = [aggregates.file_aggregates(path, chunksize=500) for path in ingest.list_monthly_files(source)]
+    forward, backward = aggregates.merge_aggregates(parts), aggregates.merge_aggregates(parts[::-1])
+    trips_read = pd.concat(chunk for path in ingest.list_monthly_files(source) for chunk in ingest.read_csv_chunks(path))
+
+    assert aggregates.daily_frame(forward)["bike_rides_daily"].sum() == len(trips_read)
+    pd.testing.assert_series_equal(forward["stations"].sort_index(), backward["stations"].sort_index())
+    assert forward["stations"].sort_index().equals(
+        trips_read["start_station_name"].value_counts().sort_index().astype(forward["stations"].dtype)
+    )
@@ -0,0 +1,14 @@
+import pandas as pd
+
+from citibike import forecast, prepare
+
+
+def test_weather_only_days_are_not_training_zeros():
+    rides = pd.DataFrame({"date": pd.date_range("2022-01-01", periods=3), "bike_rides_daily": [100, 0, 120]})
+    weather = pd.DataFrame({"date": pd.date_range("2021-12-30", periods=7), "avgTemp": 5.0})
+    daily = prepare.build_daily_sub_df(rides, weather)
+
+    assert daily["bike_rides_daily"].isna().sum() == 4
+    demand = forecast.demand_matrix(daily)
+    assert list(demand.index) == list(rides["date"])
+    assert demand[forecast.SYSTEM].tolist() == [100.0, 0.0, 120.0]
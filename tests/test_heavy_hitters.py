@@ -0,0 +1,80 @@
+import pandas as pd
+
+from citibike import heavy_hitters, ingest, synthetic
+
+
+## A batch of June member trips, count times each station (round trips)
+# ---------------------------------------------------------
+def trips(counts):
+    names = [name for name, count in counts for _ in range(count)]
+    return pd.DataFrame({
+        "started_at": pd.Timestamp("2022-06-01 08:00"),
+        "member_casual": "member",
+        "start_station_name": names,
+        "end_station_name": names,
+    })
+
+
+def top_one(batches, k):
+    tracker = heavy_hitters.new_tracker({"stations": k, "routes": k})
+    for batch in batches:
+        heavy_hitters.observe(tracker, batch)
+    table, _ = heavy_hitters.confirm(tracker, batches, {"stations": 1, "routes": 1})
+    return table[(table["kind"] == "stations") & (table["slice"] == "all")].iloc[0]
+
+
+def test_error_bounds_hold():
+    batches = [trips([("B", 5), ("C", 5), ("D", 5)]), trips([("A", 10), ("B", 7)])]
+    tracker = heavy_hitters.new_tracker({"stations": 2, "routes": 2})
+    for batch in batches:
+        heavy_hitters.observe(tracker, batch)
+    summary = tracker["summaries"][("stations", "all", "all")]
+
+    true_counts = pd.concat(batches)["start_station_name"].value_counts()
+    estimates = summary["counts"].reindex(true_counts.index).fillna(0)
+    assert (estimates <= true_counts).all()
+    assert (true_counts <= estimates + summary["decrement"]).all()
+    assert summary["decrement"] <= summary["rows"] / (summary["k"] + 1)
+
+
+def test_top_not_exact_when_a_summary_item_can_beat_it():
+    # A is the only candidate for the top 1 (10 rides), but B (estimate 7, decrement 5) really has 12
+    top = top_one([trips([("B", 5), ("C", 5), ("D", 5)]), trips([("A", 10), ("B", 7)])], k=2)
+    assert top["start_station_name"] == "A"
+    assert top["count"] == 10
+    assert not top["exact"]
+
+
+def test_top_exact_when_nothing_left_out_can_reach_it():
+    top = top_one([trips([("A", 30), ("B", 2), ("C", 2)]), trips([("A", 10), ("D", 1)])], k=2)
+    assert top["start_station_name"] == "A"
+    assert top["count"] == 40
+    assert top["exact"]
+
+
+def test_merged_summaries_keep_the_bounds():
+    first, second = trips([("A", 6), ("B", 3), ("C", 1)]), trips([("A", 2), ("C", 4), ("D", 4)])
+    a = heavy_hitters.add_counts(heavy_hitters.new_summary(2), first["start_station_name"].value_counts(), len(first))
+    b = heavy_hitters.add_counts(heavy_hitters.new_summary(2), second["start_station_name"].value_counts(), len(second))
+    merged = heavy_hitters.merge_summaries(a, b)
+
+    true_counts = pd.concat([first, second])["start_station_name"].value_counts()
+    estimates = merged["counts"].reindex(true_counts.index).fillna(0)
+    assert merged["rows"] == len(first) + len(second)
+    assert (estimates <= true_counts).all()
+    assert (true_counts <= estimates + merged["decrement"]).all()
+
+
+def test_run_writes_only_the_per_slice_table(tmp_path):
+    synthetic.generate(tmp_path / "source", rows=3000, months=[5], seed=3, n_stations=40, log=lambda message: None)
+    ingest.ingest_folder(tmp_path / "source", tmp_path / "dataset")
+    out_dir = tmp_path / "prepared"
+    out_dir.mkdir()
+
+    table = heavy_hitters.run(dataset_dir=tmp_path / "dataset", path=out_dir / "top_by_slice.csv")
+    assert [path.name for path in out_dir.iterdir()] == ["top_by_slice.csv"]
+
+    trips = pd.concat(ingest.iter_trip_batches(["start_station_name"], dataset_dir=tmp_path / "dataset"))
+    overall = table[(table["kind"] == "stations") & (table["slice"] == "all")]
+    exact_counts = trips["start_station_name"].astype(str).value_counts()
+    assert overall["count"].tolist() == exact_counts.loc[overall["start_station_name"]].tolist()
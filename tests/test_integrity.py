@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from citibike import ingest, integrity
+
+
+## A tripdata CSV in the 2021+ schema with the given ride_ids, all on one day
+# ---------------------------------------------------------
+def write_month(folder, name, day, ids):
+    folder.mkdir(parents=True, exist_ok=True)
+    started = pd.Timestamp(day) + pd.to_timedelta(np.arange(len(ids)), unit="min")
+    pd.DataFrame({
+        "ride_id": ids,
+        "rideable_type": "classic_bike",
+        "started_at": started.strftime("%Y-%m-%d %H:%M:%S"),
+        "ended_at": (started + pd.Timedelta(minutes=12)).strftime("%Y-%m-%d %H:%M:%S"),
+        "start_station_name": "W 21 St & 6 Ave",
+        "start_station_id": "6140.05",
+        "end_station_name": "8 Ave & W 31 St",
+        "end_station_id": "6450.05",
+        "start_lat": 40.7417, "start_lng": -73.9942, "end_lat": 40.7505, "end_lng": -73.9946,
+        "member_casual": "member",
+    }).to_csv(folder / f"{name}.csv", index=False)
+    return folder / f"{name}.csv"
+
+
+def ride_ids(dataset_dir):
+    return ingest.open_trips(dataset_dir).to_table(columns=["ride_id"])["ride_id"].to_pylist()
+
+
+def hex_id(i):
+    return f"{i:016X}"
+
+
+@pytest.fixture
+def months(tmp_path):
+    source = tmp_path / "source"
+    # The last rides of January are repeated at the start of the February export
+    january = write_month(source, "202201-citibike-tripdata", "2022-01-31", [hex_id(i) for i in range(10)])
+    february = write_month(source, "202202-citibike-tripdata", "2022-02-01", [hex_id(i) for i in range(7, 15)])
+    return source, january, february
+
+
+def test_ride_keys_round_trip_hex_ids():
+    keys = np.array([0, 1, 0xDEADBEEF, 2**64 - 1], dtype="uint64")
+    decoded, keyed = integrity.ride_keys(integrity.hex_ids(keys))
+    assert keyed.all()
+    assert (decoded == keys).all()
+
+
+def test_duplicates_dropped_within_and_across_files(tmp_path):
+    source = tmp_path / "source"
+    write_month(source, "202201-citibike-tripdata", "2022-01-31", [hex_id(i) for i in [1, 2, 2, 3]])
+    write_month(source, "202202-citibike-tripdata", "2022-02-01", [hex_id(i) for i in [3, 4]])
+    summary = ingest.ingest_folder(source, tmp_path / "dataset")
+
+    assert summary["duplicates"].tolist() == [1, 1]
+    assert sorted(ride_ids(tmp_path / "dataset")) == [hex_id(i) for i in [1, 2, 3, 4]]
+
+
+def test_reingest_keeps_every_ride_once(tmp_path, months):
+    source, january, february = months
+    dataset = tmp_path / "dataset"
+    ingest.ingest_folder(source, dataset)
+    assert sorted(ride_ids(dataset)) == [hex_id(i) for i in range(15)]
+
+    # The latest file alone, then everything together: same rides, each once
+    ingest.ingest_file(february, dataset)
+    assert sorted(ride_ids(dataset)) == [hex_id(i) for i in range(15)]
+    ingest.ingest_folder(source, dataset)
+    assert sorted(ride_ids(dataset)) == [hex_id(i) for i in range(15)]
+
+
+def test_reingest_of_an_earlier_file_alone_is_refused(tmp_path, months):
+    source, january, february = months
+    dataset = tmp_path / "dataset"
+    ingest.ingest_folder(source, dataset)
+
+    # January's rides 7-9 were dropped from February; re-ingesting January alone would drop them again
+    with pytest.raises(ValueError, match="202202-citibike-tripdata"):
+        ingest.ingest_file(january, dataset)
+    january_only = tmp_path / "january_only"
+    january_only.mkdir()
+    (january_only / january.name).write_bytes(january.read_bytes())
+    with pytest.raises(ValueError, match="202202-citibike-tripdata"):
+        ingest.ingest_folder(january_only, dataset)
+    assert sorted(ride_ids(dataset)) == [hex_id(i) for i in range(15)]
+
+
+def test_backfill_of_a_new_earlier_month_is_allowed(tmp_path):
+    source = tmp_path / "source"
+    dataset = tmp_path / "dataset"
+    write_month(source / "later", "202202-citibike-tripdata", "2022-02-01", [hex_id(i) for i in range(5)])
+    ingest.ingest_folder(source / "later", dataset)
+
+    write_month(source / "earlier", "202201-citibike-tripdata", "2022-01-31", [hex_id(i) for i in range(3, 8)])
+    ingest.ingest_folder(source / "earlier", dataset)
+    assert sorted(ride_ids(dataset)) == [hex_id(i) for i in range(8)]
@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+from citibike import prepare
+
+
+def test_daily_weather_needs_the_weather_file(tmp_path):
+    with pytest.raises(FileNotFoundError, match="weather"):
+        prepare.daily_weather(tmp_path / "weather_df.csv")
+
+
+def test_daily_sub_df_covers_every_weather_date(tmp_path):
+    path = tmp_path / "weather_df.csv"
+    pd.DataFrame({"date": ["2022-12-31", "2023-01-01"], "avgTemp": [3.0, 4.5]}).to_csv(path, index=False)
+    rides = pd.DataFrame({"date": pd.to_datetime(["2023-01-01"]), "bike_rides_daily": [7]})
+
+    daily = prepare.build_daily_sub_df(rides, prepare.daily_weather(path))
+    assert daily["date"].dt.strftime("%Y-%m-%d").tolist() == ["2022-12-31", "2023-01-01"]
+    assert daily["bike_rides_daily"].tolist()[1] == 7
+    assert daily["season"].tolist() == ["Winter", "Winter"]
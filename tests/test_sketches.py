@@ -0,0 +1,44 @@
+import numpy as np
+
+from citibike import sketches
+
+QUANTILES = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+
+def durations(seed, n):
+    return np.random.default_rng(seed).lognormal(np.log(11), 0.7, n)
+
+
+def rank_errors(sketch, values):
+    exact = np.quantile(values, QUANTILES)
+    return np.abs(sketches.cdf(sketch, exact) - QUANTILES)
+
+
+def test_quantiles_within_rank_error_of_exact():
+    values = durations(1, 200_000)
+    sketch = sketches.sketch_values(values)
+
+    assert len(sketch["weights"]) <= 2 * sketches.DEFAULT_DELTA
+    assert rank_errors(sketch, values).max() < 0.01
+    assert sketch["weights"].sum() == len(values)
+    assert (sketch["min"], sketch["max"]) == (values.min(), values.max())
+
+
+def test_merged_sketches_keep_the_bounds():
+    parts = [durations(seed, 25_000) for seed in range(8)]
+    merged = sketches.merge_sketches([sketches.sketch_values(part) for part in parts])
+    values = np.concatenate(parts)
+
+    assert rank_errors(merged, values).max() < 0.01
+    assert merged["weights"].sum() == len(values)
+    assert (merged["min"], merged["max"]) == (values.min(), values.max())
+
+
+def test_box_stats_in_focus_window():
+    values = durations(2, 100_000)
+    stats = sketches.box_stats(sketches.sketch_values(values), 1, 65)
+    inside = values[(values >= 1) & (values <= 65)]
+
+    assert abs(stats["count"] - len(inside)) <= 0.01 * len(inside)
+    assert abs(stats["median"] - np.median(inside)) <= 0.02 * np.median(inside)
+    assert stats["lowerfence"] >= 1 and stats["upperfence"] <= 65